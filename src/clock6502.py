@@ -0,0 +1,121 @@
+"""Running sim6502 at the clock rate of a real machine, and measuring how
+fast it runs.
+
+A Clock runs the simulator in slices of about slice_seconds worth of
+cycles with sim6502.run_slices(), each one a call to run() with max_cycles
+set, and after each slice sleeps until the wall clock catches up with the cycle count.
+Sleeping once a slice rather than once an instruction keeps the cost of
+throttling out of the run loop, and the JIT and idle loop skipping work
+inside each slice as usual.
+
+    clock = Clock(s, hz=APPLE_IIE_HZ)
+    stop = clock.run(until_pc=a.symbols["done"])
+    print(clock)        # Clock(1.023 MHz): 1.023 MHz, 100.0%, 0.1 ms behind
+
+With hz=None the clock doesn't throttle at all: run() is called once with
+the limits given, and the clock only times it.  clock.mhz is then the
+speed of the simulator in MHz of 6502, the number to compare between
+versions.
+
+If the host can't keep up, the schedule falls behind.  Up to max_lag
+seconds of lag are made up by running the following slices without
+sleeping; beyond that the schedule is moved on, so a pause doesn't turn
+into a burst of full speed afterwards, and the time given up is added to
+clock.lost.
+"""
+
+import time
+
+# The Apple //e's 6502 clock, to three figures
+APPLE_IIE_HZ = 1023000
+
+# Wall clock time per slice, and how far behind the schedule can fall
+# before it is moved on
+DEFAULT_SLICE_SECONDS = 0.01
+DEFAULT_MAX_LAG = 0.1
+
+
+class Clock(object):
+    """Runs cpu at hz cycles a second, or as fast as it goes with hz=None.
+
+    cycles, steps and seconds add up the runs so far, slept is the part of
+    seconds spent sleeping and lost the time given up by moving the
+    schedule on.  drift is how far the end of the last run was behind the
+    schedule, in seconds; negative if it was ahead.
+    """
+
+    def __init__(self, cpu, hz=APPLE_IIE_HZ, slice_seconds=DEFAULT_SLICE_SECONDS,
+                 max_lag=DEFAULT_MAX_LAG, timer=time.perf_counter, sleep=time.sleep):
+        if hz is not None and hz <= 0:
+            raise ValueError("hz must be positive or None, got %r" % (hz,))
+        self.cpu = cpu
+        self.hz = hz
+        self.slice_seconds = slice_seconds
+        self.max_lag = max_lag
+        self.timer = timer
+        self.sleep = sleep
+        self.cycles = 0
+        self.steps = 0
+        self.seconds = 0.0
+        self.slept = 0.0
+        self.lost = 0.0
+        self.drift = 0.0
+
+    @property
+    def mhz(self):
+        """The speed achieved, in millions of cycles a second."""
+        if not self.seconds:
+            return 0.0
+        return self.cycles / self.seconds / 1e6
+
+    @property
+    def ratio(self):
+        """The speed achieved as a fraction of hz, or None if unthrottled."""
+        if self.hz is None:
+            return None
+        return self.mhz * 1e6 / self.hz
+
+    def __repr__(self):
+        if self.hz is None:
+            return "Clock(unthrottled): %.3f MHz" % self.mhz
+        return "Clock(%.3f MHz): %.3f MHz, %.1f%%, %.1f ms %s" % (
+            self.hz / 1e6, self.mhz, 100 * self.ratio, 1000 * abs(self.drift),
+            "ahead" if self.drift < 0 else "behind")
+
+    def run(self, max_steps=None, until_pc=None, stop_on_brk=True, max_cycles=None):
+        """Run like sim6502.run(), taking the time a real machine would.
+
+        Returns the StopReason of the whole run, the same as a single
+        run() would have, see sim6502.run_slices().
+        """
+        cpu = self.cpu
+        timer = self.timer
+        start = timer()
+        if self.hz is None:
+            stop = cpu.run(max_steps, until_pc, stop_on_brk, max_cycles)
+            self.drift = 0.0
+            self.seconds += timer() - start
+            self.cycles += stop.cycles
+            self.steps += stop.steps
+            return stop
+
+        hz = self.hz
+        # When the cycles run so far should have been finished by
+        schedule = start
+        slices = cpu.run_slices(max(1, int(hz * self.slice_seconds)), max_steps,
+                                until_pc, stop_on_brk, max_cycles)
+        for stop, more in slices:
+            behind = timer() - (schedule + float(stop.cycles) / hz)
+            if behind < 0:
+                self.sleep(-behind)
+                self.slept -= behind
+            elif behind > self.max_lag:
+                schedule += behind
+                self.lost += behind
+
+        end = timer()
+        self.drift = end - (schedule + float(stop.cycles) / hz)
+        self.seconds += end - start
+        self.cycles += stop.cycles
+        self.steps += stop.steps
+        return stop
@@ -0,0 +1,128 @@
+"""Breakpoints for sim6502.
+
+Breakpoints are marked in sim6502.stop_map, a bytearray over the 64K
+address space that run() checks with one index per instruction, so
+instructions that aren't at a breakpoint cost no more than before.  Only
+when the PC reaches a marked address does the breakpoint's condition, if
+any, get evaluated and its hit count go up.
+
+    s.set_breakpoint(a.symbols["fmul"])
+    s.set_breakpoint(a.symbols["loop"], "x == 0 and mem[result] > 0x80")
+    s.set_breakpoint(a.symbols["next"], ignore=99)      # the 100th time
+    stop = s.run()
+    if stop.reason == StopReason.BREAKPOINT:
+        print(s.breakpoints[stop.pc].hits)
+
+A condition is a Python expression over the registers pc, a, x, y, sp, p
+and cycles, the memory as mem[address], and the simulator's symbols.  It is
+compiled once, when the breakpoint is set.
+
+run() doesn't stop at a breakpoint on the instruction it starts at, so
+calling it again continues from a breakpoint instead of stopping there
+straight away.
+"""
+
+
+class Memory(object):
+    """mem in a condition: mem[address] peeks at memory, without counting
+    as an access."""
+
+    def __init__(self, memory_map):
+        self.peek = memory_map.Peek
+
+    def __getitem__(self, address):
+        return self.peek(address & 0xffff)
+
+
+def compile_condition(condition, namespace):
+    """Compile condition into a function of the simulator that returns
+    whether it holds."""
+    # Check it is a single expression before wrapping it in a function
+    compile(condition, "<condition>", "eval")
+    source = ("def condition(cpu):\n"
+              "    pc, a, x, y, sp, p, cycles = (cpu.pc, cpu.a, cpu.x, cpu.y, cpu.sp,\n"
+              "                                  cpu.cc, cpu.cycles)\n"
+              "    return bool(%s)\n" % condition)
+    namespace = dict(namespace)
+    exec(compile(source, "<condition %r>" % condition, "exec"), namespace)
+    return namespace["condition"]
+
+
+class Breakpoint(object):
+    """A breakpoint at address.
+
+    hits counts the times the PC reached address with the condition true.
+    run() stops once hits is more than ignore.
+    """
+
+    def __init__(self, address, condition=None, predicate=None, ignore=0):
+        self.address = address
+        self.condition = condition
+        self.predicate = predicate
+        self.ignore = ignore
+        self.hits = 0
+
+    def __repr__(self):
+        return "Breakpoint(0x%04x, %r, hits=%d, ignore=%d)" % (
+            self.address, self.condition, self.hits, self.ignore)
+
+
+class Breakpoints(object):
+    """The breakpoints of one simulator, by address.  Made by
+    sim6502.set_breakpoint()."""
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.points = {}
+        self.namespace = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, address):
+        return address in self.points
+
+    def __getitem__(self, address):
+        return self.points[address]
+
+    def __iter__(self):
+        return iter(sorted(self.points.values(), key=lambda point: point.address))
+
+    def add(self, address, condition=None, ignore=0):
+        """Set a breakpoint at address, replacing any already there, and
+        return it."""
+        address &= 0xffff
+        predicate = None
+        if condition is not None:
+            if self.namespace is None:
+                cpu = self.cpu
+                self.namespace = dict(cpu.symbols) if cpu.have_symbols else {}
+                self.namespace["mem"] = Memory(cpu.memory_map)
+            predicate = compile_condition(condition, self.namespace)
+        point = Breakpoint(address, condition, predicate, ignore)
+        self.points[address] = point
+        self.cpu.mark_stop(address, self.cpu.STOP_BREAKPOINT)
+        return point
+
+    def remove(self, address):
+        """Remove the breakpoint at address, if there is one."""
+        address &= 0xffff
+        self.points.pop(address, None)
+        self.cpu.unmark_stop(address, self.cpu.STOP_BREAKPOINT)
+
+    def clear(self):
+        for address in self.points:
+            self.cpu.unmark_stop(address, self.cpu.STOP_BREAKPOINT)
+        self.points.clear()
+
+    def addresses(self):
+        return frozenset(self.points)
+
+    def hit(self, address):
+        """The PC has reached the breakpoint at address.  Count it if its
+        condition holds, and return whether to stop."""
+        point = self.points[address]
+        if point.predicate is not None and not point.predicate(self.cpu):
+            return False
+        point.hits += 1
+        return point.hits > point.ignore
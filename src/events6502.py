@@ -0,0 +1,81 @@
+"""Events scheduled by cycle count for sim6502.
+
+Devices that do something at a given time, a timer that interrupts every
+so many cycles or a disk that is ready a while after it was started, post
+events with sim6502.schedule().  The events wait in a heap ordered by
+cycle count, and run() only compares the cycle counter with the earliest
+of them, so a program with interrupts runs inside run() rather than being
+stepped from Python:
+
+    def vblank():
+        s.request_irq()
+    s.schedule(s.cycles + 17030, vblank, period=17030)
+    s.run(max_cycles=1000000)
+
+An event fires at the first instruction boundary at or after its cycle
+count, before the instruction there.  request_irq() and request_nmi() make
+run() take the interrupt at the next boundary, the IRQ once the I flag is
+clear.
+
+With jit=True, run() doesn't start a translated block that would run
+past the next event.  An event scheduled from inside a block, by an
+interceptor the block writes to, fires when the block has finished.
+"""
+
+import heapq
+
+
+class Event(object):
+    """An action to call at cycle count cycles, and then every period
+    cycles if period isn't None.  Made by sim6502.schedule()."""
+
+    def __init__(self, cycles, action, period=None):
+        self.cycles = cycles
+        self.action = action
+        self.period = period
+        self.cancelled = False
+
+    def __repr__(self):
+        return "Event(%d, %r, period=%r%s)" % (self.cycles, self.action, self.period,
+                                               ", cancelled" if self.cancelled else "")
+
+
+class EventQueue(object):
+    """The events of one simulator, earliest first."""
+
+    def __init__(self):
+        # (cycles, sequence, event), the sequence keeping events due at
+        # the same time in the order they were posted
+        self.heap = []
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def post(self, event):
+        heapq.heappush(self.heap, (event.cycles, self.sequence, event))
+        self.sequence += 1
+        return event
+
+    def next_cycles(self):
+        """The cycle count of the earliest event, or infinity if there
+        are none."""
+        heap = self.heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        if heap:
+            return heap[0][0]
+        return float("inf")
+
+    def fire(self, cycles):
+        """Call the actions of the events due by cycles, in order, and post
+        the next time round of the periodic ones."""
+        heap = self.heap
+        while heap and heap[0][0] <= cycles:
+            _, _, event = heapq.heappop(heap)
+            if event.cancelled:
+                continue
+            if event.period:
+                event.cycles += event.period
+                self.post(event)
+            event.action()
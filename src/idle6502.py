@@ -0,0 +1,248 @@
+"""Fast-forwarding through idle polling loops for sim6502.
+
+A program waiting for a key typically spins on a loop like
+
+    getkey: lda $c000
+            bpl getkey
+
+which does nothing but read the same address until its value changes.
+When decode() meets a branch or JMP back to a short run of instructions
+that only load, compare and test, the loop's first instruction is marked
+in sim6502.stop_map.  Each time run() gets back there it compares the
+registers with last time round; once a whole iteration has left them
+exactly as they were, every further iteration will too, until something
+outside the loop changes what it reads.  run() then skips as many
+iterations as it can in one go, crediting their cycles and steps, so the
+result is the same as running them one at a time.  Only a simulator made
+with sim6502(..., idle=True) looks for loops.
+
+Nothing but the CPU writes plain memory during run(), so what bounds the
+skip is max_steps, max_cycles and the interceptors the loop reads from.
+An interceptor lets a loop that reads it be skipped by being an object
+with a next_change(address) method, returning the cycle count at which
+the byte read at address may next differ, or None if it won't change
+until the host changes it between runs:
+
+    # $C000 reads as the next key, with bit 7 set, once there is one
+    class Keyboard(object):
+        def __init__(self, cpu):
+            self.cpu = cpu
+            self.keys = []
+        def __call__(self, address, access_mode, value):
+            if self.keys and access_mode == memory_map.MODE_READ:
+                self.cpu.memory_map.Poke(address, self.keys[0] | 0x80)
+        def next_change(self, address):
+            # Only a key typed between runs changes what $C000 reads
+            return None
+
+Reads from any other interceptor keep a loop from being skipped.  A loop
+that would never end, with no limit given to run(), makes run() return
+StopReason.IDLE instead of spinning forever.
+"""
+
+# Loops with more bytes than this aren't looked at
+MAX_LOOP_BYTES = 16
+
+# Instructions that can be in an idle loop: they don't write memory or
+# move the stack pointer, and with the same registers and memory they
+# always do the same thing
+IDLE_INSTRUCTIONS = frozenset((
+    "and", "bit", "clc", "cld", "cli", "clv", "cmp", "cpx", "cpy", "eor", "lda",
+    "ldx", "ldy", "nop", "ora", "sec", "sed", "sei", "tax", "tay", "tsx", "txa", "tya"))
+
+import memory_map
+
+JMP_ABSOLUTE = 0x4c
+
+
+def read_addresses(addrmode, operand8, operand16, x, y, peek):
+    """The addresses an instruction in addrmode reads, pointers included,
+    with X and Y as given."""
+    if addrmode == "zeropage":
+        return [operand8]
+    if addrmode == "zeropagex":
+        return [(operand8 + x) & 0xff]
+    if addrmode == "zeropagey":
+        return [(operand8 + y) & 0xff]
+    if addrmode == "absolute":
+        return [operand16]
+    if addrmode == "absolutex":
+        return [(operand16 + x) & 0xffff]
+    if addrmode == "absolutey":
+        return [(operand16 + y) & 0xffff]
+    if addrmode == "zeropageindexedindirectx":
+        pointer, index = (operand8 + x) & 0xff, 0
+    elif addrmode == "zeropageindexedindirecty":
+        pointer, index = operand8, y
+    elif addrmode == "zeropageindirect":
+        pointer, index = operand8, 0
+    else:
+        return []
+    high = (pointer + 1) & 0xff
+    address = (peek(pointer) & 0xff) | ((peek(high) & 0xff) << 8)
+    return [pointer, high, (address + index) & 0xffff]
+
+
+class IdleLoop(object):
+    """A loop from start back to the branch or JMP at branch, whose last
+    byte is just before end.
+
+    code is its bytes, for checking it hasn't been overwritten since, and
+    body the (address, addrmode, operand8, operand16) of each instruction
+    before the branch.  count is the number of instructions, the branch
+    included.
+    """
+
+    def __init__(self, start, branch, end, code, body):
+        self.start = start
+        self.branch = branch
+        self.end = end
+        self.code = code
+        self.body = body
+        self.count = len(body) + 1
+
+
+class IdleLoops(object):
+    """The idle loops found in one simulator's code."""
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        # Loops by start address, and the branches already looked at
+        self.loops = {}
+        self.checked = set()
+        # start -> (registers, steps, cycles) the last time run() was there,
+        # or None once the loop turned out not to be skippable in this run
+        self.arrivals = {}
+        # The start of the loop last skipped up to a limit of run()'s, with
+        # nothing it reads due to change, or None.  Until an event or
+        # interrupt, see sim6502.service(), run() stays in that loop.
+        self.waiting = None
+
+    def start_run(self):
+        self.arrivals.clear()
+        self.waiting = None
+
+    def found_branch(self, address, addrmode, opcode, operand8, operand16):
+        """Called by decode() for each branch and JMP: if it ends an idle
+        loop, remember the loop and mark its start in the stop map."""
+        if address in self.checked:
+            return
+        self.checked.add(address)
+        cpu = self.cpu
+        if addrmode == "relative":
+            start = cpu.relative_address(operand8, address + 2)
+            end = address + 2
+        elif opcode == JMP_ABSOLUTE:
+            start = operand16
+            end = address + 3
+        else:
+            return
+        if not address - MAX_LOOP_BYTES <= start <= address:
+            return
+
+        peek = cpu.memory_map.Peek
+        body = []
+        pc = start
+        while pc < address:
+            opcode = peek(pc)
+            if not 0 <= opcode < 256 or cpu.dispatch[opcode] is None:
+                return
+            handler, mode = cpu.dispatch[opcode]
+            if handler.__name__[len("instr_"):] not in IDLE_INSTRUCTIONS:
+                return
+            operand8 = peek((pc + 1) & 0xffff)
+            operand16 = operand8 + ((peek((pc + 2) & 0xffff) << 8) & 0xff00)
+            body.append((pc, mode, operand8, operand16))
+            pc += cpu.length_table[opcode]
+        if pc != address:
+            return
+        code = [peek(pc) for pc in range(start, end)]
+        self.loops[start] = IdleLoop(start, address, end, code, body)
+        cpu.mark_stop(start, cpu.STOP_IDLE_LOOP)
+
+    def skip(self, start, steps, max_steps, cycle_limit):
+        """run() is at the start of a marked loop, having executed steps
+        instructions.  Skip the iterations that must come out the same as
+        the last one, adding their cycles to cpu.cycles, and return the
+        number of instructions skipped, or None if the loop would go on
+        for ever."""
+        loop = self.loops.get(start)
+        if loop is None:
+            return 0
+        self.waiting = None
+        arrivals = self.arrivals
+        last = arrivals.get(start, ())
+        if last is None:
+            return 0
+        cpu = self.cpu
+        registers = (cpu.a, cpu.x, cpu.y, cpu.sp, cpu.cc)
+        arrivals[start] = (registers, steps, cpu.cycles)
+        # One iteration straight through, ending where it began
+        if not last or last[0] != registers or steps - last[1] != loop.count:
+            return 0
+        cycles = cpu.cycles - last[2]
+        if cycles <= 0:
+            return 0
+        quiet, wake = self.quiet_until(loop)
+        if not quiet:
+            # What makes it so only changes between runs
+            arrivals[start] = None
+            return 0
+
+        iterations = float("inf")
+        if max_steps != float("inf"):
+            iterations = (max_steps - steps) // loop.count
+        # Each skipped iteration has to end before the cycle limit and
+        # before anything it reads can change
+        if cycle_limit != float("inf"):
+            iterations = min(iterations, (cycle_limit - 1 - cpu.cycles) // cycles)
+        if wake is not None:
+            iterations = min(iterations, (wake - 1 - cpu.cycles) // cycles)
+        if iterations == float("inf"):
+            return None
+        if wake is None:
+            self.waiting = start
+        iterations = max(iterations, 0)
+        cpu.cycles += iterations * cycles
+        arrivals[start] = (registers, steps + iterations * loop.count, cpu.cycles)
+        return iterations * loop.count
+
+    def quiet_until(self, loop):
+        """Return (quiet, wake): whether the loop still only reads memory
+        that holds still, and the earliest cycle count at which anything it
+        reads through an interceptor may change, or None."""
+        cpu = self.cpu
+        memory = cpu.memory_map
+        if memory.trace is not None:
+            return False, None
+        peek = memory.Peek
+        if [peek(pc) for pc in range(loop.start, loop.start + len(loop.code))] != loop.code:
+            return False, None
+
+        # Stopping at any of its instructions ends the skip
+        stopping = cpu.STOP_UNTIL_PC | cpu.STOP_BREAKPOINT
+        starts = [pc for pc, _, _, _ in loop.body] + [loop.branch]
+        if any(cpu.stop_map[pc] & stopping for pc in starts):
+            return False, None
+
+        # run() fetches just the bytes of each instruction
+        accesses = [(pc & 0xffff, memory_map.MODE_EXECUTE)
+                    for pc in range(loop.start, loop.end)]
+        for pc, addrmode, operand8, operand16 in loop.body:
+            accesses.extend((address, memory_map.MODE_READ) for address in
+                            read_addresses(addrmode, operand8, operand16, cpu.x, cpu.y, peek))
+        wake = None
+        for address, access_mode in accesses:
+            if not memory.intercept_pages[address >> 8]:
+                continue
+            if memory.WatchpointFor(address, access_mode):
+                return False, None
+            interceptor = memory.InterceptorFor(address)
+            if interceptor:
+                next_change = getattr(interceptor, "next_change", None)
+                if next_change is None:
+                    return False, None
+                when = next_change(address)
+                if when is not None and (wake is None or when < wake):
+                    wake = when
+        return True, wake
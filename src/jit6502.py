@@ -0,0 +1,838 @@
+"""Basic-block translator for sim6502.
+
+A basic block is the straight run of instructions from an entry address up
+to and including the next branch, jump, JSR, RTS or RTI.  Once run() has
+reached an entry address often enough, BlockCache writes the block out as
+the source of a Python function, compiles it and caches it by address.
+run() then makes one call per block instead of dispatching each
+instruction.
+
+Inside a block the registers live in local variables and the common
+instructions are written out inline, with their operand addresses, base
+cycle counts and branch targets worked out at translation time.  The rest
+call their instr_* handler directly with constant operands.  Registers, PC
+and cycle count are stored back to the CPU before anything outside the
+block can see them: an interceptor, a handler, or the end of the block.
+
+Every page holding translated code is flagged in MemoryMap.code_pages.  A
+write to a flagged page drops the blocks covering that address, and a block
+that has just written into translated code returns at the end of that
+instruction, so self-modifying code behaves as it does under execute().
+"""
+
+import re
+
+import sim6502
+from memory_map import ByteMemoryMap, CODE_TRANSLATED
+from sim6502 import Flags, Penalty, MODE_LENGTHS
+
+# Translate an entry address once run() has reached it this many times
+DEFAULT_THRESHOLD = 4
+
+# Longest block, in instructions
+MAX_BLOCK_LENGTH = 64
+
+# Instructions that end a block
+TERMINATORS = frozenset(("bcc", "bcs", "beq", "bmi", "bne", "bpl", "bra",
+                         "bvc", "bvs", "jmp", "jsr", "rti", "rts"))
+
+# Compiled block functions shared by every BlockCache, keyed by everything
+# the generated source depends on.  The test harnesses build a new
+# simulator for every case, so this saves translating the same code again.
+_compiled = {}
+_COMPILED_LIMIT = 4096
+
+# Locals and the CPU attributes they stand for.  N and Z are kept lazily in
+# nz as sim6502 keeps them, see sim6502.cc, and p holds the other flags
+_REGISTERS = (("a", "a"), ("x", "x"), ("y", "y"), ("sp", "sp"), ("p", "flags"),
+              ("nz", "nz"))
+
+# Expressions for whether a flag is set, for the branches
+_FLAG_TESTS = {Flags.NEGATIVE: "nz & 0x180", Flags.ZERO: "not nz & 0xff"}
+
+
+def hexlit(value):
+    # Uninitialized memory reads as -1, which has to survive as a literal
+    if value < 0:
+        return str(value)
+    return "0x%02x" % value
+
+
+class Block(object):
+    """A translated basic block."""
+
+    def __init__(self, start, end, count, max_cycles, code):
+        self.start = start              # address of the first instruction
+        self.end = end                  # address after the last instruction
+        self.count = count              # number of instructions
+        self.max_cycles = max_cycles    # most cycles it can take
+        # function(cpu, mem, read, write, code_pages, cache) that runs the
+        # block and returns the number of instructions it executed
+        self.code = code
+
+
+class BlockWriter(object):
+    """Writes the Python source for one block.
+
+    Tracks which register locals differ from the CPU, and the base cycles
+    of the instructions written so far, so that it only stores back what
+    has changed.
+    """
+
+    def __init__(self, cpu, direct):
+        self.cpu = cpu
+        # No interceptors anywhere, so memory can be indexed directly
+        self.direct = direct
+        # Direct stores also have to mark ByteMemoryMap's initialized bitmap
+        self.bitmap = isinstance(cpu.memory_map, ByteMemoryMap)
+        self.lines = []
+        self.indent = 1
+        self.namespace = {}
+        self.dirty = set()
+        self.synced = False
+        self.cycles = 0
+        self.count = 0
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def set(self, *registers):
+        self.dirty.update(registers)
+        self.synced = False
+
+    def sync_lines(self, pc):
+        lines = []
+        for name, attr in _REGISTERS:
+            if name in self.dirty:
+                lines.append("cpu.%s = %s" % (attr, name))
+        lines.append("cpu.cycles = cycles + %d" % self.cycles)
+        lines.append("cpu.pc = %s" % pc)
+        return lines
+
+    def sync(self):
+        # Make the CPU look as it does while execute() runs this instruction
+        if not self.synced:
+            for line in self.sync_lines(hexlit((self.address + self.length) & 0xffff)):
+                self.emit(line)
+            self.dirty = set()
+            self.synced = True
+
+    def reload(self):
+        for name, attr in _REGISTERS:
+            self.emit("%s = cpu.%s" % (name, attr))
+        self.dirty = set()
+
+    def exit(self, pc):
+        for line in self.sync_lines(pc):
+            self.emit(line)
+        self.emit("return %d" % self.count)
+
+    def read(self, address):
+        if self.direct:
+            return "mem[%s]" % address
+        self.sync()
+        return "read(%s)" % address
+
+    def dummy_read(self, address):
+        # The operand fetchers read the operand of stores and JMP/JSR too, which
+        # only an interceptor could notice
+        if not self.direct:
+            self.emit(self.read(address))
+
+    def write(self, address, value):
+        if self.direct:
+            self.emit("mem[%s] = %s" % (address, value))
+            if address.startswith("0x"):
+                if self.bitmap:
+                    constant = int(address, 16)
+                    self.emit("initialized[%s] |= %s" % (hexlit(constant >> 3),
+                                                         hexlit(1 << (constant & 7))))
+                self.emit("if code_pages[%s]:" % hexlit(int(address, 16) >> 8))
+            else:
+                if self.bitmap:
+                    self.emit("initialized[%s >> 3] |= 1 << (%s & 7)" % (address, address))
+                self.emit("if code_pages[%s >> 8]:" % address)
+            self.emit("    page_written(%s)" % address)
+        else:
+            self.sync()
+            self.emit("write(%s, %s)" % (address, value))
+        self.wrote = True
+
+    def flags_nz(self, value, byte=False, carry=None):
+        # N and Z from value as the handlers set them, see sim6502.cc, which
+        # takes more unless value is known to be a byte, and C from carry
+        # if it is given
+        if carry is not None:
+            self.emit("p = (p & 0xfe) | (1 if %s else 0)" % carry)
+            self.set("p")
+        if byte:
+            self.emit("nz = %s" % value)
+        else:
+            self.emit("nz = %s & 0xff or (1 if %s else 0)" % (value, value))
+        self.set("nz")
+
+    # Operands
+
+    def operand_address(self, mode, operand8, operand16):
+        """Emit code for the effective address, and return its expression."""
+        if mode == "zeropage":
+            return hexlit(operand8)
+        if mode == "absolute":
+            return hexlit(operand16)
+        if mode in ("zeropagex", "zeropagey"):
+            self.emit("ea = (%s + %s) & 0xff" % (hexlit(operand8), mode[-1]))
+        elif mode in ("absolutex", "absolutey"):
+            self.emit("ea = (%s + %s) & 0xffff" % (hexlit(operand16), mode[-1]))
+        elif mode == "zeropageindexedindirectx":
+            self.emit("t = (%s + x) & 0xff" % hexlit(operand8))
+            self.emit("ea = (%s << 8) + %s" % (
+                self.read("(t + 1) & 0xff"), self.read("t")))
+        elif mode in ("zeropageindexedindirecty", "zeropageindirect"):
+            index = " + y" if mode == "zeropageindexedindirecty" else ""
+            self.emit("ea = (%s << 8) + %s%s" % (
+                self.read(hexlit((operand8 + 1) & 0xff)),
+                self.read(hexlit(operand8)), index))
+        else:
+            return None
+        return "ea"
+
+    def operand(self, mode, operand8, operand16):
+        """Emit code that fetches the operand, and return its expression."""
+        if mode == "immediate":
+            return hexlit(operand8)
+        address = self.operand_address(mode, operand8, operand16)
+        if address is None:
+            return None
+        self.emit("v = %s" % self.read(address))
+        return "v"
+
+    # Instructions.  Each emit_* returns False to fall back to calling the
+    # handler, for an addressing mode it does not cover.
+
+    def load(self, register, mode, operand8, operand16):
+        value = self.operand(mode, operand8, operand16)
+        if value is None:
+            return False
+        self.emit("%s = %s" % (register, value))
+        self.set(register)
+        self.flags_nz(register)
+        return True
+
+    def emit_lda(self, mode, operand8, operand16):
+        return self.load("a", mode, operand8, operand16)
+
+    def emit_ldx(self, mode, operand8, operand16):
+        return self.load("x", mode, operand8, operand16)
+
+    def emit_ldy(self, mode, operand8, operand16):
+        return self.load("y", mode, operand8, operand16)
+
+    def store(self, value, mode, operand8, operand16):
+        address = self.operand_address(mode, operand8, operand16)
+        if address is None:
+            return False
+        self.dummy_read(address)
+        self.write(address, value)
+        return True
+
+    def emit_sta(self, mode, operand8, operand16):
+        return self.store("a", mode, operand8, operand16)
+
+    def emit_stx(self, mode, operand8, operand16):
+        return self.store("x", mode, operand8, operand16)
+
+    def emit_sty(self, mode, operand8, operand16):
+        return self.store("y", mode, operand8, operand16)
+
+    def emit_stz(self, mode, operand8, operand16):
+        return self.store("0", mode, operand8, operand16)
+
+    def transfer(self, dest, source, flags=True):
+        self.emit("%s = %s" % (dest, source))
+        self.set(dest)
+        if flags:
+            self.flags_nz(dest)
+        return True
+
+    def emit_tax(self, mode, operand8, operand16):
+        return self.transfer("x", "a")
+
+    def emit_tay(self, mode, operand8, operand16):
+        return self.transfer("y", "a")
+
+    def emit_txa(self, mode, operand8, operand16):
+        return self.transfer("a", "x")
+
+    def emit_tya(self, mode, operand8, operand16):
+        return self.transfer("a", "y")
+
+    def emit_tsx(self, mode, operand8, operand16):
+        return self.transfer("x", "sp")
+
+    def emit_txs(self, mode, operand8, operand16):
+        return self.transfer("sp", "x", flags=False)
+
+    def increment(self, register):
+        self.emit("%s = (%s + 1) %% 256" % (register, register))
+        self.set(register)
+        self.flags_nz(register, byte=True)
+        return True
+
+    def decrement(self, register):
+        self.emit("%s = %s - 1 if %s else 0xff" % (register, register, register))
+        self.set(register)
+        self.flags_nz(register)
+        return True
+
+    def emit_inx(self, mode, operand8, operand16):
+        return self.increment("x")
+
+    def emit_iny(self, mode, operand8, operand16):
+        return self.increment("y")
+
+    def emit_ina(self, mode, operand8, operand16):
+        return self.increment("a")
+
+    def emit_dex(self, mode, operand8, operand16):
+        return self.decrement("x")
+
+    def emit_dey(self, mode, operand8, operand16):
+        return self.decrement("y")
+
+    def emit_dea(self, mode, operand8, operand16):
+        return self.decrement("a")
+
+    def flag(self, mask, value):
+        if value:
+            self.emit("p |= 0x%02x" % mask)
+        else:
+            self.emit("p &= 0x%02x" % (0xff ^ mask))
+        self.set("p")
+        return True
+
+    def emit_clc(self, mode, operand8, operand16):
+        return self.flag(Flags.CARRY, False)
+
+    def emit_sec(self, mode, operand8, operand16):
+        return self.flag(Flags.CARRY, True)
+
+    def emit_cld(self, mode, operand8, operand16):
+        return self.flag(Flags.DECIMAL, False)
+
+    def emit_sed(self, mode, operand8, operand16):
+        return self.flag(Flags.DECIMAL, True)
+
+    def emit_cli(self, mode, operand8, operand16):
+        return self.flag(Flags.INTERRUPT, False)
+
+    def emit_sei(self, mode, operand8, operand16):
+        return self.flag(Flags.INTERRUPT, True)
+
+    def emit_clv(self, mode, operand8, operand16):
+        return self.flag(Flags.OVERFLOW, False)
+
+    def emit_nop(self, mode, operand8, operand16):
+        return True
+
+    def logical(self, op, mode, operand8, operand16):
+        value = self.operand(mode, operand8, operand16)
+        if value is None:
+            return False
+        self.emit("a %s= %s" % (op, value))
+        self.set("a")
+        self.flags_nz("a")
+        return True
+
+    def emit_and(self, mode, operand8, operand16):
+        return self.logical("&", mode, operand8, operand16)
+
+    def emit_ora(self, mode, operand8, operand16):
+        return self.logical("|", mode, operand8, operand16)
+
+    def emit_eor(self, mode, operand8, operand16):
+        return self.logical("^", mode, operand8, operand16)
+
+    def compare(self, register, mode, operand8, operand16):
+        value = self.operand(mode, operand8, operand16)
+        if value is None:
+            return False
+        # SBC with the carry set, as the handler does
+        self.namespace["sbc_binary"] = sim6502.alu_table(sim6502.sbc_binary)
+        self.emit("r = sbc_binary[0x10000 | (%s & 0xff) << 8 | (%s & 0xff)]" % (register, value))
+        self.emit("p = (p & 0xfe) | (r >> 17 & 1)")
+        self.emit("nz = r >> 8 & 0x1ff")
+        self.set("p", "nz")
+        return True
+
+    def emit_cmp(self, mode, operand8, operand16):
+        return self.compare("a", mode, operand8, operand16)
+
+    def emit_cpx(self, mode, operand8, operand16):
+        return self.compare("x", mode, operand8, operand16)
+
+    def emit_cpy(self, mode, operand8, operand16):
+        return self.compare("y", mode, operand8, operand16)
+
+    def emit_bit(self, mode, operand8, operand16):
+        if mode == "immediate":
+            # 65C02 BIT #imm only affects Z
+            self.emit("if a & %s:" % hexlit(operand8))
+            self.emit("    nz = 0x81 if nz & 0x180 else 1")
+            self.emit("else:")
+            self.emit("    nz = 0x100 if nz & 0x180 else 0")
+        else:
+            value = self.operand(mode, operand8, operand16)
+            if value is None:
+                return False
+            self.emit("p = (p & 0xbf) | (%s & 0x40)" % value)
+            self.emit("nz = (%s & 0x80) | 1 if a & %s else (%s & 0x80) << 1" % (
+                value, value, value))
+            self.set("p")
+        self.set("nz")
+        return True
+
+    def shift(self, mode, operand8, operand16, carry, result, byte=True):
+        # carry and result are expressions of the operand v, and byte says
+        # whether the result is always a byte
+        if mode == "accumulator":
+            self.emit("v = a")
+        else:
+            address = self.operand_address(mode, operand8, operand16)
+            if address is None:
+                return False
+            self.emit("v = %s" % self.read(address))
+        self.emit("r = %s" % result)
+        self.flags_nz("r", byte=byte, carry=carry)
+        if mode == "accumulator":
+            self.emit("a = r")
+            self.set("a")
+        else:
+            self.write(address, "r")
+        return True
+
+    def emit_asl(self, mode, operand8, operand16):
+        return self.shift(mode, operand8, operand16, "v & 0x80", "(v & 0x7f) << 1")
+
+    def emit_lsr(self, mode, operand8, operand16):
+        if mode == "accumulator":
+            return self.shift(mode, operand8, operand16, "v & 0x01", "v >> 1", byte=False)
+        return self.shift(mode, operand8, operand16, "v & 0x01", "(v >> 1) & 0xff")
+
+    def emit_rol(self, mode, operand8, operand16):
+        return self.shift(mode, operand8, operand16, "v & 0x80",
+                          "((v << 1) & 0xff) | (p & 0x01)")
+
+    def emit_ror(self, mode, operand8, operand16):
+        if mode == "accumulator":
+            return self.shift(mode, operand8, operand16, "v & 0x01",
+                              "(v >> 1) | (0x80 if p & 0x01 else 0)", byte=False)
+        return self.shift(mode, operand8, operand16, "v & 0x01",
+                          "((v >> 1) % 256) | (0x80 if p & 0x01 else 0)")
+
+    def modify(self, mode, operand8, operand16, result, byte):
+        address = self.operand_address(mode, operand8, operand16)
+        if address is None:
+            return False
+        self.emit("v = %s" % self.read(address))
+        self.emit("r = %s" % result)
+        self.flags_nz("r", byte=byte)
+        self.write(address, "r")
+        return True
+
+    def emit_inc(self, mode, operand8, operand16):
+        if mode == "accumulator":
+            return self.increment("a")
+        return self.modify(mode, operand8, operand16, "(v + 1) % 256", byte=True)
+
+    def emit_dec(self, mode, operand8, operand16):
+        if mode == "accumulator":
+            return self.decrement("a")
+        return self.modify(mode, operand8, operand16, "v - 1 if v else 0xff", byte=False)
+
+    def arithmetic(self, mode, operand8, operand16, binary):
+        # Decimal mode stays with the handler, so its tables are only built
+        # for programs that use it
+        self.emit("if p & 0x%02x:" % Flags.DECIMAL)
+        self.indent += 1
+        dirty, synced = set(self.dirty), self.synced
+        self.call()
+        self.reload()
+        self.indent -= 1
+        self.emit("else:")
+        self.indent += 1
+        self.dirty, self.synced = dirty, synced
+        # Looks the result up as the handler does, see sim6502.alu_table()
+        self.namespace[binary.__name__] = sim6502.alu_table(binary)
+        value = self.operand(mode, operand8, operand16)
+        self.emit("r = %s[(p & 0x01) << 16 | (a & 0xff) << 8 | (%s & 0xff)]"
+                  % (binary.__name__, value))
+        self.emit("p = (p & 0xbe) | r >> 17")
+        self.emit("a = r & 0xff")
+        self.emit("nz = r >> 8 & 0x1ff")
+        self.indent -= 1
+        self.set("a", "p", "nz")
+        return True
+
+    def emit_adc(self, mode, operand8, operand16):
+        if mode not in self.ARITHMETIC_MODES:
+            return False
+        return self.arithmetic(mode, operand8, operand16, sim6502.adc_binary)
+
+    def emit_sbc(self, mode, operand8, operand16):
+        if mode not in self.ARITHMETIC_MODES:
+            return False
+        return self.arithmetic(mode, operand8, operand16, sim6502.sbc_binary)
+
+    ARITHMETIC_MODES = frozenset((
+        "immediate", "zeropage", "zeropagex", "absolute", "absolutex",
+        "absolutey", "zeropageindexedindirectx", "zeropageindexedindirecty",
+        "zeropageindirect"))
+
+    def push(self, value):
+        self.emit("ea = 0x100 + sp")
+        self.write("ea", value)
+        self.emit("sp = sp - 1 if sp else 0xff")
+        self.set("sp")
+        return True
+
+    def emit_pha(self, mode, operand8, operand16):
+        return self.push("a")
+
+    def emit_phx(self, mode, operand8, operand16):
+        return self.push("x")
+
+    def emit_phy(self, mode, operand8, operand16):
+        return self.push("y")
+
+    def emit_php(self, mode, operand8, operand16):
+        return self.push("p | 0x%02x | (0x80 if nz & 0x180 else 0) | (0 if nz & 0xff else 2)" % (
+            Flags.BREAK | Flags.UNUSED))
+
+    def pull(self, register):
+        self.emit("sp = (sp + 1) % 256")
+        self.set("sp")
+        self.emit("%s = %s" % (register, self.read("0x100 + sp")))
+        self.set(register)
+        self.flags_nz(register)
+        return True
+
+    def emit_pla(self, mode, operand8, operand16):
+        return self.pull("a")
+
+    def emit_plx(self, mode, operand8, operand16):
+        return self.pull("x")
+
+    def emit_ply(self, mode, operand8, operand16):
+        return self.pull("y")
+
+    # Terminators write their own exit
+
+    def branch(self, mask, taken, operand8):
+        nextpc = (self.address + 2) & 0xffff
+        target = self.cpu.relative_address(operand8, nextpc)
+        extra = 2 if (target ^ nextpc) & 0xff00 else 1
+        for name, attr in _REGISTERS:
+            if name in self.dirty:
+                self.emit("cpu.%s = %s" % (attr, name))
+        if mask:
+            test = _FLAG_TESTS.get(mask, "p & 0x%02x" % mask)
+            self.emit("if %s:" % (test if taken else "not (%s)" % test))
+            self.indent += 1
+        self.emit("cpu.pc = %s" % hexlit(target))
+        self.emit("cpu.cycles = cycles + %d" % (self.cycles + extra))
+        if mask:
+            self.indent -= 1
+            self.emit("else:")
+            self.emit("    cpu.pc = %s" % hexlit(nextpc))
+            self.emit("    cpu.cycles = cycles + %d" % self.cycles)
+        self.emit("return %d" % self.count)
+
+    def emit_jmp(self, mode, operand8, operand16):
+        if mode != "absolute":
+            return False
+        self.dummy_read(hexlit(operand16))
+        self.exit(hexlit(operand16))
+        return True
+
+    def emit_jsr(self, mode, operand8, operand16):
+        self.dummy_read(hexlit(operand16))
+        # pushaddr() does not wrap SP
+        ret = self.address + 2
+        self.emit("ea = 0x100 + sp")
+        self.write("ea", hexlit((ret & 0xff00) >> 8))
+        self.emit("sp -= 1")
+        self.set("sp")
+        self.emit("ea = 0x100 + sp")
+        self.write("ea", hexlit(ret & 0xff))
+        self.emit("sp -= 1")
+        self.set("sp")
+        self.exit(hexlit(operand16))
+        return True
+
+    def emit_rts(self, mode, operand8, operand16):
+        # Nor does pulladdr()
+        self.emit("sp += 1")
+        self.set("sp")
+        self.emit("lo = %s" % self.read("0x100 + sp"))
+        self.emit("sp += 1")
+        self.set("sp")
+        self.emit("hi = %s" % self.read("0x100 + sp"))
+        self.exit("(lo + (hi << 8) + 1) % 0x10000")
+        return True
+
+    def call(self):
+        """Emit a call to the handler for the current instruction."""
+        name = "h%d" % self.count
+        self.namespace[name] = self.handler
+        self.namespace["f%d" % self.count] = self.cpu.operand_table[self.opcode]
+        self.sync()
+        self.emit("%s(cpu, f%d, %s, %s, %s)" % (
+            name, self.count, hexlit(self.opcode), hexlit(self.operand8),
+            hexlit(self.operand16)))
+        self.synced = False
+
+    def penalties(self, penalty):
+        # Page-crossing and decimal penalties, from the registers going in
+        if penalty & (Penalty.PAGE_X | Penalty.PAGE_Y):
+            # Registers hold bytes, so a zero low byte never crosses
+            if self.operand16 & 0xff:
+                self.emit("if %s > 0x%02x:" % (
+                    "x" if penalty & Penalty.PAGE_X else "y",
+                    0xff - (self.operand16 & 0xff)))
+                self.emit("    cycles += 1")
+        elif penalty & Penalty.PAGE_INDIRECT_Y:
+            self.emit("if mem[%s] + y > 0xff:" % hexlit(self.operand8))
+            self.emit("    cycles += 1")
+        if penalty & Penalty.DECIMAL:
+            self.emit("if p & 0x%02x:" % Flags.DECIMAL)
+            self.emit("    cycles += 1")
+
+    def instruction(self, address, opcode, operand8, operand16, length):
+        """Write one instruction.  Returns True if it ended the block."""
+        cpu = self.cpu
+        handler, mode = cpu.dispatch[opcode]
+        name = handler.__name__[len("instr_"):]
+        self.handler, self.mode = handler, mode
+        self.address, self.opcode, self.length = address, opcode, length
+        self.operand8, self.operand16 = operand8, operand16
+        self.synced = False
+        self.wrote = False
+        self.count += 1
+        self.emit("# $%04x %s %s" % (address, name, mode))
+
+        penalty = cpu.penalty_table[opcode]
+        if not penalty & Penalty.BRANCH:
+            self.penalties(penalty)
+        self.cycles += cpu.cycle_table[opcode]
+
+        # Only inline the stock handlers, so a subclass that overrides one
+        # still gets it called
+        template = None
+        if handler is getattr(sim6502.sim6502, handler.__name__, None):
+            if mode == "relative":
+                mask, taken = cpu.branch_conditions[opcode]
+                self.branch(mask, taken, operand8)
+                return True
+            template = getattr(self, "emit_" + name, None)
+        if template is None or not template(mode, operand8, operand16):
+            self.call()
+            if name in TERMINATORS:
+                self.emit("return %d" % self.count)
+                return True
+            self.reload()
+            self.wrote = True
+        if name in TERMINATORS:
+            return True
+        if self.wrote:
+            # The write may have hit translated code, this block included
+            self.emit("if cache.stale:")
+            self.indent += 1
+            self.exit(hexlit((address + length) & 0xffff))
+            self.indent -= 1
+        return False
+
+    def source(self, end):
+        """The finished function, for a block that falls through to end."""
+        if end is not None:
+            self.exit(hexlit(end & 0xffff))
+        body = "\n".join(self.lines)
+        lines = ["def block(cpu, mem, read, write, code_pages, cache):"]
+        for name, attr in _REGISTERS:
+            if re.search(r"(?<![\w.])%s\b" % name, body):
+                lines.append("    %s = cpu.%s" % (name, attr))
+        lines.append("    cycles = cpu.cycles")
+        if "initialized[" in body:
+            lines.append("    initialized = cpu.memory_map._initialized")
+        if "page_written(" in body:
+            lines.append("    page_written = cpu.memory_map.PageWritten")
+        return "\n".join(lines) + "\n" + body + "\n"
+
+
+class BlockCache(object):
+    """Translated blocks for one simulator, keyed by entry address."""
+
+    def __init__(self, cpu, threshold=DEFAULT_THRESHOLD):
+        self.cpu = cpu
+        self.threshold = threshold
+        # Entry address -> Block, or False where no block can start
+        self.blocks = {}
+        # Times run() reached each address not yet translated
+        self.visits = {}
+        # Page -> entry addresses of the blocks touching it
+        self.page_blocks = {}
+        # Set when a write drops a block, so the running one can return
+        self.stale = False
+        self.stops = frozenset()
+        self.direct = None
+
+    def prepare(self, stops):
+        """Get ready for a run() that stops at these addresses.
+
+        Returns False if blocks can't be used at all, which is while a
+        default interceptor watches every address, an AccessTrace records
+        every access or a watchpoint has to stop the run mid-block.
+        """
+        memory_map = self.cpu.memory_map
+        if (memory_map.default_interceptor or memory_map.trace is not None or
+                memory_map.watchpoints):
+            return False
+        direct = not any(memory_map.intercept_pages)
+        if direct != self.direct:
+            self.flush()
+            self.direct = direct
+        # A block must not run through a stop address
+        for address in stops - self.stops:
+            self.drop_range(address, address + 1, keep_start=True)
+        self.stops = stops
+        return True
+
+    def flush(self):
+        """Forget every block.  Until prepare() is called again, run() uses
+        none, since interceptors may have come or gone."""
+        code_pages = self.cpu.memory_map.code_pages
+        for page in self.page_blocks:
+            code_pages[page] &= ~CODE_TRANSLATED
+        # Cleared in place, since run() holds on to blocks
+        self.blocks.clear()
+        self.visits.clear()
+        self.page_blocks.clear()
+        self.direct = None
+
+    def visit(self, address):
+        """Count a visit to address, and return its Block once it's hot."""
+        count = self.visits.get(address, 0) + 1
+        if count < self.threshold:
+            self.visits[address] = count
+            return None
+        self.visits.pop(address, None)
+        block = self.translate(address)
+        if block is None:
+            self.add(address, address + 1, False)
+        else:
+            self.add(block.start, block.end, block)
+        return block
+
+    def add(self, start, end, block):
+        code_pages = self.cpu.memory_map.code_pages
+        self.blocks[start] = block
+        for page in range(start >> 8, ((end - 1) >> 8) + 1):
+            self.page_blocks.setdefault(page, set()).add(start)
+            code_pages[page] |= CODE_TRANSLATED
+
+    def drop_range(self, low, high, keep_start=False):
+        """Drop every block with code in low <= address < high."""
+        for page in range(low >> 8, ((high - 1) >> 8) + 1):
+            starts = self.page_blocks.get(page)
+            if not starts:
+                continue
+            for start in list(starts):
+                block = self.blocks[start]
+                end = block.end if block else start + 1
+                if start < high and low < end and not (keep_start and start == low):
+                    self.remove(start, end)
+                    self.stale = True
+
+    def remove(self, start, end):
+        code_pages = self.cpu.memory_map.code_pages
+        del self.blocks[start]
+        for page in range(start >> 8, ((end - 1) >> 8) + 1):
+            starts = self.page_blocks[page]
+            starts.discard(start)
+            if not starts:
+                del self.page_blocks[page]
+                code_pages[page] &= ~CODE_TRANSLATED
+
+    def invalidate(self, address):
+        """Drop the blocks that include address, which has been written."""
+        self.drop_range(address, address + 1)
+
+    def decode(self, start):
+        # The instructions of the block at start, as
+        # (address, opcode, operand8, operand16, length)
+        cpu = self.cpu
+        memory_map = cpu.memory_map
+        peek = memory_map.Peek
+        intercepted = memory_map.InterceptorFor
+        instructions = []
+        address = start
+        while len(instructions) < MAX_BLOCK_LENGTH:
+            if address != start and address in self.stops or address > 0xffff:
+                break
+            opcode = peek(address)
+            # BRK, and anything run() would stop on, is left to run()
+            if not (0 < opcode < 256) or cpu.dispatch[opcode] is None:
+                break
+            handler, mode = cpu.dispatch[opcode]
+            length = MODE_LENGTHS[mode]
+            # Only the instruction's own bytes are fetched
+            if address + length > 0x10000:
+                break
+            if any(intercepted(address + i) for i in range(length)):
+                break
+            operand8 = operand16 = 0
+            if length > 1:
+                operand8 = operand16 = peek(address + 1)
+            if length > 2:
+                operand16 += (peek(address + 2) << 8) & 0xff00
+            instructions.append((address, opcode, operand8, operand16, length))
+            address += length
+            if handler.__name__[len("instr_"):] in TERMINATORS:
+                break
+        return instructions
+
+    def translate(self, start):
+        """Translate the block at start, or return None if there isn't one."""
+        cpu = self.cpu
+        instructions = self.decode(start)
+        if not instructions:
+            return None
+        last = instructions[-1]
+        end = last[0] + last[4]
+        peek = cpu.memory_map.Peek
+        key = (type(cpu), type(cpu.memory_map), cpu.variant, self.direct, start,
+               tuple(peek(address) for address in range(start, end)))
+        entry = _compiled.get(key)
+        if entry is None:
+            writer = BlockWriter(cpu, self.direct)
+            max_cycles = 0
+            ended = False
+            for address, opcode, operand8, operand16, length in instructions:
+                ended = writer.instruction(address, opcode, operand8, operand16, length)
+                penalty = cpu.penalty_table[opcode]
+                max_cycles += cpu.cycle_table[opcode]
+                if penalty & Penalty.BRANCH:
+                    max_cycles += 2
+                else:
+                    if penalty & (Penalty.PAGE_X | Penalty.PAGE_Y | Penalty.PAGE_INDIRECT_Y):
+                        max_cycles += 1
+                    if penalty & Penalty.DECIMAL:
+                        max_cycles += 1
+            source = writer.source(None if ended else end)
+            namespace = writer.namespace
+            exec(compile(source, "<block $%04x>" % start, "exec"), namespace)
+            entry = (namespace["block"], max_cycles)
+            if len(_compiled) >= _COMPILED_LIMIT:
+                _compiled.clear()
+            _compiled[key] = entry
+        code, max_cycles = entry
+        return Block(start, end, len(instructions), max_cycles, code)
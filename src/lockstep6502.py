@@ -0,0 +1,611 @@
+"""Many 6502s stepped in lockstep with NumPy.
+
+Lockstep keeps the registers of N simulated CPUs in NumPy arrays, one
+element per lane, and their memories in an N x 64K array.  Each step
+fetches the instruction at every running lane's PC, then carries out each
+distinct opcode once for all the lanes that fetched it, so lanes whose
+PCs have diverged still advance together.
+
+Instructions are carried out by vectorized copies of the sim6502
+handlers.  ADC and SBC look their results up in the same tables as
+sim6502, in both binary and decimal mode.  Instructions without a
+vectorized copy (BRK when it doesn't stop the run, RTI, the indirect
+JMPs) and the odd case a copy doesn't cover are handed to sim6502 one
+lane at a time.
+Each lane therefore ends up where a sim6502 would, cycle count included.
+
+    lanes = Lockstep(len(values), a.object_code)
+    lanes.pc[:] = a.symbols["start"]
+    lanes.a[:] = values
+    stops = lanes.run(until_pc=a.symbols["done"])
+
+Memory that was never written reads as 0, as with
+sim6502(compact_memory=True), and the PC wraps at $FFFF.  Each lane has
+64KB of memory, but on most systems the pages no lane touches take no
+RAM.
+"""
+
+import numpy
+
+import sim6502
+from sim6502 import Flags, Penalty, StopReason, MODE_LENGTHS
+
+NZ = Flags.NEGATIVE | Flags.ZERO
+NVZC = Flags.NEGATIVE | Flags.OVERFLOW | Flags.ZERO | Flags.CARRY
+
+
+def alu_array(table):
+    """A sim6502.alu_table() as an array indexed by [carry, a, operand]."""
+    return numpy.asarray(table).reshape(2, 256, 256)
+
+
+class Stops(object):
+    """Why each lane stopped, as returned by Lockstep.run().
+
+    reason, pc, steps and cycles are arrays with an element per lane,
+    holding what a StopReason holds for a single sim6502.
+    """
+
+    def __init__(self, reason, pc, steps, cycles):
+        self.reason = reason
+        self.pc = pc
+        self.steps = steps
+        self.cycles = cycles
+
+    def __len__(self):
+        return len(self.reason)
+
+    def __getitem__(self, lane):
+        return StopReason(self.reason[lane], int(self.pc[lane]),
+                          int(self.steps[lane]), int(self.cycles[lane]))
+
+
+class Lockstep(object):
+    """N simulated 6502s of the same variant, stepped together.
+
+    The registers pc, a, x, y, sp and cc and the cycle count are arrays
+    with an element per lane, and memory is an array of N rows of 64K,
+    all free to be read and written between runs.
+    """
+
+    def __init__(self, n, object_code=None, address=0x0, variant=sim6502.sim6502.CMOS):
+        self.n = n
+        # Supplies the dispatch and cycle tables, and runs the instructions
+        # that have no vectorized version, one lane at a time
+        self.cpu = sim6502.sim6502(variant=variant, compact_memory=True)
+        self.variant = variant
+
+        self.memory = numpy.zeros((n, 0x10000), numpy.uint8)
+        if object_code is not None:
+            self.load(address, object_code)
+
+        self.pc = numpy.zeros(n, numpy.int64)
+        self.a = numpy.zeros(n, numpy.int64)
+        self.x = numpy.zeros(n, numpy.int64)
+        self.y = numpy.zeros(n, numpy.int64)
+        self.sp = numpy.full(n, 0xff, numpy.int64)
+        self.cc = numpy.zeros(n, numpy.int64)
+        self.cycles = numpy.zeros(n, numpy.int64)
+
+        self.build_tables()
+
+    def build_tables(self):
+        cpu = self.cpu
+        self.valid = numpy.array([entry is not None for entry in cpu.dispatch])
+        self.cycle_table = numpy.array(cpu.cycle_table, numpy.int64)
+        self.penalty_table = numpy.array(cpu.penalty_table, numpy.int64)
+        self.branch_mask = numpy.zeros(256, numpy.int64)
+        self.branch_taken = numpy.zeros(256, numpy.int64)
+        for opcode, (mask, taken) in cpu.branch_conditions.items():
+            self.branch_mask[opcode] = mask
+            self.branch_taken[opcode] = taken
+        self.adc_binary = alu_array(sim6502.alu_table(sim6502.adc_binary))
+        self.sbc_binary = alu_array(sim6502.alu_table(sim6502.sbc_binary))
+        self.adc_decimal = alu_array(sim6502.alu_table(sim6502.adc_decimal, self.variant))
+        self.sbc_decimal = alu_array(sim6502.alu_table(sim6502.sbc_decimal, self.variant))
+        # opcode -> (vectorized handler or None, addrmode, length)
+        self.kernels = [None] * 256
+        for opcode, entry in enumerate(cpu.dispatch):
+            if entry is None:
+                continue
+            handler, addrmode = entry
+            name = handler.__name__
+            kernel = getattr(self, "vector_" + name[6:], None)
+            # Only the stock handlers have vectorized copies
+            if handler is not getattr(sim6502.sim6502, name, None):
+                kernel = None
+            if name == "instr_jmp" and addrmode != "absolute":
+                kernel = None
+            self.kernels[opcode] = (kernel, addrmode, MODE_LENGTHS[addrmode])
+
+    def load(self, address, data):
+        """Store data at address in every lane's memory.
+
+        data is a sequence of bytes for all lanes alike, in which values
+        outside 0-255 (such as asm6502's -1 for unused) are skipped, or a
+        2-D array with a row for each lane.
+        """
+        data = numpy.asarray(data)
+        if data.ndim == 2:
+            self.memory[:, address:address + data.shape[1]] = data
+            return
+        used = numpy.flatnonzero((data >= 0) & (data < 256))
+        self.memory[:, address + used] = data[used]
+
+    def run(self, max_steps=None, until_pc=None, stop_on_brk=True, max_cycles=None):
+        """Run every lane until it meets a stop condition.
+
+        Takes the same arguments as sim6502.run(), which apply to each lane
+        on its own, and returns their Stops once every lane has stopped.
+        """
+        if until_pc is None:
+            stops = None
+        elif isinstance(until_pc, int):
+            stops = numpy.array([until_pc])
+        else:
+            stops = numpy.array(sorted(until_pc))
+        if max_steps is None:
+            max_steps = float("inf")
+        start_cycles = self.cycles.copy()
+
+        reason = numpy.full(self.n, None, object)
+        steps = numpy.zeros(self.n, numpy.int64)
+        lanes = numpy.arange(self.n)
+        step = 0
+        while len(lanes):
+            pc = self.pc[lanes]
+            stopped = numpy.zeros(len(lanes), bool)
+            if stops is not None:
+                at = numpy.isin(pc, stops)
+                reason[lanes[at]] = StopReason.PC
+                stopped |= at
+            if step >= max_steps:
+                reason[lanes[~stopped]] = StopReason.STEPS
+                stopped[:] = True
+            if max_cycles is not None:
+                over = ~stopped & (self.cycles[lanes] - start_cycles[lanes] >= max_cycles)
+                reason[lanes[over]] = StopReason.CYCLES
+                stopped |= over
+            opcode = self.memory[lanes, pc].astype(numpy.int64)
+            invalid = ~stopped & ~self.valid[opcode]
+            reason[lanes[invalid]] = StopReason.NOT_INSTRUCTION
+            stopped |= invalid
+            if stop_on_brk:
+                brk = ~stopped & (opcode == 0x00)
+                reason[lanes[brk]] = StopReason.BRK
+                stopped |= brk
+            if stopped.any():
+                going = ~stopped
+                lanes, pc, opcode = lanes[going], pc[going], opcode[going]
+                if not len(lanes):
+                    break
+            self.step(lanes, pc, opcode)
+            steps[lanes] += 1
+            step += 1
+        return Stops(reason, self.pc.copy(), steps, self.cycles - start_cycles)
+
+    def step(self, lanes, pc, opcode):
+        """Execute one instruction on each of lanes, which are at pc and
+        have fetched opcode."""
+        memory = self.memory
+        operand8 = memory[lanes, (pc + 1) & 0xffff].astype(numpy.int64)
+        operand16 = operand8 | (memory[lanes, (pc + 2) & 0xffff].astype(numpy.int64) << 8)
+        self.cycles[lanes] += self.cycle_table[opcode] + self.penalty_cycles(
+            lanes, pc, opcode, operand8, operand16)
+
+        distinct = numpy.unique(opcode)
+        for op in distinct:
+            if len(distinct) == 1:
+                these, lanes_op, pc_op, op8, op16 = slice(None), lanes, pc, operand8, operand16
+            else:
+                these = numpy.flatnonzero(opcode == op)
+                lanes_op, pc_op = lanes[these], pc[these]
+                op8, op16 = operand8[these], operand16[these]
+            kernel, addrmode, length = self.kernels[op]
+            if kernel is None:
+                self.scalar(lanes_op, pc_op, op, op8, op16)
+                continue
+            self.pc[lanes_op] = (pc_op + length) & 0xffff
+            rest = kernel(lanes_op, addrmode, op8, op16)
+            if rest is not None and rest.any():
+                self.scalar(lanes_op[rest], pc_op[rest], op, op8[rest], op16[rest])
+
+    def penalty_cycles(self, lanes, pc, opcode, operand8, operand16):
+        # The vectorized sim6502.penalty_cycles()
+        penalty = self.penalty_table[opcode]
+        if not penalty.any():
+            return 0
+        x, y, cc = self.x[lanes], self.y[lanes], self.cc[lanes]
+        low = operand16 & 0xff
+        extra = (((penalty & Penalty.PAGE_X) != 0) & (low + x > 0xff)).astype(numpy.int64)
+        extra += ((penalty & Penalty.PAGE_Y) != 0) & (low + y > 0xff)
+        indirect = (penalty & Penalty.PAGE_INDIRECT_Y) != 0
+        if indirect.any():
+            extra += indirect & (self.memory[lanes, operand8] + y > 0xff)
+        extra += ((penalty & Penalty.DECIMAL) != 0) & ((cc & Flags.DECIMAL) != 0)
+        branch = (penalty & Penalty.BRANCH) != 0
+        if branch.any():
+            taken = branch & ((cc & self.branch_mask[opcode]) == self.branch_taken[opcode])
+            nextpc = pc + 2
+            target = self.relative(operand8, nextpc)
+            extra += taken
+            extra += taken & (((target ^ nextpc) & 0xff00) != 0)
+        return extra
+
+    def scalar(self, lanes, pc, opcode, operand8, operand16):
+        # Run the sim6502 handler for each lane in turn, on a view of the
+        # lane's memory
+        cpu = self.cpu
+        handler = cpu.dispatch[opcode][0]
+        fetch = cpu.operand_table[opcode]
+        length = cpu.length_table[opcode]
+        for i, lane in enumerate(lanes):
+            cpu.memory_map.Rebind(self.memory[lane].data)
+            cpu.a, cpu.x, cpu.y = int(self.a[lane]), int(self.x[lane]), int(self.y[lane])
+            cpu.sp, cpu.cc = int(self.sp[lane]), int(self.cc[lane])
+            # On the next instruction, as execute() leaves it for the handler
+            cpu.pc = (int(pc[i]) + length) & 0xffff
+            handler(cpu, fetch, opcode, int(operand8[i]), int(operand16[i]))
+            self.pc[lane] = cpu.pc & 0xffff
+            self.a[lane], self.x[lane], self.y[lane] = cpu.a, cpu.x, cpu.y
+            self.sp[lane], self.cc[lane] = cpu.sp, cpu.cc
+
+    # Operands and flags, for the lanes running one opcode
+
+    def relative(self, operand8, address):
+        return address + operand8 - ((operand8 & 0x80) << 1)
+
+    def read(self, lanes, address):
+        return self.memory[lanes, address].astype(numpy.int64)
+
+    def address(self, lanes, addrmode, operand8, operand16):
+        if addrmode == "zeropage":
+            return operand8
+        if addrmode == "zeropagex":
+            return (operand8 + self.x[lanes]) & 0xff
+        if addrmode == "zeropagey":
+            return (operand8 + self.y[lanes]) & 0xff
+        if addrmode == "absolute":
+            return operand16
+        if addrmode == "absolutex":
+            return (operand16 + self.x[lanes]) & 0xffff
+        if addrmode == "absolutey":
+            return (operand16 + self.y[lanes]) & 0xffff
+        if addrmode == "zeropageindexedindirectx":
+            pointer = (operand8 + self.x[lanes]) & 0xff
+        else:
+            pointer = operand8
+        address = self.read(lanes, pointer) | (self.read(lanes, (pointer + 1) & 0xff) << 8)
+        if addrmode == "zeropageindexedindirecty":
+            address = (address + self.y[lanes]) & 0xffff
+        return address
+
+    def operand(self, lanes, addrmode, operand8, operand16):
+        if addrmode == "immediate":
+            return operand8, None
+        if addrmode == "accumulator":
+            return self.a[lanes], None
+        address = self.address(lanes, addrmode, operand8, operand16)
+        return self.read(lanes, address), address
+
+    def flags(self, lanes, mask, bits):
+        self.cc[lanes] = (self.cc[lanes] & (0xff ^ mask)) | bits
+
+    def flag(self, lanes, mask, truth):
+        self.flags(lanes, mask, numpy.where(truth, mask, 0))
+
+    def nz_bits(self, value):
+        return (value & Flags.NEGATIVE) | numpy.where(value == 0, Flags.ZERO, 0)
+
+    def nz(self, lanes, value):
+        self.flags(lanes, NZ, self.nz_bits(value))
+
+    def shift_result(self, lanes, addrmode, address, result, carry):
+        if address is None:
+            self.a[lanes] = result
+        else:
+            self.memory[lanes, address] = result
+        self.flags(lanes, NZ | Flags.CARRY,
+                   self.nz_bits(result) | numpy.where(carry, Flags.CARRY, 0))
+
+    # Vectorized copies of the sim6502 instr_* handlers.  Each gets the
+    # lanes running its opcode, with their PCs already moved past it, and
+    # may return a mask of those lanes to hand to the sim6502 handler
+    # instead; it must leave them untouched.
+
+    def vector_lda(self, lanes, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        self.a[lanes] = value
+        self.nz(lanes, value)
+
+    def vector_ldx(self, lanes, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        self.x[lanes] = value
+        self.nz(lanes, value)
+
+    def vector_ldy(self, lanes, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        self.y[lanes] = value
+        self.nz(lanes, value)
+
+    def vector_sta(self, lanes, addrmode, operand8, operand16):
+        self.memory[lanes, self.address(lanes, addrmode, operand8, operand16)] = self.a[lanes]
+
+    def vector_stx(self, lanes, addrmode, operand8, operand16):
+        self.memory[lanes, self.address(lanes, addrmode, operand8, operand16)] = self.x[lanes]
+
+    def vector_sty(self, lanes, addrmode, operand8, operand16):
+        self.memory[lanes, self.address(lanes, addrmode, operand8, operand16)] = self.y[lanes]
+
+    def vector_stz(self, lanes, addrmode, operand8, operand16):
+        self.memory[lanes, self.address(lanes, addrmode, operand8, operand16)] = 0
+
+    def vector_and(self, lanes, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        result = self.a[lanes] & value
+        self.a[lanes] = result
+        self.nz(lanes, result)
+
+    def vector_ora(self, lanes, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        result = self.a[lanes] | value
+        self.a[lanes] = result
+        self.nz(lanes, result)
+
+    def vector_eor(self, lanes, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        result = self.a[lanes] ^ value
+        self.a[lanes] = result
+        self.nz(lanes, result)
+
+    def arithmetic(self, lanes, addrmode, operand8, operand16, binary, decimal):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        a, cc = self.a[lanes], self.cc[lanes]
+        index = (cc & Flags.CARRY, a, value)
+        entry = numpy.where((cc & Flags.DECIMAL) != 0, decimal[index], binary[index])
+        # Laid out as in sim6502.alu_table()
+        nz = (entry >> 8) & 0x1ff
+        flags = (numpy.where(nz & 0x180, Flags.NEGATIVE, 0) |
+                 numpy.where(nz & 0xff, 0, Flags.ZERO) | (entry >> 17))
+        self.a[lanes] = entry & 0xff
+        self.cc[lanes] = (cc & (0xff ^ NVZC)) | flags
+
+    def vector_adc(self, lanes, addrmode, operand8, operand16):
+        self.arithmetic(lanes, addrmode, operand8, operand16,
+                        self.adc_binary, self.adc_decimal)
+
+    def vector_sbc(self, lanes, addrmode, operand8, operand16):
+        self.arithmetic(lanes, addrmode, operand8, operand16,
+                        self.sbc_binary, self.sbc_decimal)
+
+    def compare(self, lanes, register, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        result = (register - value) & 0xff
+        self.flags(lanes, NZ | Flags.CARRY,
+                   self.nz_bits(result) | numpy.where(register >= value, Flags.CARRY, 0))
+
+    def vector_cmp(self, lanes, addrmode, operand8, operand16):
+        self.compare(lanes, self.a[lanes], addrmode, operand8, operand16)
+
+    def vector_cpx(self, lanes, addrmode, operand8, operand16):
+        self.compare(lanes, self.x[lanes], addrmode, operand8, operand16)
+
+    def vector_cpy(self, lanes, addrmode, operand8, operand16):
+        self.compare(lanes, self.y[lanes], addrmode, operand8, operand16)
+
+    def vector_bit(self, lanes, addrmode, operand8, operand16):
+        value, _ = self.operand(lanes, addrmode, operand8, operand16)
+        zero = numpy.where((self.a[lanes] & value) == 0, Flags.ZERO, 0)
+        if addrmode == "immediate":
+            self.flags(lanes, Flags.ZERO, zero)
+        else:
+            self.flags(lanes, Flags.NEGATIVE | Flags.OVERFLOW | Flags.ZERO,
+                       zero | (value & (Flags.NEGATIVE | Flags.OVERFLOW)))
+
+    def modify(self, lanes, addrmode, operand8, operand16, delta):
+        value, address = self.operand(lanes, addrmode, operand8, operand16)
+        result = (value + delta) & 0xff
+        self.memory[lanes, address] = result
+        self.nz(lanes, result)
+
+    def vector_inc(self, lanes, addrmode, operand8, operand16):
+        self.modify(lanes, addrmode, operand8, operand16, 1)
+
+    def vector_dec(self, lanes, addrmode, operand8, operand16):
+        self.modify(lanes, addrmode, operand8, operand16, -1)
+
+    def step_register(self, lanes, register, delta):
+        result = (register[lanes] + delta) & 0xff
+        register[lanes] = result
+        self.nz(lanes, result)
+
+    def vector_inx(self, lanes, addrmode, operand8, operand16):
+        self.step_register(lanes, self.x, 1)
+
+    def vector_iny(self, lanes, addrmode, operand8, operand16):
+        self.step_register(lanes, self.y, 1)
+
+    def vector_ina(self, lanes, addrmode, operand8, operand16):
+        self.step_register(lanes, self.a, 1)
+
+    def vector_dex(self, lanes, addrmode, operand8, operand16):
+        self.step_register(lanes, self.x, -1)
+
+    def vector_dey(self, lanes, addrmode, operand8, operand16):
+        self.step_register(lanes, self.y, -1)
+
+    def vector_dea(self, lanes, addrmode, operand8, operand16):
+        self.step_register(lanes, self.a, -1)
+
+    def vector_asl(self, lanes, addrmode, operand8, operand16):
+        value, address = self.operand(lanes, addrmode, operand8, operand16)
+        self.shift_result(lanes, addrmode, address, (value << 1) & 0xff, value & 0x80)
+
+    def vector_lsr(self, lanes, addrmode, operand8, operand16):
+        value, address = self.operand(lanes, addrmode, operand8, operand16)
+        self.shift_result(lanes, addrmode, address, value >> 1, value & 0x01)
+
+    def vector_rol(self, lanes, addrmode, operand8, operand16):
+        value, address = self.operand(lanes, addrmode, operand8, operand16)
+        carry = self.cc[lanes] & Flags.CARRY
+        self.shift_result(lanes, addrmode, address, ((value << 1) & 0xff) | carry, value & 0x80)
+
+    def vector_ror(self, lanes, addrmode, operand8, operand16):
+        value, address = self.operand(lanes, addrmode, operand8, operand16)
+        carry = self.cc[lanes] & Flags.CARRY
+        self.shift_result(lanes, addrmode, address, (value >> 1) | (carry << 7), value & 0x01)
+
+    def transfer(self, lanes, source, destination, flags=True):
+        value = source[lanes]
+        destination[lanes] = value
+        if flags:
+            self.nz(lanes, value)
+
+    def vector_tax(self, lanes, addrmode, operand8, operand16):
+        self.transfer(lanes, self.a, self.x)
+
+    def vector_tay(self, lanes, addrmode, operand8, operand16):
+        self.transfer(lanes, self.a, self.y)
+
+    def vector_txa(self, lanes, addrmode, operand8, operand16):
+        self.transfer(lanes, self.x, self.a)
+
+    def vector_tya(self, lanes, addrmode, operand8, operand16):
+        self.transfer(lanes, self.y, self.a)
+
+    def vector_tsx(self, lanes, addrmode, operand8, operand16):
+        self.transfer(lanes, self.sp, self.x)
+
+    def vector_txs(self, lanes, addrmode, operand8, operand16):
+        self.transfer(lanes, self.x, self.sp, flags=False)
+
+    def vector_clc(self, lanes, addrmode, operand8, operand16):
+        self.flags(lanes, Flags.CARRY, 0)
+
+    def vector_sec(self, lanes, addrmode, operand8, operand16):
+        self.flags(lanes, Flags.CARRY, Flags.CARRY)
+
+    def vector_cld(self, lanes, addrmode, operand8, operand16):
+        self.flags(lanes, Flags.DECIMAL, 0)
+
+    def vector_sed(self, lanes, addrmode, operand8, operand16):
+        self.flags(lanes, Flags.DECIMAL, Flags.DECIMAL)
+
+    def vector_cli(self, lanes, addrmode, operand8, operand16):
+        self.flags(lanes, Flags.INTERRUPT, 0)
+
+    def vector_sei(self, lanes, addrmode, operand8, operand16):
+        self.flags(lanes, Flags.INTERRUPT, Flags.INTERRUPT)
+
+    def vector_clv(self, lanes, addrmode, operand8, operand16):
+        self.flags(lanes, Flags.OVERFLOW, 0)
+
+    def test_bits(self, lanes, addrmode, operand8, operand16, clear):
+        value, address = self.operand(lanes, addrmode, operand8, operand16)
+        a = self.a[lanes]
+        self.memory[lanes, address] = (value & (0xff ^ a)) if clear else (value | a)
+        self.flag(lanes, Flags.ZERO, (value & a) == 0)
+
+    def vector_trb(self, lanes, addrmode, operand8, operand16):
+        self.test_bits(lanes, addrmode, operand8, operand16, True)
+
+    def vector_tsb(self, lanes, addrmode, operand8, operand16):
+        self.test_bits(lanes, addrmode, operand8, operand16, False)
+
+    def vector_nop(self, lanes, addrmode, operand8, operand16):
+        pass
+
+    def branch(self, lanes, operand8, taken):
+        nextpc = self.pc[lanes]
+        self.pc[lanes] = numpy.where(taken, self.relative(operand8, nextpc) & 0xffff, nextpc)
+
+    def vector_bra(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, True)
+
+    def vector_bpl(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.NEGATIVE) == 0)
+
+    def vector_bmi(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.NEGATIVE) != 0)
+
+    def vector_bvc(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.OVERFLOW) == 0)
+
+    def vector_bvs(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.OVERFLOW) != 0)
+
+    def vector_bcc(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.CARRY) == 0)
+
+    def vector_bcs(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.CARRY) != 0)
+
+    def vector_bne(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.ZERO) == 0)
+
+    def vector_beq(self, lanes, addrmode, operand8, operand16):
+        self.branch(lanes, operand8, (self.cc[lanes] & Flags.ZERO) != 0)
+
+    def vector_jmp(self, lanes, addrmode, operand8, operand16):
+        self.pc[lanes] = operand16
+
+    def vector_jsr(self, lanes, addrmode, operand8, operand16):
+        # Like sim6502, JSR and RTS don't wrap SP
+        sp = self.sp[lanes]
+        back = self.pc[lanes] - 1
+        self.memory[lanes, 0x100 + sp] = (back >> 8) & 0xff
+        self.memory[lanes, 0xff + sp] = back & 0xff
+        self.sp[lanes] = sp - 2
+        self.pc[lanes] = operand16
+
+    def vector_rts(self, lanes, addrmode, operand8, operand16):
+        sp = self.sp[lanes]
+        back = self.read(lanes, 0x101 + sp) | (self.read(lanes, 0x102 + sp) << 8)
+        self.sp[lanes] = sp + 2
+        self.pc[lanes] = (back + 1) & 0xffff
+
+    def push(self, lanes, value):
+        sp = self.sp[lanes]
+        # sim6502 only wraps an SP of 0, so leave one that a JSR took below
+        # 0 to it
+        rest = sp < 0
+        if rest.any():
+            lanes, sp, value = lanes[~rest], sp[~rest], value[~rest]
+        self.memory[lanes, 0x100 + sp] = value
+        self.sp[lanes] = (sp - 1) & 0xff
+        return rest
+
+    def pull(self, lanes):
+        sp = (self.sp[lanes] + 1) & 0xff
+        self.sp[lanes] = sp
+        return self.read(lanes, 0x100 + sp)
+
+    def vector_pha(self, lanes, addrmode, operand8, operand16):
+        return self.push(lanes, self.a[lanes])
+
+    def vector_phx(self, lanes, addrmode, operand8, operand16):
+        return self.push(lanes, self.x[lanes])
+
+    def vector_phy(self, lanes, addrmode, operand8, operand16):
+        return self.push(lanes, self.y[lanes])
+
+    def vector_php(self, lanes, addrmode, operand8, operand16):
+        return self.push(lanes, self.cc[lanes] | Flags.BREAK | Flags.UNUSED)
+
+    def vector_pla(self, lanes, addrmode, operand8, operand16):
+        value = self.pull(lanes)
+        self.a[lanes] = value
+        self.nz(lanes, value)
+
+    def vector_plx(self, lanes, addrmode, operand8, operand16):
+        value = self.pull(lanes)
+        self.x[lanes] = value
+        self.nz(lanes, value)
+
+    def vector_ply(self, lanes, addrmode, operand8, operand16):
+        value = self.pull(lanes)
+        self.y[lanes] = value
+        self.nz(lanes, value)
+
+    def vector_plp(self, lanes, addrmode, operand8, operand16):
+        self.cc[lanes] = self.pull(lanes)
@@ -1,10 +1,37 @@
 """Memory map for 6502 address space."""
 
+from array import array
+
 # Memory access modes
 MODE_READ = 0
 MODE_WRITE = 1
 MODE_EXECUTE = 2
 
+# Fields of an AccessTrace word
+TRACE_MODE_SHIFT = 16
+TRACE_UNINITIALIZED = 1 << 18   # the address held no byte, e.g. -1
+TRACE_VALUE_SHIFT = 24
+
+# Words in an AccessTrace buffer when StartTrace() isn't told
+DEFAULT_TRACE_SIZE = 1 << 20
+
+# Bits in MemoryMap.code_pages
+CODE_DECODED = 1        # sim6502's decoded-instruction cache
+CODE_TRANSLATED = 2     # blocks translated by jit6502
+PAGE_CLEAN = 4          # unchanged since the last Snapshot() or Restore()
+
+# Bits in MemoryMap.intercept_pages
+PAGE_INTERCEPTED = 1    # an interceptor watches some address on the page
+PAGE_TRACED = 2         # accesses are recorded in the AccessTrace
+PAGE_WATCHED = 4        # a watchpoint covers some address on the page
+
+# Watchpoint modes, by letter
+WATCH_MODES = {"r": MODE_READ, "w": MODE_WRITE, "x": MODE_EXECUTE}
+
+# Values InitializeMemory() looks at a time, to skip the ones an image
+# leaves untouched or load the ones it fills in one go
+IMAGE_CHUNK = 256
+
 class TrapException(Exception):
     """May be raised by an interceptor on access to a memory address."""
     def __init__(self, address, access_mode):
@@ -16,6 +43,122 @@ class TrapException(Exception):
             self.address, self.access_mode)
 
 
+
+def DecodeTraceWord(word):
+    """Return (address, mode, value) for a word of an AccessTrace, with
+    value None if the address held no byte."""
+    if word & TRACE_UNINITIALIZED:
+        value = None
+    else:
+        value = word >> TRACE_VALUE_SHIFT
+    return (word & 0xffff, (word >> TRACE_MODE_SHIFT) & 3, value)
+
+
+class Watchpoint(object):
+    """Watches accesses to addresses start up to end in the given modes,
+    a set of MODE_*.  hits counts the accesses seen.  Made by
+    MemoryMap.Watch()."""
+
+    def __init__(self, start, end, modes, name=None):
+        self.start = start
+        self.end = end
+        self.modes = modes
+        self.name = name
+        self.hits = 0
+
+    def __repr__(self):
+        modes = "".join(letter for letter in "rwx" if WATCH_MODES[letter] in self.modes)
+        return "Watchpoint(0x%04x, 0x%04x, %r, name=%r, hits=%d)" % (
+            self.start, self.end, modes, self.name, self.hits)
+
+
+class WatchHit(object):
+    """One access seen by a Watchpoint.
+
+    pc is the address of the instruction that made the access, or None if
+    no instruction did, e.g. the pushes of irq().  old and new are the byte
+    before and after the access, the same unless it was a write, or None
+    where the address held no byte.
+    """
+
+    def __init__(self, watchpoint, pc, address, access_mode, old, new):
+        self.watchpoint = watchpoint
+        self.pc = pc
+        self.address = address
+        self.access_mode = access_mode
+        self.old = old
+        self.new = new
+
+    def __repr__(self):
+        def byte(value):
+            return "--" if value is None else "%02x" % value
+        pc = "----" if self.pc is None else "%04x" % self.pc
+        return "WatchHit(pc=$%s, $%04x %s %s -> %s)" % (
+            pc, self.address, "rwx"[self.access_mode], byte(self.old), byte(self.new))
+
+
+class AccessTrace(object):
+    """Memory accesses recorded by MemoryMap.StartTrace().
+
+    Each access is one word of an array('I'): the address in bits 0-15,
+    the MODE_* in bits 16-17, TRACE_UNINITIALIZED in bit 18 if the address
+    held no byte, and the byte read or written in bits 24-31.
+
+    The words go into a ring buffer of size words.  Given a file, the
+    buffer is written to it, in the machine's byte order, each time it
+    fills and by Flush(), so the file gets every access.  Without one the
+    newest accesses overwrite the oldest.
+    """
+
+    def __init__(self, size=DEFAULT_TRACE_SIZE, file=None):
+        self.words = array("I", bytes(4 * size))
+        self.size = size
+        self.file = file
+        # Index the next access goes in, and how many accesses came before
+        # the one at index 0
+        self.next = 0
+        self.base = 0
+
+    def Record(self, address, access_mode, value):
+        if 0 <= value < 256:
+            word = address | (access_mode << TRACE_MODE_SHIFT) | (value << TRACE_VALUE_SHIFT)
+        else:
+            word = address | (access_mode << TRACE_MODE_SHIFT) | TRACE_UNINITIALIZED
+        i = self.next
+        self.words[i] = word
+        i += 1
+        if i == self.size:
+            if self.file is not None:
+                self.words.tofile(self.file)
+            self.base += i
+            i = 0
+        self.next = i
+
+    def Count(self):
+        """Return the number of accesses recorded."""
+        return self.base + self.next
+
+    def Words(self):
+        """Return the words still in the buffer, oldest first."""
+        if self.file is None and self.base:
+            return self.words[self.next:] + self.words[:self.next]
+        return self.words[:self.next]
+
+    def Accesses(self):
+        """Return the accesses still in the buffer, oldest first, as
+        (address, mode, value) tuples."""
+        return [DecodeTraceWord(word) for word in self.Words()]
+
+    def Flush(self):
+        """Write the words recorded since the buffer was last written to
+        the file."""
+        if self.file is not None and self.next:
+            self.words[:self.next].tofile(self.file)
+            self.base += self.next
+            self.next = 0
+            self.file.flush()
+
+
 class MemoryMap(object):
     # Don't intercept accesses to uninitialized memory
     NONE_INTERCEPTOR = 0
@@ -26,10 +169,21 @@ class MemoryMap(object):
         # Pointer back to sim6502 object
         self.cpu = cpu
 
-        # -1 represents an uninitialized memory address, which will optionally trap if accessed.
-        self._memory_map = [-1] * 65536
+        self._memory_map = self._NewMemory()
 
+        # Interceptors for single addresses, and (start, end, interceptor)
+        # for ranges, newest first
         self.interceptors = {}
+        self.ranges = []
+
+        # CODE_* bits for each page holding code the CPU has cached in decoded
+        # or translated form, and PAGE_CLEAN for each page a snapshot can
+        # skip.  Writes to flagged pages are reported to PageWritten().
+        self.code_pages = bytearray(256)
+
+        # The last snapshot taken or restored, and the pages written since
+        self._snapshot = None
+        self._dirty_pages = []
 
         if default_interceptor == self.NONE_INTERCEPTOR:
             self.default_interceptor = None
@@ -38,14 +192,67 @@ class MemoryMap(object):
         else:
             self.default_interceptor = default_interceptor
 
+        # The AccessTrace recording accesses, see StartTrace()
+        self.trace = None
+
+        # Watchpoints, and the accesses they have seen since run() last
+        # started, see Watch()
+        self.watchpoints = []
+        self.watch_hits = []
+
+        # PAGE_INTERCEPTED for each page with an interceptor on any of its
+        # addresses, PAGE_WATCHED for each page with a watchpoint, and
+        # PAGE_TRACED for every page while tracing.  Accesses to pages with
+        # none of them go straight to memory.
+        self.intercept_pages = bytearray(256)
+        self._UpdateInterceptPages()
+
+    def _NewMemory(self):
+        # -1 represents an uninitialized memory address, which will optionally trap if accessed.
+        return [-1] * 65536
+
+    def IsInitialized(self, address):
+        return self._memory_map[address] != -1
+
     def TrapInterceptor(self, address, access_mode, _):
-        if self._memory_map[address] == -1 and (access_mode == MODE_READ or access_mode == MODE_EXECUTE):
+        if not self.IsInitialized(address) and (access_mode == MODE_READ or access_mode == MODE_EXECUTE):
 
             print(self.cpu.show_state())
             print(self.Dump(self.cpu.pc, 0x3))
             raise TrapException(address, access_mode)
 
     def InitializeMemory(self, address, data, interceptor=None):
+        if isinstance(data, (bytes, bytearray)):
+            # Every value is a byte, so there are none to skip
+            self.Load(address, data)
+            length = len(data)
+        elif isinstance(data, (list, tuple)):
+            # An image such as asm6502.object_code is mostly -1s, with the
+            # program in a few places.  Chunks of nothing but -1 are
+            # skipped and chunks of nothing but bytes loaded in one go.
+            for start in range(0, len(data), IMAGE_CHUNK):
+                chunk = data[start:start + IMAGE_CHUNK]
+                missing = chunk.count(-1)
+                if missing == len(chunk):
+                    continue
+                if not missing and address + start + len(chunk) <= 0x10000:
+                    try:
+                        self.Load(address + start, chunk)
+                        continue
+                    except (TypeError, ValueError):
+                        pass
+                self._InitializeValues(address + start, chunk)
+            length = len(data)
+        else:
+            # Any other iterable, which may have no len()
+            length = self._InitializeValues(address, data)
+        if interceptor:
+            self.InterceptRange(address, address + length, interceptor)
+
+    def _InitializeValues(self, address, data):
+        """Store the byte values of data from address on, skipping the
+        others, and return how many values there were."""
+        idx = -1
         for idx, value in enumerate(data):
             # Bug: https://github.com/dj-on-github/py6502/issues/6
             # Fix this by choosing to skip assigning data from object_code if it is untouched. 
@@ -53,12 +260,138 @@ class MemoryMap(object):
             #    raise ValueError
             if (value >= 0 and value < 256):
                 self._memory_map[address + idx] = value
-            if interceptor:
-                self.Intercept(address + idx, interceptor)
+                if self.code_pages[(address + idx) >> 8]:
+                    self.PageWritten(address + idx)
+        return idx + 1
 
     def Intercept(self, address, interceptor):
         """Register interceptor for access to a memory address"""
         self.interceptors[address] = interceptor
+        self.intercept_pages[address >> 8] |= PAGE_INTERCEPTED
+        self._InterceptorsChanged()
+
+    def InterceptRange(self, start, end, interceptor):
+        """Register interceptor for access to addresses start up to end.
+
+        One registration covers the whole range, so use this rather than
+        Intercept() for each address of an I/O area, or of whole pages:
+        InterceptRange(0xc000, 0xc100, io) covers page $C0.  Interceptors
+        for single addresses take precedence over ranges, and later ranges
+        over earlier ones.
+        """
+        self.ranges.insert(0, (start, end, interceptor))
+        for page in range(start >> 8, (end + 0xff) >> 8):
+            self.intercept_pages[page] |= PAGE_INTERCEPTED
+        self._InterceptorsChanged()
+
+    def _UpdateInterceptPages(self):
+        if self.default_interceptor:
+            pages = bytearray([PAGE_INTERCEPTED] * 256)
+        else:
+            pages = bytearray(256)
+            for address in self.interceptors:
+                pages[address >> 8] = PAGE_INTERCEPTED
+            for start, end, _ in self.ranges:
+                for page in range(start >> 8, (end + 0xff) >> 8):
+                    pages[page] = PAGE_INTERCEPTED
+        for watchpoint in self.watchpoints:
+            for page in range(watchpoint.start >> 8, (watchpoint.end + 0xff) >> 8):
+                pages[page] |= PAGE_WATCHED
+        if self.trace is not None:
+            for page in range(256):
+                pages[page] |= PAGE_TRACED
+        # Updated in place, since the memory map's users may hold on to it
+        self.intercept_pages[:] = pages
+
+    def StartTrace(self, size=DEFAULT_TRACE_SIZE, file=None):
+        """Record every Read(), Write() and Execute() from now on in a new
+        AccessTrace of size words, streamed to file if given, and return it.
+
+        While tracing, run() neither reuses decoded instructions nor runs
+        translated blocks, so that it fetches every instruction.
+        """
+        self.trace = AccessTrace(size, file)
+        self._UpdateInterceptPages()
+        return self.trace
+
+    def StopTrace(self):
+        """Stop recording, flush the trace to its file and return it."""
+        trace = self.trace
+        self.trace = None
+        self._UpdateInterceptPages()
+        if trace is not None:
+            trace.Flush()
+        return trace
+
+    def Watch(self, start, end=None, modes="w", name=None):
+        """Watch accesses to addresses start up to end, or to start alone,
+        and return the Watchpoint.  modes is any of "r", "w" and "x" for
+        reads, writes and instruction fetches.
+
+        Each access is added to watch_hits as a WatchHit, and run() stops
+        after the instruction that made it.  Only the pages the range
+        covers are slowed down; while there are watchpoints, run() doesn't
+        use translated blocks.
+        """
+        if end is None:
+            end = start + 1
+        if not 0 <= start < end <= 0x10000:
+            raise ValueError("can't watch $%X up to $%X" % (start, end))
+        try:
+            modes = frozenset(WATCH_MODES[letter] for letter in modes)
+        except KeyError:
+            raise ValueError("watch modes are r, w and x, not %r" % (modes,))
+        watchpoint = Watchpoint(start, end, modes, name)
+        self.watchpoints.append(watchpoint)
+        self._UpdateInterceptPages()
+        self._InterceptorsChanged()
+        return watchpoint
+
+    def Unwatch(self, watchpoint=None):
+        """Remove watchpoint, or with no watchpoint all of them."""
+        if watchpoint is None:
+            del self.watchpoints[:]
+        else:
+            self.watchpoints.remove(watchpoint)
+        self._UpdateInterceptPages()
+
+    def WatchpointFor(self, address, access_mode):
+        """Return the first watchpoint that sees access_mode accesses to
+        address, or None."""
+        if self.intercept_pages[address >> 8] & PAGE_WATCHED:
+            for watchpoint in self.watchpoints:
+                if (watchpoint.start <= address < watchpoint.end and
+                        access_mode in watchpoint.modes):
+                    return watchpoint
+        return None
+
+    def _Watched(self, address, access_mode, new):
+        # Called before a write lands, and after a read or fetch
+        old = self._memory_map[address] if self.IsInitialized(address) else None
+        if access_mode != MODE_WRITE:
+            new = old
+        for watchpoint in self.watchpoints:
+            if watchpoint.start <= address < watchpoint.end and access_mode in watchpoint.modes:
+                watchpoint.hits += 1
+                self.watch_hits.append(WatchHit(watchpoint, None, address, access_mode, old, new))
+
+    def _InterceptorsChanged(self):
+        # Cached code skips the fetches this interceptor may want to see
+        if any(bits & ~PAGE_CLEAN for bits in self.code_pages):
+            self.cpu.invalidate_code()
+
+    def InterceptorFor(self, address):
+        """Return the interceptor that sees accesses to address, or None."""
+        if not self.intercept_pages[address >> 8] & PAGE_INTERCEPTED:
+            return None
+        try:
+            return self.interceptors[address]
+        except KeyError:
+            pass
+        for start, end, interceptor in self.ranges:
+            if start <= address < end:
+                return interceptor
+        return self.default_interceptor
 
     def Dump(self, address=0x0, length=0x10000):
         lines = []
@@ -66,7 +399,7 @@ class MemoryMap(object):
         for i, value in enumerate(self._memory_map[address:address+length]):
             if i % 16 == 0:
                 line.append('$%04X :' % (address + i))
-            if value == -1:
+            if not self.IsInitialized(address + i):
                 line.append('--')
             else:
                 line.append('%02X' % value)
@@ -79,32 +412,276 @@ class MemoryMap(object):
 
         return '\n'.join(lines)
 
-    def _MaybeIntercept(self, address, access_mode):
-        try:
-            interceptor = self.interceptors[address]
-        except KeyError:
-            interceptor = self.default_interceptor
+    def _MaybeIntercept(self, address, access_mode, trace=True):
+        flags = self.intercept_pages[address >> 8]
+        if flags & PAGE_INTERCEPTED:
+            interceptor = self.InterceptorFor(address)
 
-        # May raise TrapException
-        if interceptor:
-            if access_mode == MODE_WRITE:
-                value = self._memory_map[address]
-            else:
-                value = None
-            interceptor(address, access_mode, value)
+            # May raise TrapException
+            if interceptor:
+                if access_mode == MODE_WRITE:
+                    value = self._memory_map[address]
+                else:
+                    value = None
+                interceptor(address, access_mode, value)
+
+        # Writes are watched before the byte is stored, see Write()
+        if flags & PAGE_WATCHED and access_mode != MODE_WRITE:
+            self._Watched(address, access_mode, None)
 
-    # TODO: record access trace records
+        # Recorded after the interceptor, which may supply the byte read
+        if flags & PAGE_TRACED and trace:
+            self.trace.Record(address, access_mode, self._memory_map[address])
+
+    # With trace=False an access isn't recorded in the AccessTrace
 
     def Read(self, address, trace=True):
-        self._MaybeIntercept(address, MODE_READ)
+        if self.intercept_pages[address >> 8]:
+            self._MaybeIntercept(address, MODE_READ, trace)
         return self._memory_map[address]
 
     def Write(self, address, value, trace=True):
+        flags = self.intercept_pages[address >> 8]
+        if flags & PAGE_WATCHED:
+            self._Watched(address, MODE_WRITE, value)
         self._memory_map[address] = value
-        self._MaybeIntercept(address, MODE_WRITE)
+        if self.code_pages[address >> 8]:
+            self.PageWritten(address)
+        if flags:
+            self._MaybeIntercept(address, MODE_WRITE, trace)
 
     def Execute(self, address, trace=True):
-        self._MaybeIntercept(address, MODE_EXECUTE)
+        if self.intercept_pages[address >> 8]:
+            self._MaybeIntercept(address, MODE_EXECUTE, trace)
+        return self._memory_map[address]
+
+    def Peek(self, address):
+        """Return the byte at address without intercepting or tracing."""
         return self._memory_map[address]
 
+    def Poke(self, address, value):
+        """Store value at address without intercepting or tracing."""
+        self._memory_map[address] = value
+        if self.code_pages[address >> 8]:
+            self.PageWritten(address)
+
+    def Load(self, address, data):
+        """Store a block of bytes at address without intercepting or tracing.
+
+        Unlike InitializeMemory(), every value must be a byte and the block
+        must fit below $10000.
+        """
+        end = address + len(data)
+        if address < 0 or end > 0x10000:
+            raise ValueError("$%X bytes at $%X don't fit in memory" % (len(data), address))
+        self._memory_map[address:end] = bytes(data)
+        self._PagesWritten(address, end)
+
+    def View(self, start=0x0, end=0x10000):
+        """Return a memoryview of memory from start up to end.
+
+        Writes through the view are neither intercepted nor noticed by
+        cached code.  Only ByteMemoryMap supports this.
+        """
+        raise TypeError("%s has no byte buffer to view, use ByteMemoryMap" %
+                        type(self).__name__)
+
+    def _PagesWritten(self, start, end):
+        code_pages = self.code_pages
+        for page in range(start >> 8, (end + 0xff) >> 8):
+            if code_pages[page]:
+                for address in range(max(start, page << 8), min(end, (page + 1) << 8)):
+                    self.PageWritten(address)
+
+    def PageWritten(self, address):
+        """Called after a store to address, on a page flagged in code_pages."""
+        page = address >> 8
+        bits = self.code_pages[page]
+        if bits & PAGE_CLEAN:
+            bits &= ~PAGE_CLEAN
+            self.code_pages[page] = bits
+            self._dirty_pages.append(page)
+        if bits:
+            self.cpu.code_written(address)
+
+    def Snapshot(self):
+        """Return a copy of memory, as a tuple of 256 pages.
+
+        Only the pages written since the last Snapshot() or Restore() are
+        copied; the rest are shared with that snapshot.
+        """
+        if self._snapshot is None:
+            pages = tuple(self._CopyPage(page) for page in range(256))
+            self._Clean(pages, range(256))
+        else:
+            pages = list(self._snapshot)
+            for page in self._dirty_pages:
+                pages[page] = self._CopyPage(page)
+            pages = tuple(pages)
+            self._Clean(pages, self._dirty_pages)
+        return pages
+
+    def Restore(self, pages):
+        """Put memory back the way it was when Snapshot() returned pages.
+
+        Restoring the latest snapshot again only copies back the pages
+        written since, so going back to the same state over and over is
+        cheap.  Cached code on those pages is dropped where it changed.
+        """
+        if self._snapshot is None:
+            changed = range(256)
+            if not any(self.code_pages):
+                # No cached code to tell, e.g. a simulator made from the
+                # snapshot, so copy the lot
+                self._RestoreAll(pages)
+                self._Clean(pages, changed)
+                return
+        elif pages is self._snapshot:
+            changed = self._dirty_pages
+        else:
+            changed = set(self._dirty_pages)
+            changed.update(page for page in range(256)
+                           if pages[page] is not self._snapshot[page])
+        for page in changed:
+            copy = pages[page]
+            if self.code_pages[page] & ~PAGE_CLEAN:
+                # Compare in 16-byte chunks to find the addresses that change
+                start = page << 8
+                current = self._CopyPage(page)
+                written = []
+                for chunk in range(0, 256, 16):
+                    if current[chunk:chunk + 16] != copy[chunk:chunk + 16]:
+                        written.extend(start + i for i in range(chunk, chunk + 16)
+                                       if current[i] != copy[i])
+                self._RestorePage(page, copy)
+                for address in written:
+                    self.cpu.code_written(address)
+            else:
+                self._RestorePage(page, copy)
+        self._Clean(pages, changed)
+
+    def _Clean(self, pages, changed):
+        code_pages = self.code_pages
+        for page in changed:
+            code_pages[page] |= PAGE_CLEAN
+        self._snapshot = pages
+        self._dirty_pages = []
+
+    def _CopyPage(self, page):
+        return tuple(self._memory_map[page << 8:(page + 1) << 8])
+
+    def _RestorePage(self, page, copy):
+        self._memory_map[page << 8:(page + 1) << 8] = copy
+
+    def _RestoreAll(self, pages):
+        for page in range(256):
+            self._RestorePage(page, pages[page])
+
+    def Fetcher(self):
+        """Return a callable that behaves like Execute(address).
+
+        When no interceptor can see the access this is the memory list's own
+        __getitem__, so a run loop that holds it in a local skips the
+        interceptor lookup entirely.  Ask again if interceptors change.
+        """
+        if any(self.intercept_pages):
+            return self.Execute
+        return self._memory_map.__getitem__
+
+
+class ByteMemoryMap(MemoryMap):
+    """A MemoryMap that keeps memory in a bytearray.
+
+    The 64K of memory take 64KB instead of the half megabyte of pointers
+    the list takes, and can be shared without copying through View().
+    Which addresses have been initialized is kept in a separate bitmap,
+    so TrapInterceptor and Dump() work as before, but reading memory
+    that was never written returns 0 rather than -1.
+    """
+
+    def __init__(self, cpu, default_interceptor=MemoryMap.NONE_INTERCEPTOR):
+        # One bit per address, set once it has been written
+        self._initialized = bytearray(65536 // 8)
+        MemoryMap.__init__(self, cpu, default_interceptor)
+
+    def _NewMemory(self):
+        return bytearray(65536)
+
+    def IsInitialized(self, address):
+        return self._initialized[address >> 3] & (1 << (address & 7)) != 0
+
+    def _MarkInitialized(self, start, end):
+        initialized = self._initialized
+        first = (start + 7) >> 3
+        last = end >> 3
+        if first < last:
+            initialized[first:last] = b"\xff" * (last - first)
+            head, tail = range(start, first << 3), range(last << 3, end)
+        else:
+            head, tail = range(start, end), ()
+        for address in head:
+            initialized[address >> 3] |= 1 << (address & 7)
+        for address in tail:
+            initialized[address >> 3] |= 1 << (address & 7)
+
+    def _InitializeValues(self, address, data):
+        idx = -1
+        for idx, value in enumerate(data):
+            if (value >= 0 and value < 256):
+                self._memory_map[address + idx] = value
+                self._initialized[(address + idx) >> 3] |= 1 << ((address + idx) & 7)
+                if self.code_pages[(address + idx) >> 8]:
+                    self.PageWritten(address + idx)
+        return idx + 1
+
+    def Write(self, address, value, trace=True):
+        flags = self.intercept_pages[address >> 8]
+        if flags & PAGE_WATCHED:
+            self._Watched(address, MODE_WRITE, value)
+        self._memory_map[address] = value
+        self._initialized[address >> 3] |= 1 << (address & 7)
+        if self.code_pages[address >> 8]:
+            self.PageWritten(address)
+        if flags:
+            self._MaybeIntercept(address, MODE_WRITE, trace)
+
+    def Poke(self, address, value):
+        """Store value at address without intercepting or tracing."""
+        self._memory_map[address] = value
+        self._initialized[address >> 3] |= 1 << (address & 7)
+        if self.code_pages[address >> 8]:
+            self.PageWritten(address)
+
+    def Load(self, address, data):
+        MemoryMap.Load(self, address, data)
+        self._MarkInitialized(address, address + len(data))
+
+    def View(self, start=0x0, end=0x10000):
+        return memoryview(self._memory_map)[start:end]
+
+    def Rebind(self, buffer):
+        """Keep memory in buffer from now on, 64K of writable bytes such as
+        a bytearray or a memoryview of someone else's array.
+
+        Nothing is copied, so writes through the map land in buffer, and
+        the initialized bitmap is left as it was.  Code decoded or
+        translated from the old memory is dropped.
+        """
+        if len(buffer) != 0x10000:
+            raise ValueError("memory must be $10000 bytes, not $%X" % len(buffer))
+        self._memory_map = buffer
+        if any(self.code_pages):
+            self.cpu.invalidate_code()
+
+    def _CopyPage(self, page):
+        # The page, then its 32 bytes of the initialized bitmap
+        return (bytes(self._memory_map[page << 8:(page + 1) << 8]) +
+                bytes(self._initialized[page << 5:(page + 1) << 5]))
+
+    def _RestorePage(self, page, copy):
+        self._memory_map[page << 8:(page + 1) << 8] = copy[:256]
+        self._initialized[page << 5:(page + 1) << 5] = copy[256:]
 
+    def _RestoreAll(self, pages):
+        self._memory_map[:] = b"".join([copy[:256] for copy in pages])
+        self._initialized[:] = b"".join([copy[256:] for copy in pages])
@@ -0,0 +1,234 @@
+"""Hot-spot profiler for sim6502.
+
+A Profiler counts the instructions executed and the clock cycles they took
+at each address, in two arrays of 65536 counters.  The counts can then be
+folded onto the routine each address belongs to, taken to be the nearest
+symbol at or below it, and written out as a sorted report or as collapsed
+stacks for flame graph tools (flamegraph.pl, speedscope, inferno).
+
+    s = sim6502(a.object_code, symbols=a.symbols, profile=True)
+    s.pc = a.symbols["start"]
+    s.run(until_pc=a.symbols["done"])
+    s.profiler.report()
+
+The profiler also follows JSR, BRK and interrupts into subroutines, and
+RTS and RTI out of them, on a shadow call stack, to total the cost of each
+subroutine with and without what it calls and to split it by caller:
+
+    s.profiler.report_calls()
+
+Code that discards its return address (PLA PLA) or uses RTS as a computed
+jump doesn't return the way it was called.  So rather than matching every
+RTS to the last JSR, a frame is closed when the stack pointer is back up at
+or above where it was before the call: after RTS, RTI or TXS.  An RTS that
+leaves the stack deeper than that is a jump within the current subroutine.
+
+run() doesn't use translated blocks while a profiler is attached, since
+they don't stop at every instruction.
+"""
+
+import bisect
+import sys
+from array import array
+
+BRK, JSR, RTI, RTS, TXS = 0x00, 0x20, 0x40, 0x60, 0x9a
+
+# Stack pointer of the outermost frame, above any the program can have
+TOP_SP = 0x10000
+
+
+class Profiler(object):
+    """Instruction and cycle counts by address for one simulator.
+
+    instructions[address] and cycles[address] accumulate across runs until
+    reset().  symbols is the table used to name routines, by default the
+    one the simulator was created with.
+    """
+
+    def __init__(self, cpu, symbols=None):
+        self.cpu = cpu
+        if symbols is None and cpu.have_symbols:
+            symbols = cpu.symbols
+        self.set_symbols(symbols or {})
+        self.reset()
+
+    # Opcodes that run() and execute() pass to stack_changed()
+    STACK_OPCODES = frozenset((BRK, JSR, RTI, RTS, TXS))
+
+    def reset(self):
+        """Zero all the counts and start a new call stack."""
+        self.instructions = array("Q", bytes(8 * 0x10000))
+        self.cycles = array("Q", bytes(8 * 0x10000))
+        # Instructions counted so far, for the call graph
+        self.executed = 0
+
+        # The shadow call stack.  Each frame is [subroutine, sp, executed
+        # and cpu.cycles on entry, instructions and cycles in callees], sp
+        # being the stack pointer before the call.  The outermost frame is
+        # the code that isn't in any subroutine, None.
+        self.stack = [[None, TOP_SP, 0, 0, 0, 0]]
+        # active[subroutine] is how many of its frames are on the stack
+        self.active = {}
+        # subroutine -> [calls, instructions, cycles, instructions and
+        # cycles excluding callees]
+        self.subroutines = {}
+        # (caller, subroutine) -> [calls, instructions, cycles]
+        self.calls = {}
+
+    def set_symbols(self, symbols):
+        # One name per address, sorted by address for symbol_for()
+        names = {}
+        for name, address in sorted(symbols.items(), key=lambda item: (item[1], item[0])):
+            if 0 <= address < 0x10000:
+                names.setdefault(address, name)
+        self.addresses = sorted(names)
+        self.names = [names[address] for address in self.addresses]
+
+    def symbol_for(self, address):
+        """The name of the routine that address is in: the nearest symbol at
+        or below it, or the address itself as $xxxx if there is none."""
+        i = bisect.bisect_right(self.addresses, address)
+        if i == 0:
+            return "$%04x" % address
+        return self.names[i - 1]
+
+    def by_address(self):
+        """(address, instructions, cycles) for every address executed,
+        most cycles first."""
+        instructions, cycles = self.instructions, self.cycles
+        rows = [(address, instructions[address], cycles[address])
+                for address in range(0x10000) if instructions[address]]
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return rows
+
+    def by_symbol(self):
+        """(name, instructions, cycles) for every routine executed, most
+        cycles first."""
+        totals = {}
+        for address, count, cycles in self.by_address():
+            name = self.symbol_for(address)
+            total = totals.get(name, (0, 0))
+            totals[name] = (total[0] + count, total[1] + cycles)
+        rows = [(name, count, cycles) for name, (count, cycles) in totals.items()]
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return rows
+
+    def report(self, file=None, limit=None, by_address=False):
+        """Print a table of the routines, or with by_address the individual
+        addresses, that took the most cycles."""
+        if file is None:
+            file = sys.stdout
+        rows = self.by_address() if by_address else self.by_symbol()
+        total_cycles = sum(row[2] for row in rows) or 1
+        print("%10s %6s %10s  %s" % ("cycles", "%", "instrs", "address" if by_address
+                                     else "routine"), file=file)
+        for where, count, cycles in rows[:limit]:
+            if by_address:
+                where = "$%04x %s" % (where, self.symbol_for(where))
+            print("%10d %6.2f %10d  %s" % (cycles, 100.0 * cycles / total_cycles, count, where),
+                  file=file)
+
+    def write_collapsed(self, file, weight="cycles"):
+        """Write one "routine count" line per routine in the collapsed stack
+        format read by flame graph tools.  weight is "cycles" or
+        "instructions"."""
+        column = {"instructions": 1, "cycles": 2}[weight]
+        for row in sorted(self.by_symbol()):
+            if row[column]:
+                file.write("%s %d\n" % (row[0], row[column]))
+
+    # The call graph
+
+    def stack_changed(self, opcode, operand16):
+        """Called for an instruction in STACK_OPCODES before it executes,
+        once it has been counted."""
+        cpu = self.cpu
+        if opcode == JSR:
+            self.call(operand16, cpu.sp)
+        elif opcode == RTS:
+            self.returned(cpu.sp + 2)
+        elif opcode == RTI:
+            self.returned(cpu.sp + 3)
+        elif opcode == TXS:
+            self.returned(cpu.x)
+        else:
+            peek = cpu.memory_map.Peek
+            self.call((peek(0xfffe) & 0xff) | ((peek(0xffff) & 0xff) << 8), cpu.sp)
+
+    def call(self, subroutine, sp):
+        """Enter subroutine, with the stack pointer at sp before the return
+        address is pushed."""
+        caller = self.stack[-1][0]
+        self.stack.append([subroutine, sp, self.executed, self.cpu.cycles, 0, 0])
+        self.active[subroutine] = self.active.get(subroutine, 0) + 1
+        stats = self.subroutines.get(subroutine)
+        if stats is None:
+            stats = self.subroutines[subroutine] = [0, 0, 0, 0, 0]
+        stats[0] += 1
+        edge = self.calls.get((caller, subroutine))
+        if edge is None:
+            edge = self.calls[(caller, subroutine)] = [0, 0, 0]
+        edge[0] += 1
+
+    def returned(self, sp):
+        """Close the frames that a stack pointer of sp has returned from."""
+        stack = self.stack
+        while stack[-1][1] <= sp:
+            subroutine, _, executed, cycles, callee_executed, callee_cycles = stack.pop()
+            executed = self.executed - executed
+            cycles = self.cpu.cycles - cycles
+            parent = stack[-1]
+            parent[4] += executed
+            parent[5] += cycles
+            stats = self.subroutines[subroutine]
+            stats[3] += executed - callee_executed
+            stats[4] += cycles - callee_cycles
+            self.active[subroutine] -= 1
+            # A recursive call is already part of the outer one's total
+            if not self.active[subroutine]:
+                stats[1] += executed
+                stats[2] += cycles
+                edge = self.calls[(parent[0], subroutine)]
+                edge[1] += executed
+                edge[2] += cycles
+
+    def name(self, subroutine):
+        if subroutine is None:
+            return "<top>"
+        return self.symbol_for(subroutine)
+
+    def call_graph(self):
+        """(name, calls, instructions, cycles, exclusive instructions,
+        exclusive cycles) for every subroutine called, most cycles first.
+
+        The totals include callees, the exclusive ones don't.  Only calls
+        that have returned are counted.
+        """
+        rows = [(self.name(subroutine),) + tuple(stats)
+                for subroutine, stats in self.subroutines.items()]
+        rows.sort(key=lambda row: (-row[3], row[0]))
+        return rows
+
+    def callers(self, name):
+        """(caller, calls, instructions, cycles) for each caller of the
+        subroutine called name, most cycles first."""
+        rows = [(self.name(caller), edge[0], edge[1], edge[2])
+                for (caller, subroutine), edge in self.calls.items()
+                if self.name(subroutine) == name]
+        rows.sort(key=lambda row: (-row[3], row[0]))
+        return rows
+
+    def report_calls(self, file=None, limit=None):
+        """Print the subroutines that took the most cycles, including their
+        callees, each followed by its callers."""
+        if file is None:
+            file = sys.stdout
+        print("%8s %10s %10s %10s %10s  %s" % ("calls", "cycles", "instrs", "self cyc",
+                                                 "self ins", "subroutine"), file=file)
+        for name, calls, instructions, cycles, own_instructions, own_cycles in \
+                self.call_graph()[:limit]:
+            print("%8d %10d %10d %10d %10d  %s" % (calls, cycles, instructions, own_cycles,
+                                                   own_instructions, name), file=file)
+            for caller, calls, instructions, cycles in self.callers(name):
+                print("%8d %10d %10d %21s    from %s" % (calls, cycles, instructions, "",
+                                                         caller), file=file)
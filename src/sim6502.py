@@ -2,6 +2,11 @@
 # The 65C02 Simulator
 #
 
+import array
+import types
+
+import debug6502
+import idle6502
 import memory_map
 
 class Flags(object):
@@ -15,6 +20,228 @@ class Flags(object):
     ZERO = 2
     CARRY = 1
 
+# Base clock cycles for every opcode, laid out as the usual 16x16 opcode
+# matrix (row = high nibble).  0 marks an opcode that is not an instruction
+# on that variant.  Page-crossing, branch and decimal-mode penalties are
+# added on top of these by sim6502.penalty_cycles().
+NMOS_CYCLES = (
+    # 0  1  2  3  4  5  6  7  8  9  A  B  C  D  E  F
+    7, 6, 0, 0, 0, 3, 5, 0, 3, 2, 2, 0, 0, 4, 6, 0,  # 0
+    2, 5, 0, 0, 0, 4, 6, 0, 2, 4, 0, 0, 0, 4, 7, 0,  # 1
+    6, 6, 0, 0, 3, 3, 5, 0, 4, 2, 2, 0, 4, 4, 6, 0,  # 2
+    2, 5, 0, 0, 0, 4, 6, 0, 2, 4, 0, 0, 0, 4, 7, 0,  # 3
+    6, 6, 0, 0, 0, 3, 5, 0, 3, 2, 2, 0, 3, 4, 6, 0,  # 4
+    2, 5, 0, 0, 0, 4, 6, 0, 2, 4, 0, 0, 0, 4, 7, 0,  # 5
+    6, 6, 0, 0, 0, 3, 5, 0, 4, 2, 2, 0, 5, 4, 6, 0,  # 6
+    2, 5, 0, 0, 0, 4, 6, 0, 2, 4, 0, 0, 0, 4, 7, 0,  # 7
+    0, 6, 0, 0, 3, 3, 3, 0, 2, 0, 2, 0, 4, 4, 4, 0,  # 8
+    2, 6, 0, 0, 4, 4, 4, 0, 2, 5, 2, 0, 0, 5, 0, 0,  # 9
+    2, 6, 2, 0, 3, 3, 3, 0, 2, 2, 2, 0, 4, 4, 4, 0,  # A
+    2, 5, 0, 0, 4, 4, 4, 0, 2, 4, 2, 0, 4, 4, 4, 0,  # B
+    2, 6, 0, 0, 3, 3, 5, 0, 2, 2, 2, 0, 4, 4, 6, 0,  # C
+    2, 5, 0, 0, 0, 4, 6, 0, 2, 4, 0, 0, 0, 4, 7, 0,  # D
+    2, 6, 0, 0, 3, 3, 5, 0, 2, 2, 2, 0, 4, 4, 6, 0,  # E
+    2, 5, 0, 0, 0, 4, 6, 0, 2, 4, 0, 0, 0, 4, 7, 0,  # F
+)
+
+# WDC 65C02.  Differences from NMOS: the new instructions and ($zp) mode,
+# JMP ($abs) takes 6, and ASL/LSR/ROL/ROR abs,X take 6 plus a page-crossing
+# penalty instead of a flat 7.
+CMOS_CYCLES = (
+    # 0  1  2  3  4  5  6  7  8  9  A  B  C  D  E  F
+    7, 6, 0, 0, 5, 3, 5, 0, 3, 2, 2, 0, 6, 4, 6, 0,  # 0
+    2, 5, 5, 0, 5, 4, 6, 0, 2, 4, 2, 0, 6, 4, 6, 0,  # 1
+    6, 6, 0, 0, 3, 3, 5, 0, 4, 2, 2, 0, 4, 4, 6, 0,  # 2
+    2, 5, 5, 0, 4, 4, 6, 0, 2, 4, 2, 0, 4, 4, 6, 0,  # 3
+    6, 6, 0, 0, 0, 3, 5, 0, 3, 2, 2, 0, 3, 4, 6, 0,  # 4
+    2, 5, 5, 0, 0, 4, 6, 0, 2, 4, 3, 0, 0, 4, 6, 0,  # 5
+    6, 6, 0, 0, 3, 3, 5, 0, 4, 2, 2, 0, 6, 4, 6, 0,  # 6
+    2, 5, 5, 0, 4, 4, 6, 0, 2, 4, 4, 0, 6, 4, 6, 0,  # 7
+    2, 6, 0, 0, 3, 3, 3, 0, 2, 2, 2, 0, 4, 4, 4, 0,  # 8
+    2, 6, 5, 0, 4, 4, 4, 0, 2, 5, 2, 0, 4, 5, 5, 0,  # 9
+    2, 6, 2, 0, 3, 3, 3, 0, 2, 2, 2, 0, 4, 4, 4, 0,  # A
+    2, 5, 5, 0, 4, 4, 4, 0, 2, 4, 2, 0, 4, 4, 4, 0,  # B
+    2, 6, 0, 0, 3, 3, 5, 0, 2, 2, 2, 0, 4, 4, 6, 0,  # C
+    2, 5, 5, 0, 0, 4, 6, 0, 2, 4, 3, 0, 0, 4, 7, 0,  # D
+    2, 6, 0, 0, 3, 3, 5, 0, 2, 2, 2, 0, 4, 4, 6, 0,  # E
+    2, 5, 5, 0, 0, 4, 6, 0, 2, 4, 4, 0, 0, 4, 7, 0,  # F
+)
+
+class Penalty(object):
+    # Extra-cycle rules, as bit flags in sim6502.penalty_table
+    PAGE_X = 1          # +1 if $abs,X crosses a page
+    PAGE_Y = 2          # +1 if $abs,Y crosses a page
+    PAGE_INDIRECT_Y = 4 # +1 if ($zp),Y crosses a page
+    DECIMAL = 8         # +1 in decimal mode (65C02 ADC/SBC)
+    BRANCH = 16         # +1 if taken, +2 if taken to another page
+
+# Instructions that only read their operand, and so pay for a page crossing
+# when indexed.  Stores and read-modify-write instructions always take the
+# extra cycle, so it is already in their base count.
+PAGE_PENALTY_INSTRUCTIONS = frozenset((
+    "adc", "and", "bit", "cmp", "eor", "lda", "ldx", "ldy", "ora", "sbc"))
+
+# Instructions that execute() reports as ("stack", sp).  The handlers
+# themselves return nothing, or the address a store or read-modify-write
+# wrote to, which execute() reports as ("w", address).
+STACK_INSTRUCTIONS = frozenset((
+    "jsr", "pha", "php", "phx", "phy", "pla", "plp", "plx", "ply", "rti", "rts"))
+
+# Instruction length for each addressing mode
+MODE_LENGTHS = {
+    "implicit": 1,
+    "accumulator": 1,
+    "immediate": 2,
+    "relative": 2,
+    "zeropage": 2,
+    "zeropagex": 2,
+    "zeropagey": 2,
+    "zeropageindexedindirectx": 2,
+    "zeropageindexedindirecty": 2,
+    "zeropageindirect": 2,
+    "absolute": 3,
+    "absolutex": 3,
+    "absolutey": 3,
+    "absoluteindirect": 3,
+    "absoluteindexedindirect": 3,
+    "indirect": 3,
+}
+
+# ADC and SBC results, looked up rather than worked out on every call.
+# Each table has an entry for every carry, A and operand, at index
+# carry << 16 | a << 8 | operand, holding the new A in bits 0-7, the new
+# sim6502.nz in bits 8-16 and the new C and V in bits 17 and 23, so that
+# entry >> 17 is the two flags in place.  See alu_table().
+
+def _alu_entry(result, negative, overflow, zero, carry):
+    # The result itself stands for N and Z when it gives the right ones
+    if bool(result & 0x80) == bool(negative) and (result == 0) == bool(zero):
+        nz = result
+    elif zero:
+        nz = 0x100 if negative else 0
+    else:
+        nz = 0x81 if negative else 1
+    return result | nz << 8 | (1 if carry else 0) << 17 | (1 if overflow else 0) << 23
+
+def adc_binary(a, operand, carry, variant):
+    total = a + operand + carry
+    result = total & 0xff
+    return _alu_entry(result, result & 0x80, (a ^ result) & (operand ^ result) & 0x80,
+                      result == 0, total > 0xff)
+
+def sbc_binary(a, operand, carry, variant):
+    difference = a - operand - (1 - carry)
+    result = difference & 0xff
+    return _alu_entry(result, result & 0x80, (a ^ operand) & (a ^ result) & 0x80,
+                      result == 0, difference >= 0)
+
+def adc_decimal(a, operand, carry, variant):
+    # As worked out for every input, valid BCD or not, in Bruce Clark's
+    # "Decimal Mode" tutorial on 6502.org.  V, and on the NMOS part N, come
+    # from the sum before the high digit is adjusted, and on the NMOS part
+    # Z from the binary sum.  The 65C02 takes N and Z from the result.
+    low = (a & 0x0f) + (operand & 0x0f) + carry
+    if low >= 0x0a:
+        low = ((low + 0x06) & 0x0f) + 0x10
+    total = (a & 0xf0) + (operand & 0xf0) + low
+    signed = total - (0x100 if a & 0x80 else 0) - (0x100 if operand & 0x80 else 0)
+    negative = total & 0x80
+    overflow = signed < -128 or signed > 127
+    if total >= 0xa0:
+        total += 0x60
+    result = total & 0xff
+    if variant == sim6502.NMOS:
+        zero = (a + operand + carry) & 0xff == 0
+    else:
+        negative, zero = result & 0x80, result == 0
+    return _alu_entry(result, negative, overflow, zero, total >= 0x100)
+
+def sbc_decimal(a, operand, carry, variant):
+    # C and V are as in binary mode, and on the NMOS part N and Z too
+    binary = sbc_binary(a, operand, carry, variant)
+    low = (a & 0x0f) - (operand & 0x0f) + carry - 1
+    if variant == sim6502.NMOS:
+        if low < 0:
+            low = ((low - 0x06) & 0x0f) - 0x10
+        total = (a & 0xf0) - (operand & 0xf0) + low
+        if total < 0:
+            total -= 0x60
+        return (binary & ~0xff) | (total & 0xff)
+    total = a - operand + carry - 1
+    if total < 0:
+        total -= 0x60
+    if low < 0:
+        total -= 0x06
+    result = total & 0xff
+    return _alu_entry(result, result & 0x80, binary >> 23, result == 0, binary >> 17 & 1)
+
+# (function, variant) -> table, see alu_table()
+_alu_tables = {}
+
+def alu_table(function, variant=None):
+    """The array of entries function(a, operand, carry, variant) gives for
+    every carry, A and operand, built on first use.
+
+    function is one of adc_binary, sbc_binary, adc_decimal and
+    sbc_decimal; variant only matters for the decimal ones.
+    """
+    table = _alu_tables.get((function, variant))
+    if table is None:
+        table = array.array("I", [function(a, operand, carry, variant)
+                                  for carry in (0, 1)
+                                  for a in range(256)
+                                  for operand in range(256)])
+        _alu_tables[(function, variant)] = table
+    return table
+
+# Clock cycles run_async() runs between yielding to the event loop, about
+# 20ms of an Apple //e
+ASYNC_SLICE_CYCLES = 20000
+
+class StopReason(object):
+    """Why sim6502.run() returned, and where.
+
+    reason is one of the constants below, pc is the program counter at the
+    point the run stopped (the instruction that was *not* executed), steps
+    is the number of instructions executed by that call to run() and cycles
+    the number of clock cycles they took.
+    """
+    PC = "pc"                           # reached an address in until_pc
+    STEPS = "steps"                     # executed max_steps instructions
+    CYCLES = "cycles"                   # used up max_cycles clock cycles
+    BRK = "brk"                         # reached a BRK with stop_on_brk set
+    NOT_INSTRUCTION = "not_instruction" # opcode not implemented on this variant
+    WEEDS = "weeds"                     # fetched a non-byte, e.g. uninitialized memory
+    BREAKPOINT = "breakpoint"           # reached a breakpoint, see set_breakpoint()
+    WATCHPOINT = "watchpoint"           # accessed memory watched by MemoryMap.Watch()
+    IDLE = "idle"                       # in a polling loop that nothing can end, see idle6502
+
+    def __init__(self, reason, pc, steps, cycles=0):
+        self.reason = reason
+        self.pc = pc
+        self.steps = steps
+        self.cycles = cycles
+
+    def __repr__(self):
+        return "StopReason(%r, pc=0x%04x, steps=%d, cycles=%d)" % (
+            self.reason, self.pc, self.steps, self.cycles)
+
+class StepStatus(object):
+    # What sim6502.step() returns
+    OK = 0                  # executed the instruction
+    WEEDS = 1               # fetched a non-byte, e.g. uninitialized memory
+    NOT_INSTRUCTION = 2     # opcode not implemented on this variant
+
+class Snapshot(object):
+    """Registers and memory saved by sim6502.snapshot().
+
+    registers is (pc, a, x, y, sp, cc, cycles) and pages is the
+    MemoryMap.Snapshot() of memory.
+    """
+    def __init__(self, registers, pages):
+        self.registers = registers
+        self.pages = pages
+
 # TODO: check for other cases of % on negative numbers leading to negative underflow
 
 class sim6502(object):
@@ -23,13 +250,22 @@ class sim6502(object):
     CMOS = "65C02"       # WDC 65C02 / Rockwell R65C02 (Apple //e, //c)
     VARIANTS = (NMOS, CMOS)
 
-    def __init__(self, object_code=None, address=0x0, symbols=None, variant=CMOS):
+    # Bits in stop_map
+    STOP_UNTIL_PC = 1       # an address in run()'s until_pc
+    STOP_BREAKPOINT = 2     # a breakpoint, see set_breakpoint()
+    STOP_IDLE_LOOP = 4      # the start of a loop idle6502 may skip
+
+    def __init__(self, object_code=None, address=0x0, symbols=None, variant=CMOS,
+                 jit=False, compact_memory=False, profile=False, idle=False):
         """Create a 6502-family simulator.
 
         Parameters
         ----------
-        object_code : sequence of int or None
-            Initial memory image to load.
+        object_code : sequence of int, bytes, Snapshot or None
+            Initial memory image to load.  A Snapshot, from snapshot() on a
+            simulator with the same compact_memory setting, gives its
+            registers and memory, copied a page at a time and far quicker
+            to start from than object code.
         address : int
             Base address for object_code load.
         symbols : dict or None
@@ -43,6 +279,20 @@ class sim6502(object):
                 addressing mode at all.
               * Instruction set: BRA, STZ, PHX/PHY/PLX/PLY, INA/DEA, TRB/TSB,
                 the ($zp) addressing mode, and JMP ($abs,X) exist only on 65C02.
+        jit : bool
+            Let run() translate hot basic blocks into Python functions (see
+            jit6502).  execute() always runs one instruction at a time.
+        compact_memory : bool
+            Keep memory in a bytearray (memory_map.ByteMemoryMap) rather than
+            a list, which takes a fraction of the space per simulator.
+            Memory that was never written then reads as 0 instead of -1.
+        profile : bool
+            Count the instructions and cycles executed at each address in
+            self.profiler (see profile6502).
+        idle : bool
+            Let run() fast-forward through polling loops that wait for
+            input or an event, in self.idle (see idle6502).  run() may then
+            stop with StopReason.IDLE.
         """
         if variant not in self.VARIANTS:
             raise ValueError(
@@ -54,13 +304,49 @@ class sim6502(object):
         self.x = 0x00
         self.y = 0x00
         self.sp = 0xff
+        # The status register, see the cc property
         self.cc = 0x00
 
-        self.memory_map = memory_map.MemoryMap(self)
-        if object_code:
+        # Clock cycles executed since the simulator was created.  Free to be
+        # reset or read by the caller, e.g. around a call to run().
+        self.cycles = 0
+
+        # The events6502.EventQueue of scheduled events, see schedule(), and
+        # the interrupts requested for run() to take
+        self.events = None
+        self.irq_pending = False
+        self.nmi_pending = False
+        # The cycle count at which run() next has to stop or look at the
+        # events and interrupts, and the one it stops at
+        self.deadline = float("inf")
+        self.cycle_limit = float("inf")
+
+        # The asyncio.Event wake() sets while run_async() is running
+        self.woken = None
+
+        if compact_memory:
+            self.memory_map = memory_map.ByteMemoryMap(self)
+        else:
+            self.memory_map = memory_map.MemoryMap(self)
+        if isinstance(object_code, Snapshot):
+            self.restore(object_code)
+        elif object_code:
             self.memory_map.InitializeMemory(address, object_code)
 
         self.build_opcode_table()
+        self.build_dispatch_table()
+        # Binary mode ADC and SBC results, see alu_table()
+        self.adc_table = alu_table(adc_binary)
+        self.sbc_table = alu_table(sbc_binary)
+
+        # Decoded instructions by address, see decode()
+        self.decoded = {}
+
+        if jit:
+            import jit6502
+            self.jit = jit6502.BlockCache(self)
+        else:
+            self.jit = None
 
         if symbols == None:
             self.have_symbols = False
@@ -73,286 +359,321 @@ class sim6502(object):
                 offset = self.symbols[label]
                 self.labels[offset] = label
 
-    # TODO: factor out to common code
+        if profile:
+            import profile6502
+            self.profiler = profile6502.Profiler(self)
+        else:
+            self.profiler = None
+
+        # The trace6502.TraceWriter recording each instruction, see
+        # start_trace()
+        self.tracer = None
+
+        # The debug6502.Breakpoints run() stops at, see set_breakpoint()
+        self.breakpoints = None
+
+        # STOP_* bits for each address run() has to look at before
+        # executing the instruction there, made by mark_stop(), and the
+        # addresses marked for the last run()'s until_pc
+        self.stop_map = None
+        self.until_marked = ()
+
+        # Polling loops run() can fast-forward through; None to run them
+        if idle:
+            self.idle = idle6502.IdleLoops(self)
+        else:
+            self.idle = None
+
+    # Opcode tables, made for each variant when the module is imported and
+    # shared by every instance, see build_opcode_table()
+    _opcode_tables = {}
+
     def build_opcode_table(self):
-        self.hexcodes = dict()
-        self.hexcodes[0x00] = ("brk", "implicit")
-        self.hexcodes[0x10] = ("bpl", "relative")
-        self.hexcodes[0x20] = ("jsr", "absolute")
-        self.hexcodes[0x30] = ("bmi", "relative")
-        self.hexcodes[0x40] = ("rti", "implicit")
-        self.hexcodes[0x50] = ("bvc", "relative")
-        self.hexcodes[0x60] = ("rts", "implicit")
-        self.hexcodes[0x70] = ("bvs", "relative")
-        self.hexcodes[0x80] = ("bra", "relative")
-        self.hexcodes[0x90] = ("bcc", "relative")
-        self.hexcodes[0xA0] = ("ldy", "immediate")
-        self.hexcodes[0xB0] = ("bcs", "relative")
-        self.hexcodes[0xC0] = ("cpy", "immediate")
-        self.hexcodes[0xD0] = ("bne", "relative")
-        self.hexcodes[0xE0] = ("cpx", "immediate")
-        self.hexcodes[0xF0] = ("beq", "relative")
-
-        self.hexcodes[0x01] = ("ora", "zeropageindexedindirectx")
-        self.hexcodes[0x11] = ("ora", "zeropageindexedindirecty")
-        self.hexcodes[0x21] = ("and", "zeropageindexedindirectx")
-        self.hexcodes[0x31] = ("and", "zeropageindexedindirecty")
-        self.hexcodes[0x41] = ("eor", "zeropageindexedindirectx")
-        self.hexcodes[0x51] = ("eor", "zeropageindexedindirecty")
-        self.hexcodes[0x61] = ("adc", "zeropageindexedindirectx")
-        self.hexcodes[0x71] = ("adc", "zeropageindexedindirecty")
-        self.hexcodes[0x81] = ("sta", "zeropageindexedindirectx")
-        self.hexcodes[0x91] = ("sta", "zeropageindexedindirecty")
-        self.hexcodes[0xA1] = ("lda", "zeropageindexedindirectx")
-        self.hexcodes[0xB1] = ("lda", "zeropageindexedindirecty")
-        self.hexcodes[0xC1] = ("cmp", "zeropageindexedindirectx")
-        self.hexcodes[0xD1] = ("cmp", "zeropageindexedindirecty")
-        self.hexcodes[0xE1] = ("sbc", "zeropageindexedindirectx")
-        self.hexcodes[0xF1] = ("sbc", "zeropageindexedindirecty")
-
-        self.hexcodes[0x02] = ("", "")
-        self.hexcodes[0x12] = ("ora", "zeropageindirect")
-        self.hexcodes[0x22] = ("", "")
-        self.hexcodes[0x32] = ("and", "zeropageindirect")
-        self.hexcodes[0x42] = ("", "")
-        self.hexcodes[0x52] = ("eor", "zeropageindirect")
-        self.hexcodes[0x62] = ("", "")
-        self.hexcodes[0x72] = ("adc", "zeropageindirect")
-        self.hexcodes[0x82] = ("", "")
-        self.hexcodes[0x92] = ("sta", "zeropageindirect")
-        self.hexcodes[0xA2] = ("ldx", "immediate")
-        self.hexcodes[0xB2] = ("lda", "zeropageindirect")
-        self.hexcodes[0xC2] = ("", "")
-        self.hexcodes[0xD2] = ("cmp", "zeropageindirect")
-        self.hexcodes[0xE2] = ("", "")
-        self.hexcodes[0xF2] = ("sbc", "zeropageindirect")
-
-        self.hexcodes[0x03] = ("", "")
-        self.hexcodes[0x13] = ("", "")
-        self.hexcodes[0x23] = ("", "")
-        self.hexcodes[0x33] = ("", "")
-        self.hexcodes[0x43] = ("", "")
-        self.hexcodes[0x53] = ("", "")
-        self.hexcodes[0x63] = ("", "")
-        self.hexcodes[0x73] = ("", "")
-        self.hexcodes[0x83] = ("", "")
-        self.hexcodes[0x93] = ("", "")
-        self.hexcodes[0xA3] = ("", "")
-        self.hexcodes[0xB3] = ("", "")
-        self.hexcodes[0xC3] = ("", "")
-        self.hexcodes[0xD3] = ("", "")
-        self.hexcodes[0xE3] = ("", "")
-        self.hexcodes[0xF3] = ("", "")
-
-        self.hexcodes[0x04] = ("tsb", "zeropage")
-        self.hexcodes[0x14] = ("trb", "zeropage")
-        self.hexcodes[0x24] = ("bit", "zeropage")
-        self.hexcodes[0x34] = ("bit", "zeropagex")
-        self.hexcodes[0x44] = ("", "")
-        self.hexcodes[0x54] = ("", "")
-        self.hexcodes[0x64] = ("stz", "zeropage")
-        self.hexcodes[0x74] = ("stz", "zeropagex")
-        self.hexcodes[0x84] = ("sty", "zeropage")
-        self.hexcodes[0x94] = ("sty", "zeropagex")
-        self.hexcodes[0xA4] = ("ldy", "zeropage")
-        self.hexcodes[0xB4] = ("ldy", "zeropagex")
-        self.hexcodes[0xC4] = ("cpy", "zeropage")
-        self.hexcodes[0xD4] = ("", "")
-        self.hexcodes[0xE4] = ("cpx", "zeropage")
-        self.hexcodes[0xF4] = ("", "")
-
-        self.hexcodes[0x05] = ("ora", "zeropage")
-        self.hexcodes[0x15] = ("ora", "zeropagex")
-        self.hexcodes[0x25] = ("and", "zeropage")
-        self.hexcodes[0x35] = ("and", "zeropagex")
-        self.hexcodes[0x45] = ("eor", "zeropage")
-        self.hexcodes[0x55] = ("eor", "zeropagex")
-        self.hexcodes[0x65] = ("adc", "zeropage")
-        self.hexcodes[0x75] = ("adc", "zeropagex")
-        self.hexcodes[0x85] = ("sta", "zeropage")
-        self.hexcodes[0x95] = ("sta", "zeropagex")
-        self.hexcodes[0xA5] = ("lda", "zeropage")
-        self.hexcodes[0xB5] = ("lda", "zeropagex")
-        self.hexcodes[0xC5] = ("cmp", "zeropage")
-        self.hexcodes[0xD5] = ("cmp", "zeropagex")
-        self.hexcodes[0xE5] = ("sbc", "zeropage")
-        self.hexcodes[0xF5] = ("sbc", "zeropagex")
-
-        self.hexcodes[0x06] = ("asl", "zeropage")
-        self.hexcodes[0x16] = ("asl", "zeropagex")
-        self.hexcodes[0x26] = ("rol", "zeropage")
-        self.hexcodes[0x36] = ("rol", "zeropagex")
-        self.hexcodes[0x46] = ("lsr", "zeropage")
-        self.hexcodes[0x56] = ("lsr", "zeropagex")
-        self.hexcodes[0x66] = ("ror", "zeropage")
-        self.hexcodes[0x76] = ("ror", "zeropagex")
-        self.hexcodes[0x86] = ("stx", "zeropage")
-        self.hexcodes[0x96] = ("stx", "zeropagey")
-        self.hexcodes[0xA6] = ("ldx", "zeropage")
-        self.hexcodes[0xB6] = ("ldx", "zeropagey")
-        self.hexcodes[0xC6] = ("dec", "zeropage")
-        self.hexcodes[0xD6] = ("dec", "zeropagex")
-        self.hexcodes[0xE6] = ("inc", "zeropage")
-        self.hexcodes[0xF6] = ("inc", "zeropagex")
-
-        self.hexcodes[0x07] = ("", "")
-        self.hexcodes[0x17] = ("", "")
-        self.hexcodes[0x27] = ("", "")
-        self.hexcodes[0x37] = ("", "")
-        self.hexcodes[0x47] = ("", "")
-        self.hexcodes[0x57] = ("", "")
-        self.hexcodes[0x67] = ("", "")
-        self.hexcodes[0x77] = ("", "")
-        self.hexcodes[0x87] = ("", "")
-        self.hexcodes[0x97] = ("", "")
-        self.hexcodes[0xA7] = ("", "")
-        self.hexcodes[0xB7] = ("", "")
-        self.hexcodes[0xC7] = ("", "")
-        self.hexcodes[0xD7] = ("", "")
-        self.hexcodes[0xE7] = ("", "")
-        self.hexcodes[0xF7] = ("", "")
-
-        self.hexcodes[0x08] = ("php", "implicit")
-        self.hexcodes[0x18] = ("clc", "implicit")
-        self.hexcodes[0x28] = ("plp", "implicit")
-        self.hexcodes[0x38] = ("sec", "implicit")
-        self.hexcodes[0x48] = ("pha", "implicit")
-        self.hexcodes[0x58] = ("cli", "implicit")
-        self.hexcodes[0x68] = ("pla", "implicit")
-        self.hexcodes[0x78] = ("sei", "implicit")
-        self.hexcodes[0x88] = ("dey", "implicit")
-        self.hexcodes[0x98] = ("tya", "implicit")
-        self.hexcodes[0xA8] = ("tay", "implicit")
-        self.hexcodes[0xB8] = ("clv", "implicit")
-        self.hexcodes[0xC8] = ("iny", "implicit")
-        self.hexcodes[0xD8] = ("cld", "implicit")
-        self.hexcodes[0xE8] = ("inx", "implicit")
-        self.hexcodes[0xF8] = ("sed", "implicit")
-
-        self.hexcodes[0x09] = ("ora", "immediate")
-        self.hexcodes[0x19] = ("ora", "absolutey")
-        self.hexcodes[0x29] = ("and", "immediate")
-        self.hexcodes[0x39] = ("and", "absolutey")
-        self.hexcodes[0x49] = ("eor", "immediate")
-        self.hexcodes[0x59] = ("eor", "absolutey")
-        self.hexcodes[0x69] = ("adc", "immediate")
-        self.hexcodes[0x79] = ("adc", "absolutey")
-        self.hexcodes[0x89] = ("bit", "immediate")
-        self.hexcodes[0x99] = ("sta", "absolutey")
-        self.hexcodes[0xA9] = ("lda", "immediate")
-        self.hexcodes[0xB9] = ("lda", "absolutey")
-        self.hexcodes[0xC9] = ("cmp", "immediate")
-        self.hexcodes[0xD9] = ("cmp", "absolutey")
-        self.hexcodes[0xE9] = ("sbc", "immediate")
-        self.hexcodes[0xF9] = ("sbc", "absolutey")
-
-        self.hexcodes[0x0A] = ("asl", "accumulator")
-        self.hexcodes[0x1A] = ("ina", "accumulator")
-        self.hexcodes[0x2A] = ("rol", "accumulator")
-        self.hexcodes[0x3A] = ("dea", "accumulator")
-        self.hexcodes[0x4A] = ("lsr", "accumulator")
-        self.hexcodes[0x5A] = ("phy", "implicit")
-        self.hexcodes[0x6A] = ("ror", "accumulator")
-        self.hexcodes[0x7A] = ("ply", "implicit")
-        self.hexcodes[0x8A] = ("txa", "implicit")
-        self.hexcodes[0x9A] = ("txs", "implicit")
-        self.hexcodes[0xAA] = ("tax", "implicit")
-        self.hexcodes[0xBA] = ("tsx", "implicit")
-        self.hexcodes[0xCA] = ("dex", "implicit")
-        self.hexcodes[0xDA] = ("phx", "implicit")
-        self.hexcodes[0xEA] = ("nop", "implicit")
-        self.hexcodes[0xFA] = ("plx", "implicit")
-
-        self.hexcodes[0x0B] = ("", "")
-        self.hexcodes[0x1B] = ("", "")
-        self.hexcodes[0x2B] = ("", "")
-        self.hexcodes[0x3B] = ("", "")
-        self.hexcodes[0x4B] = ("", "")
-        self.hexcodes[0x5B] = ("", "")
-        self.hexcodes[0x6B] = ("", "")
-        self.hexcodes[0x7B] = ("", "")
-        self.hexcodes[0x8B] = ("", "")
-        self.hexcodes[0x9B] = ("", "")
-        self.hexcodes[0xAB] = ("", "")
-        self.hexcodes[0xBB] = ("", "")
-        self.hexcodes[0xCB] = ("", "")
-        self.hexcodes[0xDB] = ("", "")
-        self.hexcodes[0xEB] = ("", "")
-        self.hexcodes[0xFB] = ("", "")
-
-        self.hexcodes[0x0C] = ("tsb", "absolute")
-        self.hexcodes[0x1C] = ("trb", "absolute")
-        self.hexcodes[0x2C] = ("bit", "absolute")
-        self.hexcodes[0x3C] = ("bit", "absolutex")
-        self.hexcodes[0x4C] = ("jmp", "absolute")
-        self.hexcodes[0x5C] = ("", "")
-        self.hexcodes[0x6C] = ("jmp", "absoluteindirect")
-        self.hexcodes[0x7C] = ("jmp", "absoluteindexedindirect")
-        self.hexcodes[0x8C] = ("sty", "absolute")
-        self.hexcodes[0x9C] = ("stz", "absolute")
-        self.hexcodes[0xAC] = ("ldy", "absolute")
-        self.hexcodes[0xBC] = ("ldy", "absolutex")
-        self.hexcodes[0xCC] = ("cpy", "absolute")
-        self.hexcodes[0xDC] = ("", "")
-        self.hexcodes[0xEC] = ("cpx", "absolute")
-        self.hexcodes[0xFC] = ("", "")
-
-        self.hexcodes[0x0D] = ("ora", "absolute")
-        self.hexcodes[0x1D] = ("ora", "absolutex")
-        self.hexcodes[0x2D] = ("and", "absolute")
-        self.hexcodes[0x3D] = ("and", "absolutex")
-        self.hexcodes[0x4D] = ("eor", "absolute")
-        self.hexcodes[0x5D] = ("eor", "absolutex")
-        self.hexcodes[0x6D] = ("adc", "absolute")
-        self.hexcodes[0x7D] = ("adc", "absolutex")
-        self.hexcodes[0x8D] = ("sta", "absolute")
-        self.hexcodes[0x9D] = ("sta", "absolutex")
-        self.hexcodes[0xAD] = ("lda", "absolute")
-        self.hexcodes[0xBD] = ("lda", "absolutex")
-        self.hexcodes[0xCD] = ("cmp", "absolute")
-        self.hexcodes[0xDD] = ("cmp", "absolutex")
-        self.hexcodes[0xED] = ("sbc", "absolute")
-        self.hexcodes[0xFD] = ("sbc", "absolutex")
-
-        self.hexcodes[0x0E] = ("asl", "absolute")
-        self.hexcodes[0x1E] = ("asl", "absolutex")
-        self.hexcodes[0x2E] = ("rol", "absolute")
-        self.hexcodes[0x3E] = ("rol", "absolutex")
-        self.hexcodes[0x4E] = ("lsr", "absolute")
-        self.hexcodes[0x5E] = ("lsr", "absolutex")
-        self.hexcodes[0x6E] = ("ror", "absolute")
-        self.hexcodes[0x7E] = ("ror", "absolutex")
-        self.hexcodes[0x8E] = ("stx", "absolute")
-        self.hexcodes[0x9E] = ("stz", "absolutex")
-        self.hexcodes[0xAE] = ("ldx", "absolute")
-        self.hexcodes[0xBE] = ("ldx", "absolutey")
-        self.hexcodes[0xCE] = ("dec", "absolute")
-        self.hexcodes[0xDE] = ("dec", "absolutex")
-        self.hexcodes[0xEE] = ("inc", "absolute")
-        self.hexcodes[0xFE] = ("inc", "absolutex")
-
-        self.hexcodes[0x0F] = ("", "")
-        self.hexcodes[0x1F] = ("", "")
-        self.hexcodes[0x2F] = ("", "")
-        self.hexcodes[0x3F] = ("", "")
-        self.hexcodes[0x4F] = ("", "")
-        self.hexcodes[0x5F] = ("", "")
-        self.hexcodes[0x6F] = ("", "")
-        self.hexcodes[0x7F] = ("", "")
-        self.hexcodes[0x8F] = ("", "")
-        self.hexcodes[0x9F] = ("", "")
-        self.hexcodes[0xAF] = ("", "")
-        self.hexcodes[0xBF] = ("", "")
-        self.hexcodes[0xCF] = ("", "")
-        self.hexcodes[0xDF] = ("", "")
-        self.hexcodes[0xEF] = ("", "")
-        self.hexcodes[0xFF] = ("", "")
+        """Set self.hexcodes, the (instruction, addrmode) of each opcode on
+        this variant, a read-only mapping shared by every instance."""
+        self.hexcodes = self._opcode_tables[self.variant]
+
+    # TODO: factor out to common code
+    @staticmethod
+    def opcode_table(variant):
+        hexcodes = dict()
+        hexcodes[0x00] = ("brk", "implicit")
+        hexcodes[0x10] = ("bpl", "relative")
+        hexcodes[0x20] = ("jsr", "absolute")
+        hexcodes[0x30] = ("bmi", "relative")
+        hexcodes[0x40] = ("rti", "implicit")
+        hexcodes[0x50] = ("bvc", "relative")
+        hexcodes[0x60] = ("rts", "implicit")
+        hexcodes[0x70] = ("bvs", "relative")
+        hexcodes[0x80] = ("bra", "relative")
+        hexcodes[0x90] = ("bcc", "relative")
+        hexcodes[0xA0] = ("ldy", "immediate")
+        hexcodes[0xB0] = ("bcs", "relative")
+        hexcodes[0xC0] = ("cpy", "immediate")
+        hexcodes[0xD0] = ("bne", "relative")
+        hexcodes[0xE0] = ("cpx", "immediate")
+        hexcodes[0xF0] = ("beq", "relative")
+
+        hexcodes[0x01] = ("ora", "zeropageindexedindirectx")
+        hexcodes[0x11] = ("ora", "zeropageindexedindirecty")
+        hexcodes[0x21] = ("and", "zeropageindexedindirectx")
+        hexcodes[0x31] = ("and", "zeropageindexedindirecty")
+        hexcodes[0x41] = ("eor", "zeropageindexedindirectx")
+        hexcodes[0x51] = ("eor", "zeropageindexedindirecty")
+        hexcodes[0x61] = ("adc", "zeropageindexedindirectx")
+        hexcodes[0x71] = ("adc", "zeropageindexedindirecty")
+        hexcodes[0x81] = ("sta", "zeropageindexedindirectx")
+        hexcodes[0x91] = ("sta", "zeropageindexedindirecty")
+        hexcodes[0xA1] = ("lda", "zeropageindexedindirectx")
+        hexcodes[0xB1] = ("lda", "zeropageindexedindirecty")
+        hexcodes[0xC1] = ("cmp", "zeropageindexedindirectx")
+        hexcodes[0xD1] = ("cmp", "zeropageindexedindirecty")
+        hexcodes[0xE1] = ("sbc", "zeropageindexedindirectx")
+        hexcodes[0xF1] = ("sbc", "zeropageindexedindirecty")
+
+        hexcodes[0x02] = ("", "")
+        hexcodes[0x12] = ("ora", "zeropageindirect")
+        hexcodes[0x22] = ("", "")
+        hexcodes[0x32] = ("and", "zeropageindirect")
+        hexcodes[0x42] = ("", "")
+        hexcodes[0x52] = ("eor", "zeropageindirect")
+        hexcodes[0x62] = ("", "")
+        hexcodes[0x72] = ("adc", "zeropageindirect")
+        hexcodes[0x82] = ("", "")
+        hexcodes[0x92] = ("sta", "zeropageindirect")
+        hexcodes[0xA2] = ("ldx", "immediate")
+        hexcodes[0xB2] = ("lda", "zeropageindirect")
+        hexcodes[0xC2] = ("", "")
+        hexcodes[0xD2] = ("cmp", "zeropageindirect")
+        hexcodes[0xE2] = ("", "")
+        hexcodes[0xF2] = ("sbc", "zeropageindirect")
+
+        hexcodes[0x03] = ("", "")
+        hexcodes[0x13] = ("", "")
+        hexcodes[0x23] = ("", "")
+        hexcodes[0x33] = ("", "")
+        hexcodes[0x43] = ("", "")
+        hexcodes[0x53] = ("", "")
+        hexcodes[0x63] = ("", "")
+        hexcodes[0x73] = ("", "")
+        hexcodes[0x83] = ("", "")
+        hexcodes[0x93] = ("", "")
+        hexcodes[0xA3] = ("", "")
+        hexcodes[0xB3] = ("", "")
+        hexcodes[0xC3] = ("", "")
+        hexcodes[0xD3] = ("", "")
+        hexcodes[0xE3] = ("", "")
+        hexcodes[0xF3] = ("", "")
+
+        hexcodes[0x04] = ("tsb", "zeropage")
+        hexcodes[0x14] = ("trb", "zeropage")
+        hexcodes[0x24] = ("bit", "zeropage")
+        hexcodes[0x34] = ("bit", "zeropagex")
+        hexcodes[0x44] = ("", "")
+        hexcodes[0x54] = ("", "")
+        hexcodes[0x64] = ("stz", "zeropage")
+        hexcodes[0x74] = ("stz", "zeropagex")
+        hexcodes[0x84] = ("sty", "zeropage")
+        hexcodes[0x94] = ("sty", "zeropagex")
+        hexcodes[0xA4] = ("ldy", "zeropage")
+        hexcodes[0xB4] = ("ldy", "zeropagex")
+        hexcodes[0xC4] = ("cpy", "zeropage")
+        hexcodes[0xD4] = ("", "")
+        hexcodes[0xE4] = ("cpx", "zeropage")
+        hexcodes[0xF4] = ("", "")
+
+        hexcodes[0x05] = ("ora", "zeropage")
+        hexcodes[0x15] = ("ora", "zeropagex")
+        hexcodes[0x25] = ("and", "zeropage")
+        hexcodes[0x35] = ("and", "zeropagex")
+        hexcodes[0x45] = ("eor", "zeropage")
+        hexcodes[0x55] = ("eor", "zeropagex")
+        hexcodes[0x65] = ("adc", "zeropage")
+        hexcodes[0x75] = ("adc", "zeropagex")
+        hexcodes[0x85] = ("sta", "zeropage")
+        hexcodes[0x95] = ("sta", "zeropagex")
+        hexcodes[0xA5] = ("lda", "zeropage")
+        hexcodes[0xB5] = ("lda", "zeropagex")
+        hexcodes[0xC5] = ("cmp", "zeropage")
+        hexcodes[0xD5] = ("cmp", "zeropagex")
+        hexcodes[0xE5] = ("sbc", "zeropage")
+        hexcodes[0xF5] = ("sbc", "zeropagex")
+
+        hexcodes[0x06] = ("asl", "zeropage")
+        hexcodes[0x16] = ("asl", "zeropagex")
+        hexcodes[0x26] = ("rol", "zeropage")
+        hexcodes[0x36] = ("rol", "zeropagex")
+        hexcodes[0x46] = ("lsr", "zeropage")
+        hexcodes[0x56] = ("lsr", "zeropagex")
+        hexcodes[0x66] = ("ror", "zeropage")
+        hexcodes[0x76] = ("ror", "zeropagex")
+        hexcodes[0x86] = ("stx", "zeropage")
+        hexcodes[0x96] = ("stx", "zeropagey")
+        hexcodes[0xA6] = ("ldx", "zeropage")
+        hexcodes[0xB6] = ("ldx", "zeropagey")
+        hexcodes[0xC6] = ("dec", "zeropage")
+        hexcodes[0xD6] = ("dec", "zeropagex")
+        hexcodes[0xE6] = ("inc", "zeropage")
+        hexcodes[0xF6] = ("inc", "zeropagex")
+
+        hexcodes[0x07] = ("", "")
+        hexcodes[0x17] = ("", "")
+        hexcodes[0x27] = ("", "")
+        hexcodes[0x37] = ("", "")
+        hexcodes[0x47] = ("", "")
+        hexcodes[0x57] = ("", "")
+        hexcodes[0x67] = ("", "")
+        hexcodes[0x77] = ("", "")
+        hexcodes[0x87] = ("", "")
+        hexcodes[0x97] = ("", "")
+        hexcodes[0xA7] = ("", "")
+        hexcodes[0xB7] = ("", "")
+        hexcodes[0xC7] = ("", "")
+        hexcodes[0xD7] = ("", "")
+        hexcodes[0xE7] = ("", "")
+        hexcodes[0xF7] = ("", "")
+
+        hexcodes[0x08] = ("php", "implicit")
+        hexcodes[0x18] = ("clc", "implicit")
+        hexcodes[0x28] = ("plp", "implicit")
+        hexcodes[0x38] = ("sec", "implicit")
+        hexcodes[0x48] = ("pha", "implicit")
+        hexcodes[0x58] = ("cli", "implicit")
+        hexcodes[0x68] = ("pla", "implicit")
+        hexcodes[0x78] = ("sei", "implicit")
+        hexcodes[0x88] = ("dey", "implicit")
+        hexcodes[0x98] = ("tya", "implicit")
+        hexcodes[0xA8] = ("tay", "implicit")
+        hexcodes[0xB8] = ("clv", "implicit")
+        hexcodes[0xC8] = ("iny", "implicit")
+        hexcodes[0xD8] = ("cld", "implicit")
+        hexcodes[0xE8] = ("inx", "implicit")
+        hexcodes[0xF8] = ("sed", "implicit")
+
+        hexcodes[0x09] = ("ora", "immediate")
+        hexcodes[0x19] = ("ora", "absolutey")
+        hexcodes[0x29] = ("and", "immediate")
+        hexcodes[0x39] = ("and", "absolutey")
+        hexcodes[0x49] = ("eor", "immediate")
+        hexcodes[0x59] = ("eor", "absolutey")
+        hexcodes[0x69] = ("adc", "immediate")
+        hexcodes[0x79] = ("adc", "absolutey")
+        hexcodes[0x89] = ("bit", "immediate")
+        hexcodes[0x99] = ("sta", "absolutey")
+        hexcodes[0xA9] = ("lda", "immediate")
+        hexcodes[0xB9] = ("lda", "absolutey")
+        hexcodes[0xC9] = ("cmp", "immediate")
+        hexcodes[0xD9] = ("cmp", "absolutey")
+        hexcodes[0xE9] = ("sbc", "immediate")
+        hexcodes[0xF9] = ("sbc", "absolutey")
+
+        hexcodes[0x0A] = ("asl", "accumulator")
+        hexcodes[0x1A] = ("ina", "accumulator")
+        hexcodes[0x2A] = ("rol", "accumulator")
+        hexcodes[0x3A] = ("dea", "accumulator")
+        hexcodes[0x4A] = ("lsr", "accumulator")
+        hexcodes[0x5A] = ("phy", "implicit")
+        hexcodes[0x6A] = ("ror", "accumulator")
+        hexcodes[0x7A] = ("ply", "implicit")
+        hexcodes[0x8A] = ("txa", "implicit")
+        hexcodes[0x9A] = ("txs", "implicit")
+        hexcodes[0xAA] = ("tax", "implicit")
+        hexcodes[0xBA] = ("tsx", "implicit")
+        hexcodes[0xCA] = ("dex", "implicit")
+        hexcodes[0xDA] = ("phx", "implicit")
+        hexcodes[0xEA] = ("nop", "implicit")
+        hexcodes[0xFA] = ("plx", "implicit")
+
+        hexcodes[0x0B] = ("", "")
+        hexcodes[0x1B] = ("", "")
+        hexcodes[0x2B] = ("", "")
+        hexcodes[0x3B] = ("", "")
+        hexcodes[0x4B] = ("", "")
+        hexcodes[0x5B] = ("", "")
+        hexcodes[0x6B] = ("", "")
+        hexcodes[0x7B] = ("", "")
+        hexcodes[0x8B] = ("", "")
+        hexcodes[0x9B] = ("", "")
+        hexcodes[0xAB] = ("", "")
+        hexcodes[0xBB] = ("", "")
+        hexcodes[0xCB] = ("", "")
+        hexcodes[0xDB] = ("", "")
+        hexcodes[0xEB] = ("", "")
+        hexcodes[0xFB] = ("", "")
+
+        hexcodes[0x0C] = ("tsb", "absolute")
+        hexcodes[0x1C] = ("trb", "absolute")
+        hexcodes[0x2C] = ("bit", "absolute")
+        hexcodes[0x3C] = ("bit", "absolutex")
+        hexcodes[0x4C] = ("jmp", "absolute")
+        hexcodes[0x5C] = ("", "")
+        hexcodes[0x6C] = ("jmp", "absoluteindirect")
+        hexcodes[0x7C] = ("jmp", "absoluteindexedindirect")
+        hexcodes[0x8C] = ("sty", "absolute")
+        hexcodes[0x9C] = ("stz", "absolute")
+        hexcodes[0xAC] = ("ldy", "absolute")
+        hexcodes[0xBC] = ("ldy", "absolutex")
+        hexcodes[0xCC] = ("cpy", "absolute")
+        hexcodes[0xDC] = ("", "")
+        hexcodes[0xEC] = ("cpx", "absolute")
+        hexcodes[0xFC] = ("", "")
+
+        hexcodes[0x0D] = ("ora", "absolute")
+        hexcodes[0x1D] = ("ora", "absolutex")
+        hexcodes[0x2D] = ("and", "absolute")
+        hexcodes[0x3D] = ("and", "absolutex")
+        hexcodes[0x4D] = ("eor", "absolute")
+        hexcodes[0x5D] = ("eor", "absolutex")
+        hexcodes[0x6D] = ("adc", "absolute")
+        hexcodes[0x7D] = ("adc", "absolutex")
+        hexcodes[0x8D] = ("sta", "absolute")
+        hexcodes[0x9D] = ("sta", "absolutex")
+        hexcodes[0xAD] = ("lda", "absolute")
+        hexcodes[0xBD] = ("lda", "absolutex")
+        hexcodes[0xCD] = ("cmp", "absolute")
+        hexcodes[0xDD] = ("cmp", "absolutex")
+        hexcodes[0xED] = ("sbc", "absolute")
+        hexcodes[0xFD] = ("sbc", "absolutex")
+
+        hexcodes[0x0E] = ("asl", "absolute")
+        hexcodes[0x1E] = ("asl", "absolutex")
+        hexcodes[0x2E] = ("rol", "absolute")
+        hexcodes[0x3E] = ("rol", "absolutex")
+        hexcodes[0x4E] = ("lsr", "absolute")
+        hexcodes[0x5E] = ("lsr", "absolutex")
+        hexcodes[0x6E] = ("ror", "absolute")
+        hexcodes[0x7E] = ("ror", "absolutex")
+        hexcodes[0x8E] = ("stx", "absolute")
+        hexcodes[0x9E] = ("stz", "absolutex")
+        hexcodes[0xAE] = ("ldx", "absolute")
+        hexcodes[0xBE] = ("ldx", "absolutey")
+        hexcodes[0xCE] = ("dec", "absolute")
+        hexcodes[0xDE] = ("dec", "absolutex")
+        hexcodes[0xEE] = ("inc", "absolute")
+        hexcodes[0xFE] = ("inc", "absolutex")
+
+        hexcodes[0x0F] = ("", "")
+        hexcodes[0x1F] = ("", "")
+        hexcodes[0x2F] = ("", "")
+        hexcodes[0x3F] = ("", "")
+        hexcodes[0x4F] = ("", "")
+        hexcodes[0x5F] = ("", "")
+        hexcodes[0x6F] = ("", "")
+        hexcodes[0x7F] = ("", "")
+        hexcodes[0x8F] = ("", "")
+        hexcodes[0x9F] = ("", "")
+        hexcodes[0xAF] = ("", "")
+        hexcodes[0xBF] = ("", "")
+        hexcodes[0xCF] = ("", "")
+        hexcodes[0xDF] = ("", "")
+        hexcodes[0xEF] = ("", "")
+        hexcodes[0xFF] = ("", "")
 
         # Remove 65C02-only opcodes from the dispatch table when emulating NMOS.
         # The original NMOS 6502 treated these opcodes as "illegal" with
         # undefined or unstable behavior; the safest approximation here is to
         # leave them as non-instructions so execute() reports them.
-        if self.variant == self.NMOS:
+        if variant == sim6502.NMOS:
             cmos_only_opcodes = (
                 # TSB / TRB
                 0x04, 0x0C, 0x14, 0x1C,
@@ -372,7 +693,130 @@ class sim6502(object):
                 0x7C,
             )
             for op in cmos_only_opcodes:
-                self.hexcodes[op] = ("", "")
+                hexcodes[op] = ("", "")
+        return hexcodes
+
+    def snapshot(self):
+        """Save the registers, cycle count and memory, for restore().
+
+        Memory is saved a page at a time, sharing the pages that have not
+        been written since the last snapshot or restore.
+        """
+        return Snapshot((self.pc, self.a, self.x, self.y, self.sp, self.cc, self.cycles),
+                        self.memory_map.Snapshot())
+
+    def restore(self, snapshot):
+        """Go back to the state saved by snapshot().
+
+        Only the pages written since the last snapshot() or restore() are
+        copied, so running a routine from the same starting state many
+        times costs little more than running it.
+        """
+        self.pc, self.a, self.x, self.y, self.sp, self.cc, self.cycles = snapshot.registers
+        self.memory_map.Restore(snapshot.pages)
+
+    def start_trace(self, file, block_records=None):
+        """Record every instruction executed from now on to file, a binary
+        file open for writing, and return the trace6502.TraceWriter.
+
+        Each record holds the PC, opcode, registers and cycles of one
+        instruction; see trace6502 for the format and for TraceReader.
+        """
+        import trace6502
+        if block_records is None:
+            block_records = trace6502.DEFAULT_BLOCK_RECORDS
+        self.stop_trace()
+        self.tracer = trace6502.TraceWriter(self, file, block_records)
+        return self.tracer
+
+    def stop_trace(self):
+        """Stop recording and write out the rest of the trace.  The file is
+        left open."""
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+
+    def mark_stop(self, address, bit):
+        """Set one of the STOP_* bits for address in stop_map."""
+        if self.stop_map is None:
+            self.stop_map = bytearray(0x10000)
+        self.stop_map[address] |= bit
+
+    def unmark_stop(self, address, bit):
+        if self.stop_map is not None:
+            self.stop_map[address] &= ~bit
+
+    def set_breakpoint(self, address, condition=None, ignore=0):
+        """Make run() stop before executing the instruction at address, and
+        return the debug6502.Breakpoint.
+
+        condition is a Python expression over pc, a, x, y, sp, p, cycles,
+        mem[address] and the symbols, compiled now; run() only stops when
+        it is true.  It also skips the first ignore times it would stop.
+        """
+        if self.breakpoints is None:
+            self.breakpoints = debug6502.Breakpoints(self)
+        return self.breakpoints.add(address, condition, ignore)
+
+    def clear_breakpoint(self, address=None):
+        """Remove the breakpoint at address, or with no address all of them."""
+        if self.breakpoints is not None:
+            if address is None:
+                self.breakpoints.clear()
+            else:
+                self.breakpoints.remove(address)
+
+    def schedule(self, cycles, action, period=None):
+        """Have run() call action() once the cycle count reaches cycles, and
+        every period cycles after that if period is given.  Returns the
+        events6502.Event, for cancel()."""
+        import events6502
+        if self.events is None:
+            self.events = events6502.EventQueue()
+        event = self.events.post(events6502.Event(cycles, action, period))
+        if cycles < self.deadline:
+            self.deadline = cycles
+        return event
+
+    def cancel(self, event):
+        """Stop a scheduled event from firing again."""
+        event.cancelled = True
+
+    def request_irq(self):
+        """Have run() take an IRQ at the next instruction boundary with the
+        I flag clear."""
+        self.irq_pending = True
+        self.deadline = self.cycles
+
+    def request_nmi(self):
+        """Have run() take an NMI at the next instruction boundary."""
+        self.nmi_pending = True
+        self.deadline = self.cycles
+
+    def service(self):
+        """Fire the events that are due and take a requested interrupt if
+        it can be taken.  Called by run() at the deadline; returns True if
+        an interrupt was taken."""
+        if self.idle is not None:
+            # Either may end a loop that was waiting
+            self.idle.waiting = None
+        if self.events is not None:
+            self.events.fire(self.cycles)
+        taken = False
+        if self.nmi_pending:
+            self.nmi_pending = False
+            taken = self.nmi()
+        elif self.irq_pending and not self.flags & Flags.INTERRUPT:
+            self.irq_pending = False
+            taken = self.irq()
+        if self.irq_pending:
+            # Look again after every instruction until I is cleared
+            self.deadline = self.cycles
+        elif self.events is not None:
+            self.deadline = min(self.cycle_limit, self.events.next_cycles())
+        else:
+            self.deadline = self.cycle_limit
+        return taken
 
     def reset(self):
         self.a = 0x00
@@ -400,6 +844,9 @@ class sim6502(object):
         else:
             return False
             
+        if self.profiler is not None:
+            self.profiler.call(address, self.sp)
+
         # Hardware interrupts push P with bit 4 (BREAK) cleared and bit 5
         # (UNUSED) set, so handlers can distinguish IRQ/NMI from BRK by
         # inspecting the pushed P value.
@@ -422,6 +869,7 @@ class sim6502(object):
 
         # Set PC to the NMI vector
         self.pc = address
+        self.cycles += 7
         return True
 
     def irq(self):
@@ -434,6 +882,9 @@ class sim6502(object):
         else:
             return False
             
+        if self.profiler is not None:
+            self.profiler.call(address, self.sp)
+
         # Hardware interrupts push P with bit 4 (BREAK) cleared and bit 5
         # (UNUSED) set.
         pushed_p = (self.cc & ~Flags.BREAK) | Flags.UNUSED
@@ -455,164 +906,619 @@ class sim6502(object):
 
         # Set PC to the IRQ vector
         self.pc = address
+        self.cycles += 7
         return True
 
-    def make_flags_nz(self, result):
-        self.set_n(int(result) & 0x80)
-        self.set_z(int(result) == 0)
-
-    def make_flags_v(self, acc, operand, carryin, result, carryout):
-        # V Flag, bit 6
-        self.set_v(((int(acc) ^ int(result)) & (int(operand) ^ int(result)) & 0x80) == 0x80)
-
-    def get_operand(self, addrmode, opcode, operand8, operand16):
-        # Get the operand based on the address mode
-        # print get operand addrmode="+str(addrmode)+" opcode:"+str(opcode)+" op8:"+str(operand8)
-        if addrmode == "zeropageindexedindirectx":
-            # 6502 bug/feature: indirecting by x wraps within the zero page
-            indirectaddr = (operand8 + self.x) & 0xff
-            addr = (self.memory_map.Read((indirectaddr + 1) & 0xff)  << 8) + self.memory_map.Read(indirectaddr)
-            operand = self.memory_map.Read(addr)
-            length = 2
-        elif addrmode == "zeropageindexedindirecty":
-            indirectaddr = operand8
-            # 6502 bug when ($FF),y
-            addr = (self.memory_map.Read((indirectaddr + 1) & 0xff) << 8) + self.memory_map.Read(indirectaddr)
-            addr = addr + self.y
-            operand = self.memory_map.Read(addr)
-            length = 2
-        elif addrmode == "zeropageindirect":
-            indirectaddr = operand8
-            addr = (self.memory_map.Read((indirectaddr + 1) &0xff)  << 8) + self.memory_map.Read(indirectaddr)
-            operand = self.memory_map.Read(addr)
-            length = 2
-        elif addrmode == "zeropage":
-            addr = operand8
-            operand = self.memory_map.Read(addr)
-            length = 2
-        elif addrmode == "zeropagex":
-            addr = (operand8 + self.x) & 0xff
-            operand = self.memory_map.Read(addr)
-            length = 2
-        elif addrmode == "zeropagey":
-            addr = (operand8 + self.y) & 0xff
-            operand = self.memory_map.Read(addr)
-            length = 2
-        elif addrmode == "immediate":
-            addr = None
-            operand = operand8
-            length = 2
-        elif addrmode == "absolutey":
-            addr = (operand16 + self.y) & 0xffff
-            operand = self.memory_map.Read(addr)
-            length = 3
-        elif addrmode == "absolute":
-            addr = operand16
-            operand = self.memory_map.Read(addr)
-            length = 3
-        elif addrmode == "absolutex":
-            addr = (operand16 + self.x) & 0xffff
-            operand = self.memory_map.Read(addr)
-            length = 3
-        elif addrmode == "indirect":
-            indirectaddr = operand16
-            addr = (self.memory_map.Read(indirectaddr + 1) << 8) + self.memory_map.Read(indirectaddr)
-            operand = (self.memory_map.Read(addr + 1) << 8) + self.memory_map.Read(addr)
-            length = 3
-        elif addrmode == "accumulator":
-            addr = None
-            operand = self.a
-            length = 1
-        elif addrmode == "implicit":
-            addr = None
-            operand = operand8
-            length = 1
+    # Operand fetchers, one per addressing mode.  Each returns the tuple
+    # (operand, addr); the PC is already past the instruction, moved on by
+    # its entry in length_table.  build_dispatch_table() looks the one for
+    # each opcode up in operand_modes, or operand16_modes for JMP and JSR,
+    # and the handler is passed it as fetch.
+
+    def operand_zeropageindexedindirectx(self, operand8, operand16):
+        # 6502 bug/feature: indirecting by x wraps within the zero page
+        indirectaddr = (operand8 + self.x) & 0xff
+        addr = (self.memory_map.Read((indirectaddr + 1) & 0xff)  << 8) + self.memory_map.Read(indirectaddr)
+        return (self.memory_map.Read(addr), addr)
+
+    def operand_zeropageindexedindirecty(self, operand8, operand16):
+        indirectaddr = operand8
+        # 6502 bug when ($FF),y
+        addr = (self.memory_map.Read((indirectaddr + 1) & 0xff) << 8) + self.memory_map.Read(indirectaddr)
+        addr = addr + self.y
+        return (self.memory_map.Read(addr), addr)
+
+    def operand_zeropageindirect(self, operand8, operand16):
+        indirectaddr = operand8
+        addr = (self.memory_map.Read((indirectaddr + 1) &0xff)  << 8) + self.memory_map.Read(indirectaddr)
+        return (self.memory_map.Read(addr), addr)
+
+    def operand_zeropage(self, operand8, operand16):
+        return (self.memory_map.Read(operand8), operand8)
+
+    def operand_zeropagex(self, operand8, operand16):
+        addr = (operand8 + self.x) & 0xff
+        return (self.memory_map.Read(addr), addr)
+
+    def operand_zeropagey(self, operand8, operand16):
+        addr = (operand8 + self.y) & 0xff
+        return (self.memory_map.Read(addr), addr)
+
+    def operand_immediate(self, operand8, operand16):
+        return (operand8, None)
+
+    def operand_absolutey(self, operand8, operand16):
+        addr = (operand16 + self.y) & 0xffff
+        return (self.memory_map.Read(addr), addr)
+
+    def operand_absolute(self, operand8, operand16):
+        return (self.memory_map.Read(operand16), operand16)
+
+    def operand_absolutex(self, operand8, operand16):
+        addr = (operand16 + self.x) & 0xffff
+        return (self.memory_map.Read(addr), addr)
+
+    def operand_indirect(self, operand8, operand16):
+        indirectaddr = operand16
+        addr = (self.memory_map.Read(indirectaddr + 1) << 8) + self.memory_map.Read(indirectaddr)
+        operand = (self.memory_map.Read(addr + 1) << 8) + self.memory_map.Read(addr)
+        return (operand, addr)
+
+    # Effective address fetchers for JMP and JSR.  Same shape as above.
+
+    def operand16_absolute(self, operand8, operand16):
+        addr = operand16
+        return (self.memory_map.Read(addr), addr)
+
+    def operand16_absoluteindirect(self, operand8, operand16):
+        # Plain JMP ($abs). On NMOS the high byte wraps within the
+        # indirect pointer's page (the famous $xxFF bug).  On 65C02 the
+        # read proceeds correctly into the next page.  "indirect" is the
+        # same mode, retained for compatibility with dis6502's naming.
+        indirectaddr = operand16
+        lo = self.memory_map.Read(indirectaddr)
+        if self.variant == self.NMOS:
+            hi_addr = (indirectaddr & 0xff00) | ((indirectaddr + 1) & 0xff)
         else:
-            print("ERROR: Address mode %s not found" % addrmode)
-            print("     : PC = 0x%04x" % self.pc)
-            exit()
-        return (operand, addr, length)
-
-    def get_operand16(self, addrmode, opcode, operand8, operand16):
-        # Get the operand based on the address mode
-        if addrmode == "absolute":
-            addr = operand16
-            length = 3
-        elif addrmode == "indirect":
-            # Plain JMP ($abs). On NMOS the high byte wraps within the
-            # indirect pointer's page (the famous $xxFF bug).  On 65C02 the
-            # read proceeds correctly into the next page.
-            indirectaddr = operand16
-            lo = self.memory_map.Read(indirectaddr)
-            if self.variant == self.NMOS:
-                hi_addr = (indirectaddr & 0xff00) | ((indirectaddr + 1) & 0xff)
-            else:
-                hi_addr = (indirectaddr + 1) & 0xffff
-            addr = (self.memory_map.Read(hi_addr) << 8) + lo
-            length = 3
-        elif addrmode == "absoluteindexedindirect":
-            # 65C02-only: JMP ($abs,X).  No page-wrap quirk.
-            indirectaddr = (operand16 + self.x) & 0xffff
-            lo = self.memory_map.Read(indirectaddr)
-            hi = self.memory_map.Read((indirectaddr + 1) & 0xffff)
-            addr = (hi << 8) + lo
-            length = 3
-        elif addrmode == "absoluteindirect":
-            # Same as "indirect" but retained for compatibility with dis6502's
-            # naming.  Apply the same variant-dependent behavior.
-            indirectaddr = operand16
-            lo = self.memory_map.Read(indirectaddr)
+            hi_addr = (indirectaddr + 1) & 0xffff
+        addr = (self.memory_map.Read(hi_addr) << 8) + lo
+        return (self.memory_map.Read(addr), addr)
+
+    def operand16_absoluteindexedindirect(self, operand8, operand16):
+        # 65C02-only: JMP ($abs,X).  No page-wrap quirk.
+        indirectaddr = (operand16 + self.x) & 0xffff
+        lo = self.memory_map.Read(indirectaddr)
+        hi = self.memory_map.Read((indirectaddr + 1) & 0xffff)
+        addr = (hi << 8) + lo
+        return (self.memory_map.Read(addr), addr)
+
+    operand_modes = {
+        "zeropageindexedindirectx": operand_zeropageindexedindirectx,
+        "zeropageindexedindirecty": operand_zeropageindexedindirecty,
+        "zeropageindirect": operand_zeropageindirect,
+        "zeropage": operand_zeropage,
+        "zeropagex": operand_zeropagex,
+        "zeropagey": operand_zeropagey,
+        "immediate": operand_immediate,
+        "absolutey": operand_absolutey,
+        "absolute": operand_absolute,
+        "absolutex": operand_absolutex,
+        "indirect": operand_indirect,
+    }
+
+    operand16_modes = {
+        "absolute": operand16_absolute,
+        "indirect": operand16_absoluteindirect,
+        "absoluteindirect": operand16_absoluteindirect,
+        "absoluteindexedindirect": operand16_absoluteindexedindirect,
+    }
+
+    # Dispatch tables, shared by every instance of the same class and variant.
+    # Keyed by (class, variant) so subclasses that override instr_* methods
+    # get their own table.
+    _dispatch_tables = {}
+
+    # Flag mask and value that make each branch taken.  BRA always is.
+    branch_conditions = {
+        0x10: (Flags.NEGATIVE, 0),              # bpl
+        0x30: (Flags.NEGATIVE, Flags.NEGATIVE), # bmi
+        0x50: (Flags.OVERFLOW, 0),              # bvc
+        0x70: (Flags.OVERFLOW, Flags.OVERFLOW), # bvs
+        0x80: (0, 0),                           # bra
+        0x90: (Flags.CARRY, 0),                 # bcc
+        0xB0: (Flags.CARRY, Flags.CARRY),       # bcs
+        0xD0: (Flags.ZERO, 0),                  # bne
+        0xF0: (Flags.ZERO, Flags.ZERO),         # beq
+    }
+
+    def build_dispatch_table(self):
+        """Resolve all 256 opcodes to their handlers for this variant.
+
+        Each entry of self.dispatch is either None (not an instruction on
+        this variant) or a (handler, addrmode) pair, where handler is the
+        unbound instr_* function.  Decoding an opcode is then a single
+        index into the table instead of building "instr_" + name and
+        calling getattr() on every step.  self.operand_table holds the
+        operand fetcher for each opcode, see operand_modes, or None if it
+        has no operand in memory.  It is what the handler is passed as
+        fetch, so no handler looks its addressing mode up as it runs.
+
+        Also sets self.cycle_table, the base cycle count of each opcode,
+        self.penalty_table, the Penalty flags that may add to it, and
+        self.length_table, the number of bytes the opcode and its operand
+        take, which is how many execute() fetches.
+        """
+        key = (type(self), self.variant)
+        tables = self._dispatch_tables.get(key)
+        if tables is None:
             if self.variant == self.NMOS:
-                hi_addr = (indirectaddr & 0xff00) | ((indirectaddr + 1) & 0xff)
+                cycle_table = NMOS_CYCLES
             else:
-                hi_addr = (indirectaddr + 1) & 0xffff
-            addr = (self.memory_map.Read(hi_addr) << 8) + lo
-            length = 3
-        else:
-            print("ERROR: Address mode %s not found for JMP or JSR" % addrmode)
-            print("     : PC = 0x%04x" % self.pc)
-            exit()
-        operand = self.memory_map.Read(addr)
-        return (operand, addr, length)
+                cycle_table = CMOS_CYCLES
+            entries = []
+            penalties = []
+            lengths = []
+            fetchers = []
+            for opcode in range(256):
+                instruction, addrmode = self.hexcodes[opcode]
+                handler = getattr(type(self), "instr_" + instruction, None)
+                if instruction == "" or handler is None:
+                    entries.append(None)
+                    lengths.append(1)
+                    fetchers.append(None)
+                else:
+                    entries.append((handler, addrmode))
+                    lengths.append(MODE_LENGTHS[addrmode])
+                    if instruction in ("jmp", "jsr"):
+                        fetchers.append(self.operand16_modes[addrmode])
+                    else:
+                        fetchers.append(self.operand_modes.get(addrmode))
+                penalties.append(self.penalty_flags(instruction, addrmode))
+            tables = (tuple(entries), cycle_table, tuple(penalties), tuple(lengths),
+                      tuple(fetchers))
+            self._dispatch_tables[key] = tables
+        (self.dispatch, self.cycle_table, self.penalty_table, self.length_table,
+         self.operand_table) = tables
+
+    def penalty_flags(self, instruction, addrmode):
+        # Which of the Penalty rules apply to an instruction on this variant
+        flags = 0
+        if addrmode == "relative":
+            flags |= Penalty.BRANCH
+        elif instruction in PAGE_PENALTY_INSTRUCTIONS or (
+                self.variant == self.CMOS and instruction in ("asl", "lsr", "rol", "ror")):
+            if addrmode == "absolutex":
+                flags |= Penalty.PAGE_X
+            elif addrmode == "absolutey":
+                flags |= Penalty.PAGE_Y
+            elif addrmode == "zeropageindexedindirecty":
+                flags |= Penalty.PAGE_INDIRECT_Y
+        if self.variant == self.CMOS and instruction in ("adc", "sbc"):
+            flags |= Penalty.DECIMAL
+        return flags
+
+    def penalty_cycles(self, penalty, opcode, address, operand8, operand16):
+        """Extra cycles the instruction at address will take.
+
+        Called before the instruction executes, since the page crossing
+        depends on the index registers and the branch on the flags as they
+        are going in.
+        """
+        if penalty & Penalty.BRANCH:
+            mask, taken = self.branch_conditions[opcode]
+            if (self.cc & mask) != taken:
+                return 0
+            nextpc = address + 2
+            if (self.relative_address(operand8, nextpc) ^ nextpc) & 0xff00:
+                return 2
+            return 1
+        extra = 0
+        if penalty & Penalty.PAGE_X:
+            if (operand16 & 0xff) + self.x > 0xff:
+                extra = 1
+        elif penalty & Penalty.PAGE_Y:
+            if (operand16 & 0xff) + self.y > 0xff:
+                extra = 1
+        elif penalty & Penalty.PAGE_INDIRECT_Y:
+            if self.memory_map.Peek(operand8) + self.y > 0xff:
+                extra = 1
+        if penalty & Penalty.DECIMAL and self.flags & Flags.DECIMAL:
+            extra += 1
+        return extra
+
+    def fetch_operands(self, address, opcode):
+        """Fetch the operand of the instruction at address through the
+        memory map, and return (operand8, operand16).
+
+        Only the bytes the opcode takes are fetched, see self.length_table,
+        so a one byte instruction fetches nothing more and the operand of
+        a zero page one has a high byte of 0.
+        """
+        length = self.length_table[opcode]
+        if length == 1:
+            return 0, 0
+        fetch = self.memory_map.Execute
+        operand8 = fetch((address + 1) & 0xffff)
+        if length == 2:
+            return operand8, operand8
+        return operand8, operand8 + ((fetch((address + 2) & 0xffff) << 8) & 0xff00)
+
+    def decode(self, address, opcode, operand8, operand16):
+        """Decode the instruction fetched from address.
+
+        Returns (handler, fetch, opcode, operand8, operand16, length,
+        cycles, penalty): everything execute_decoded() needs apart from the
+        registers, fetch being the opcode's entry in self.operand_table.
+        The entry is also kept in self.decoded, unless an interceptor or
+        watchpoint would see the fetch or the instruction is BRK, so the
+        next time round instruction() skips the fetch.  A write to any of
+        its bytes drops it again, see code_written().
+        """
+        handler, addrmode = self.dispatch[opcode]
+        length = self.length_table[opcode]
+        entry = (handler, self.operand_table[opcode], opcode, operand8, operand16,
+                 length, self.cycle_table[opcode], self.penalty_table[opcode])
+        if opcode == 0x00:
+            return entry
+        if self.idle is not None and (addrmode == "relative" or opcode == 0x4c):
+            self.idle.found_branch(address, addrmode, opcode, operand8, operand16)
+        intercepted = self.memory_map.InterceptorFor
+        watched = self.memory_map.WatchpointFor
+        for offset in range(length):
+            byte = (address + offset) & 0xffff
+            if intercepted(byte) or watched(byte, memory_map.MODE_EXECUTE):
+                return entry
+        last = (address + length - 1) & 0xffff
+        self.decoded[address] = entry
+        code_pages = self.memory_map.code_pages
+        code_pages[address >> 8] |= memory_map.CODE_DECODED
+        code_pages[last >> 8] |= memory_map.CODE_DECODED
+        return entry
+
+    def code_written(self, address):
+        """Called by the memory map for a write to a page flagged in its
+        code_pages, to drop the decoded and translated code that includes
+        address."""
+        if self.memory_map.code_pages[address >> 8] & memory_map.CODE_DECODED:
+            decoded = self.decoded
+            decoded.pop(address, None)
+            decoded.pop((address - 1) & 0xffff, None)
+            decoded.pop((address - 2) & 0xffff, None)
+        if self.jit is not None:
+            self.jit.invalidate(address)
+
+    def invalidate_code(self):
+        """Forget all decoded and translated code."""
+        # Cleared in place, since run() holds on to it
+        self.decoded.clear()
+        code_pages = self.memory_map.code_pages
+        for page in range(256):
+            code_pages[page] &= ~memory_map.CODE_DECODED
+        if self.jit is not None:
+            self.jit.flush()
+
+    def instruction(self, address):
+        """Return the decoded instruction at address, see decode().
+
+        It comes from self.decoded when it's there and nothing has to see
+        every fetch, or else the opcode and its operand are fetched through
+        the memory map.  If the opcode is not a byte or not an instruction
+        on this variant, nothing more is fetched and the StepStatus code
+        WEEDS or NOT_INSTRUCTION is returned instead.
+        """
+        memory_map = self.memory_map
+        if not memory_map.default_interceptor and memory_map.trace is None:
+            entry = self.decoded.get(address)
+            if entry is not None:
+                return entry
+        opcode = memory_map.Execute(address)
+        if not ((opcode >= 0) and (opcode < 256)):
+            return StepStatus.WEEDS
+        if self.dispatch[opcode] is None:
+            return StepStatus.NOT_INSTRUCTION
+        operand8, operand16 = self.fetch_operands(address, opcode)
+        return self.decode(address, opcode, operand8, operand16)
+
+    def execute_decoded(self, address, entry):
+        """Execute entry, the decoded instruction at address, and return
+        what its handler returns.
+
+        Counts its cycles, tells the profiler and tracer, moves the PC on
+        by the instruction's length so the handler starts with it on the
+        next one, and gives any watchpoint hits it made their pc.  This is
+        the one place execute(), step() and run() execute an instruction.
+        """
+        handler, fetch, opcode, operand8, operand16, length, cycles, penalty = entry
+        if penalty:
+            cycles += self.penalty_cycles(penalty, opcode, address, operand8, operand16)
+        self.cycles += cycles
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.instructions[address] += 1
+            profiler.cycles[address] += cycles
+            profiler.executed += 1
+            if opcode in profiler.STACK_OPCODES:
+                profiler.stack_changed(opcode, operand16)
+        if self.tracer is not None:
+            self.tracer.record(address, opcode)
+        self.pc = (self.pc + length) & 0xffff
+        thing = handler(self, fetch, opcode, operand8, operand16)
+        watch_hits = self.memory_map.watch_hits
+        if watch_hits:
+            for hit in watch_hits:
+                if hit.pc is None:
+                    hit.pc = address
+        return thing
 
     # Execute the instruction at the current program counter location.
-    # Converts hex opcode to instruction three letter name and address mode
-    # turns instruction name into a method - e.g.  instr_lda()
-    # Then calls the method and passes in the operands
+    # Looks the opcode up in the dispatch table built by build_dispatch_table()
+    # to get the handler method - e.g. instr_lda() - and its address mode.
+    # Then calls the method and passes in the operands.  Instructions are
+    # only fetched and decoded the first time round, see decode().
 
     def execute(self, address=None):
         if address == None:
             address = self.pc
             # Pre-increment PC on instruction fetch
             self.pc += 1
-        opcode = self.memory_map.Execute(address)
-        # TODO: we should increment self.pc here by the opcode argument length instead
-        # of doing it manually in every opcode handler and potentially introducing bugs
-        # TODO: only fetch the number of operand bytes appropriate for the instruction
-        # to avoid the extra memory accesses
-        operand8 = self.memory_map.Execute((address + 1) % 65536)
-        hi = self.memory_map.Execute((address + 2) % 65536)
-        operand16 = operand8 + ((hi << 8) & 0xff00)
-
-        if (opcode >= 0) and (opcode < 256):
-            instruction, addrmode = self.hexcodes[opcode]
-            if (instruction != ""):
-                # TODO: construct a method dispatch table once instead of every time
-                methodname = "instr_" + instruction
-                # print "METHODNAME:"+methodname
-                method = getattr(self, methodname, lambda: "nothing")
-                thing = method(addrmode, opcode, operand8, operand16)
-                if thing == None:
-                    return (None, None)
-                return thing
-            else:
-                # TODO: raise exception here
-                return ("not_instruction", self.pc)
-        else:
+        entry = self.instruction(address)
+        if entry == StepStatus.WEEDS:
             # TODO: raise exception here
             #print "ERROR: Out in the weeds. Opcode = %d" % opcode
             return ("weeds", self.pc)
+        if entry == StepStatus.NOT_INSTRUCTION:
+            # TODO: raise exception here
+            return ("not_instruction", self.pc)
+        # The pre-increment was the first byte of the instruction
+        self.pc -= 1
+        thing = self.execute_decoded(address, entry)
+        if thing is None:
+            if entry[0].__name__[len("instr_"):] in STACK_INSTRUCTIONS:
+                return ("stack", self.sp)
+            return (None, None)
+        if isinstance(thing, int):
+            return ("w", thing)
+        # A subclass's handler may still return the tuple itself
+        return thing
+
+    def step(self):
+        """Execute the instruction at the PC and return a StepStatus code.
+
+        Like execute(), but StepStatus.OK, which is 0, once the instruction
+        has run, or WEEDS or NOT_INSTRUCTION with the PC left on the opcode,
+        as run() leaves it.  Only execute() builds the ("w", address) and
+        ("stack", sp) tuples it returns, see STACK_INSTRUCTIONS.  For loops
+        that step one instruction at a time and only need to know whether
+        to stop.
+        """
+        address = self.pc
+        entry = self.instruction(address)
+        if entry == StepStatus.WEEDS or entry == StepStatus.NOT_INSTRUCTION:
+            return entry
+        self.execute_decoded(address, entry)
+        return StepStatus.OK
 
+    def run(self, max_steps=None, until_pc=None, stop_on_brk=True, max_cycles=None):
+        """Execute instructions until a stop condition is met.
+
+        Parameters
+        ----------
+        max_steps : int or None
+            Stop after this many instructions.  None means no limit.
+        until_pc : int, iterable of int, or None
+            Stop when the PC reaches any of these addresses, before the
+            instruction there is executed.
+        stop_on_brk : bool
+            Stop when the next instruction is BRK instead of executing it.
+        max_cycles : int or None
+            Stop once this many clock cycles have been executed.  The
+            instruction that reaches the budget is completed, so a run may
+            overshoot it by a few cycles.  None means no limit.
+
+        Returns a StopReason.  Execution also stops, with the PC left on the
+        offending instruction, if the opcode is not an instruction on this
+        variant or is not a byte at all, and at the breakpoints set with
+        set_breakpoint(), except on the first instruction.  Polling loops
+        are fast-forwarded, or if nothing could end them, the run stops
+        with StopReason.IDLE; see idle6502.  Scheduled events fire, and
+        requested interrupts are taken, between instructions; see
+        schedule().  It stops after
+        an instruction that makes an access a watchpoint sees (see
+        MemoryMap.Watch()), leaving the accesses in memory_map.watch_hits.
+
+        This is the loop that execute() would be called from, with the stop
+        conditions held in local variables.  Each instruction is looked up
+        with instruction() and executed with execute_decoded(), as execute()
+        and step() do.  until_pc, the breakpoints and the idle loops share
+        one map of the address space, stop_map, so checking them costs a
+        single index.  If the simulator was created with
+        jit=True, hot basic blocks run as translated functions instead,
+        with the same results, unless self.profiler or self.tracer is
+        watching every instruction.
+        """
+        if until_pc is None:
+            stops = frozenset()
+        elif isinstance(until_pc, int):
+            stops = frozenset((until_pc,))
+        else:
+            stops = frozenset(until_pc)
+        stop_at = self.stop_map
+        if stop_at is None:
+            stop_at = self.stop_map = bytearray(0x10000)
+        for address in self.until_marked:
+            stop_at[address] &= ~self.STOP_UNTIL_PC
+        self.until_marked = [address for address in stops if 0 <= address < 0x10000]
+        for address in self.until_marked:
+            stop_at[address] |= self.STOP_UNTIL_PC
+        breakpoints = self.breakpoints
+        if breakpoints is not None and breakpoints.points:
+            jit_stops = stops | breakpoints.addresses()
+        else:
+            jit_stops = stops
+        if max_steps is None:
+            max_steps = float("inf")
+        start_cycles = self.cycles
+        if max_cycles is None:
+            cycle_limit = float("inf")
+        else:
+            cycle_limit = start_cycles + max_cycles
+        self.cycle_limit = cycle_limit
+        self.deadline = start_cycles
+
+        instruction = self.instruction
+        execute_decoded = self.execute_decoded
+        watch_hits = self.memory_map.watch_hits
+        del watch_hits[:]
+
+        instrumented = self.profiler is not None or self.tracer is not None
+        # Skipped iterations wouldn't be counted or recorded either
+        idle = self.idle if not instrumented else None
+        if idle is not None:
+            idle.start_run()
+
+        jit = self.jit
+        # Translated blocks would skip the per-instruction counts and records
+        if jit is not None and not instrumented and jit.prepare(jit_stops):
+            blocks = jit.blocks
+            mem = self.memory_map._memory_map
+            read = self.memory_map.Read
+            write = self.memory_map.Write
+            code_pages = self.memory_map.code_pages
+        else:
+            jit = None
+
+        steps = 0
+        while True:
+            pc = self.pc
+            if stop_at[pc]:
+                bits = stop_at[pc]
+                if bits & self.STOP_UNTIL_PC:
+                    reason = StopReason.PC
+                    break
+                if bits & self.STOP_BREAKPOINT and steps and breakpoints.hit(pc):
+                    reason = StopReason.BREAKPOINT
+                    break
+                if bits & self.STOP_IDLE_LOOP and idle is not None:
+                    skipped = idle.skip(pc, steps, max_steps, self.deadline)
+                    if skipped is None:
+                        reason = StopReason.IDLE
+                        break
+                    steps += skipped
+            if steps >= max_steps:
+                reason = StopReason.STEPS
+                break
+            if self.cycles >= self.deadline:
+                if self.cycles >= cycle_limit:
+                    reason = StopReason.CYCLES
+                    break
+                if self.service():
+                    continue
+            # An interceptor or watchpoint added since, say by an event,
+            # flushed the blocks, so look at the memory map again
+            if jit is not None and jit.direct is None and not jit.prepare(jit_stops):
+                jit = None
+            if jit is not None:
+                block = blocks.get(pc)
+                if block is None:
+                    block = jit.visit(pc)
+                # Only run a whole block if it can't overrun the budgets or
+                # the next event, so the stop or event is on the same
+                # instruction as without the JIT
+                if (block and steps + block.count <= max_steps and
+                        self.cycles + block.max_cycles <= self.deadline):
+                    jit.stale = False
+                    steps += block.code(self, mem, read, write, code_pages, jit)
+                    continue
+            entry = instruction(pc)
+            if entry == StepStatus.WEEDS:
+                reason = StopReason.WEEDS
+                break
+            if entry == StepStatus.NOT_INSTRUCTION:
+                reason = StopReason.NOT_INSTRUCTION
+                break
+            if entry[2] == 0x00 and stop_on_brk:
+                reason = StopReason.BRK
+                break
+            execute_decoded(pc, entry)
+            steps += 1
+            if watch_hits:
+                reason = StopReason.WATCHPOINT
+                break
+        return StopReason(reason, self.pc, steps, self.cycles - start_cycles)
+
+    def run_slices(self, slice_cycles, max_steps=None, until_pc=None, stop_on_brk=True,
+                   max_cycles=None):
+        """Run like run(), but in slices of about slice_cycles clock cycles,
+        yielding (stop, more) after each one.
+
+        stop is the StopReason of the run so far and more is whether another
+        slice follows.  The caller can do what it likes between slices,
+        sleep or let other tasks run, and the last stop is the one a single
+        call to run() would have made.  A breakpoint is honoured at the
+        start of every slice but the first, as run() does after its first
+        instruction.
+        """
+        start_cycles = self.cycles
+        steps = 0
+        while True:
+            pc = self.pc
+            if (steps and self.stop_map is not None and
+                    self.stop_map[pc] & self.STOP_BREAKPOINT and self.breakpoints.hit(pc)):
+                yield StopReason(StopReason.BREAKPOINT, pc, steps, self.cycles - start_cycles), False
+                return
+            cycles = slice_cycles
+            if max_cycles is not None:
+                cycles = min(cycles, max_cycles - (self.cycles - start_cycles))
+            stop = self.run(None if max_steps is None else max_steps - steps,
+                            until_pc, stop_on_brk, cycles)
+            steps += stop.steps
+            done = self.cycles - start_cycles
+            more = (stop.reason == StopReason.CYCLES and
+                    (max_cycles is None or done < max_cycles))
+            yield StopReason(stop.reason, self.pc, steps, done), more
+            if not more:
+                return
+
+    def waiting_for_host(self):
+        """Whether the program is in an idle loop that only the host can
+        end, with no event or interrupt due, so there is no point running
+        it until a device has new input."""
+        idle = self.idle
+        return (idle is not None and idle.waiting is not None and
+                not self.irq_pending and not self.nmi_pending and
+                (self.events is None or self.events.next_cycles() == float("inf")))
+
+    def wake(self):
+        """Tell run_async() that a device has input for the program."""
+        if self.woken is not None:
+            self.woken.set()
+
+    async def run_async(self, max_steps=None, until_pc=None, stop_on_brk=True,
+                        max_cycles=None, slice_cycles=ASYNC_SLICE_CYCLES):
+        """Run like run(), as an asyncio coroutine.
+
+        The run goes in slices of slice_cycles clock cycles (see
+        run_slices()), and yields to the event loop between them, so many
+        simulators and their devices can share one thread.  While the
+        program waits in an idle loop that nothing but the host can end,
+        see idle6502, run_async() doesn't run it at all until a device
+        calls wake().  Returns the StopReason of the whole run.
+        """
+        import asyncio
+        self.woken = asyncio.Event()
+        try:
+            for stop, more in self.run_slices(slice_cycles, max_steps, until_pc,
+                                              stop_on_brk, max_cycles):
+                if not more:
+                    return stop
+                if self.waiting_for_host():
+                    await self.woken.wait()
+                else:
+                    await asyncio.sleep(0)
+                # The next slice sees whatever arrived in the meantime
+                self.woken.clear()
+        finally:
+            self.woken = None
 
     def none_or_byte(self, thebyte):
         if thebyte == None:
@@ -635,6 +1541,34 @@ class sim6502(object):
         else:
             print("           PC:" + str_pc + " A:" + str_a + " X:" + str_x + " Y:" + str_y + " SP:" + str_sp + " STATUS:" + str_cc)
 
+    # The status register.  N and Z are only worked out when something
+    # reads them, which few instructions do, so the handlers don't spend
+    # time on them.  self.nz holds the result the two flags were last set
+    # from, as a byte: N is its bit 7 and Z whether it is zero.  A result
+    # that isn't a byte, from uninitialized memory, is stored as its low
+    # byte, or 1 if that is zero, so Z is only set for zero itself.  0x100
+    # stands for N and Z both set, which only BIT, PLP, RTI and assigning
+    # to cc can produce.  self.flags holds the other six flags, with bits 7
+    # and 1 clear.
+
+    @property
+    def cc(self):
+        cc = self.flags
+        nz = self.nz
+        if nz & 0x180:
+            cc |= Flags.NEGATIVE
+        if not nz & 0xff:
+            cc |= Flags.ZERO
+        return cc
+
+    @cc.setter
+    def cc(self, value):
+        self.flags = value & (0xff ^ Flags.NEGATIVE ^ Flags.ZERO)
+        if value & Flags.ZERO:
+            self.nz = 0x100 if value & Flags.NEGATIVE else 0
+        else:
+            self.nz = 0x81 if value & Flags.NEGATIVE else 1
+
     # Utility routines to change the flags
     # So you don't need to remember the bit positions
     #
@@ -646,51 +1580,52 @@ class sim6502(object):
 
     def set_c(self, truth):
         if truth:
-            self.cc = self.cc | Flags.CARRY
+            self.flags = self.flags | Flags.CARRY
         else:
-            self.cc = self.cc & (0xff ^ Flags.CARRY)
+            self.flags = self.flags & (0xff ^ Flags.CARRY)
 
     def set_z(self, truth):
+        negative = self.nz & 0x180
         if truth:
-            self.cc = self.cc | Flags.ZERO
+            self.nz = 0x100 if negative else 0
         else:
-            self.cc = self.cc & (0xff ^ Flags.ZERO)
+            self.nz = 0x81 if negative else 1
 
     def set_i(self, truth):
         if truth:
-            self.cc = self.cc | Flags.INTERRUPT
+            self.flags = self.flags | Flags.INTERRUPT
         else:
-            self.cc = self.cc & (0xff ^ Flags.INTERRUPT)
+            self.flags = self.flags & (0xff ^ Flags.INTERRUPT)
 
     def set_d(self, truth):
         if truth:
-            self.cc = self.cc | Flags.DECIMAL
+            self.flags = self.flags | Flags.DECIMAL
         else:
-            self.cc = self.cc & (0xff ^ Flags.DECIMAL)
+            self.flags = self.flags & (0xff ^ Flags.DECIMAL)
 
     def set_b(self, truth):
         if truth:
-            self.cc = self.cc | Flags.BREAK
+            self.flags = self.flags | Flags.BREAK
         else:
-            self.cc = self.cc & (0xff ^ Flags.BREAK)
+            self.flags = self.flags & (0xff ^ Flags.BREAK)
 
     def set_s(self, truth):
         if truth:
-            self.cc = self.cc | Flags.UNUSED
+            self.flags = self.flags | Flags.UNUSED
         else:
-            self.cc = self.cc & (0xff ^ Flags.UNUSED)
+            self.flags = self.flags & (0xff ^ Flags.UNUSED)
 
     def set_v(self, truth):
         if truth:
-            self.cc = self.cc | Flags.OVERFLOW
+            self.flags = self.flags | Flags.OVERFLOW
         else:
-            self.cc = self.cc & (0xff ^ Flags.OVERFLOW)
+            self.flags = self.flags & (0xff ^ Flags.OVERFLOW)
 
     def set_n(self, truth):
-        if truth:
-            self.cc = self.cc | Flags.NEGATIVE
+        if self.nz & 0xff:
+            self.nz = 0x81 if truth else 1
         else:
-            self.cc = self.cc & (0xff ^ Flags.NEGATIVE)
+            self.nz = 0x100 if truth else 0
 
     def push(self, value):
         self.memory_map.Write(0x100 + self.sp, value)
@@ -725,7 +1660,7 @@ class sim6502(object):
         else:
             offset = operand8
             new_addr = addr + offset
-        return new_addr
+        return new_addr & 0xffff
 
     # Instruction ADC
     # 69 55    adc #$55
@@ -737,43 +1672,20 @@ class sim6502(object):
     # 61 20    adc ($20,X)
     # 71 20    adc ($20),Y
     # 72 20    adc ($20)
-    def instr_adc(self, addrmode, opcode, operand8, operand16):
-        # TODO: support non-BCD arguments in DECIMAL mode
-
-        carryin = self.cc & Flags.CARRY
-
+    def instr_adc(self, fetch, opcode, operand8, operand16):
         # Get the operand based on the address mode
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+        operand, addr = fetch(self, operand8, operand16)
 
-        # Do the add
-        # Compute the carry
-        # Put the result in A
-        # Compute the flags
-
-        if self.cc & Flags.DECIMAL:
-            a_10s = ((self.a & 0xf0) >> 4) * 10
-            a_1s = (self.a & 0xf)
-            operand_10s = ((operand & 0xf0) >> 4) * 10
-            operand_1s = (operand & 0xf)
-            if (a_10s >= 100 or a_1s >= 10 or operand_10s >= 100 or operand_1s >= 10):
-                raise ValueError(f"Invalid BCD argument not supported. self.a={hex(self.a)}, operand={hex(operand)},  a_1s={a_1s}, a_10s={a_10s}, operand_1s={operand_1s}, operand_10s={operand_10s}")
-            sum = (a_10s + a_1s + operand_10s + operand_1s + carryin)
-            self.set_c(sum >= 100)
-
-            sum_1s = sum % 10
-            sum_10s = (sum % 100 - sum_1s)/10
-            result = ((int(sum_10s) << 4) + sum_1s) & 0xff
+        # Look up the sum, its flags and the carry, see alu_table()
+        if self.flags & Flags.DECIMAL:
+            table = alu_table(adc_decimal, self.variant)
         else:
-            result = (self.a + operand + carryin)
-            self.set_c(result > 255)
-            result = result % 256
-
-        acc = self.a
-        self.a = result
-        self.make_flags_nz(result)
-        # self.make_flags_v(self.a, operand, carryin, result, carryout)
-        self.set_v(((acc ^ result) & (operand ^ result) & 0x80) == 0x80)
-        self.pc += length - 1
+            table = self.adc_table
+        entry = table[(self.flags & Flags.CARRY) << 16 | (self.a & 0xff) << 8 | (operand & 0xff)]
+        self.a = entry & 0xff
+        self.nz = entry >> 8 & 0x1ff
+        # Clears C and V, then sets them from the entry
+        self.flags = (self.flags & 0xbe) | entry >> 17
         return None
 
     # Instruction AND
@@ -787,9 +1699,9 @@ class sim6502(object):
     # 31 20    and ($20),Y
     # 32 20    and ($20)
 
-    def instr_and(self, addrmode, opcode, operand8, operand16):
+    def instr_and(self, fetch, opcode, operand8, operand16):
         # Get the operand based on the address mode
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+        operand, addr = fetch(self, operand8, operand16)
 
         # Do the an
         # Put the result in A
@@ -798,8 +1710,7 @@ class sim6502(object):
         result = (self.a & operand)
 
         self.a = result
-        self.make_flags_nz(result)
-        self.pc += length - 1
+        self.nz = result & 0xff or (1 if result else 0)
 
         return None
 
@@ -809,47 +1720,43 @@ class sim6502(object):
     # 16 20    asl $20,X
     # 0E 33 22 asl $2233
     # 1E 33 22 asl $2233,X
-    def instr_asl(self, addrmode, opcode, operand8, operand16):
-        if addrmode == "accumulator":
+    def instr_asl(self, fetch, opcode, operand8, operand16):
+        if fetch is None:
             self.set_c(self.a & 0x80)
             result = (self.a & 0x7f) << 1
             self.a = result
-            self.make_flags_nz(result)
+            self.nz = result
             return None
         else:
             # Get the operand based on the address mode
-            operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+            operand, addr = fetch(self, operand8, operand16)
             self.set_c(operand & 0x80)
             result = (operand & 0x7f) << 1
 
             self.memory_map.Write(addr, result)
-            self.pc += length - 1
-            self.make_flags_nz(result)
-            return ("w", addr)
+            self.nz = result
+            return addr
 
     # Instruction BCC
     # 90 55    bcc $55
-    def instr_bcc(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if not self.cc & Flags.CARRY:
+    def instr_bcc(self, fetch, opcode, operand8, operand16):
+        if not self.flags & Flags.CARRY:
             self.pc = self.relative_address(operand8, self.pc)
 
         return None
 
     # Instruction BCS
     # B0 55    bcs $55
-    def instr_bcs(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if self.cc & Flags.CARRY:
+    def instr_bcs(self, fetch, opcode, operand8, operand16):
+        if self.flags & Flags.CARRY:
             self.pc = self.relative_address(operand8, self.pc)
 
         return None
 
     # Instruction BEQ
     # F0 55    beq $55
-    def instr_beq(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if self.cc & Flags.ZERO:
+    def instr_beq(self, fetch, opcode, operand8, operand16):
+        if not self.nz & 0xff:
             self.pc = self.relative_address(operand8, self.pc)
 
         return None
@@ -860,71 +1767,64 @@ class sim6502(object):
     # 34 20    bit $20,X
     # 2C 33 22 bit $2233
     # 3C 33 22 bit $2233,X
-    def instr_bit(self, addrmode, opcode, operand8, operand16):
+    def instr_bit(self, fetch, opcode, operand8, operand16):
         # Get the operand, immediate or from memory
-        if addrmode == "immediate":
+        if opcode == 0x89:
             # 65C02-only addressing mode.  Per the WDC datasheet, BIT #imm
             # affects only the Z flag; N and V are left unchanged (unlike
             # the memory-operand BIT variants).
             operand = operand8
-            length = 2
             test = self.a & operand
             self.set_z(test == 0x00)
-            self.pc += length - 1
             return None
         else:
-            operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
-
-        # Do the test.
-        test = self.a & operand
-        self.set_z(test == 0x00)
+            operand, addr = fetch(self, operand8, operand16)
 
-        # N is set to bit 7 of the operand
-        self.set_n(operand & 0x80)
+        # Do the test.  Z is set if it is zero, and N is set to bit 7 of
+        # the operand
+        if self.a & operand:
+            self.nz = (operand & 0x80) | 1
+        else:
+            self.nz = (operand & 0x80) << 1
 
         # V is set to bit 6 of the operand
         self.set_v(operand & 0x40)
-        self.pc += length - 1
 
         return None
 
     # Instruction BMI
     # 30 55    bmi $55
-    def instr_bmi(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if self.cc & Flags.NEGATIVE:
+    def instr_bmi(self, fetch, opcode, operand8, operand16):
+        if self.nz & 0x180:
             self.pc = self.relative_address(operand8, self.pc)
 
         return None
 
     # Instruction BNE
     # D0 55    bne $55
-    def instr_bne(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if not self.cc & Flags.ZERO:
+    def instr_bne(self, fetch, opcode, operand8, operand16):
+        if self.nz & 0xff:
             self.pc = self.relative_address(operand8, self.pc)
 
         return None
 
     # Instruction BPL
     # 10 55    bpl $55
-    def instr_bpl(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if not self.cc & Flags.NEGATIVE:
+    def instr_bpl(self, fetch, opcode, operand8, operand16):
+        if not self.nz & 0x180:
             self.pc = self.relative_address(operand8, self.pc)
         return None
 
     # Instruction BRA
     # 80 55    bra $55
-    def instr_bra(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
+    def instr_bra(self, fetch, opcode, operand8, operand16):
         self.pc = self.relative_address(operand8, self.pc)
         return None
 
     # Instruction BRK
     # 00       brk
-    def instr_brk(self, addrmode, opcode, operand8, operand16):
-        # PC is pre-incremented on instruction fetch
+    def instr_brk(self, fetch, opcode, operand8, operand16):
+        # PC is past the opcode, and BRK skips a signature byte as well
         self.pushaddr(self.pc + 1)
         
         #self.set_s(True)
@@ -946,41 +1846,39 @@ class sim6502(object):
 
     # Instruction BVC
     # 50 55    bvc $55
-    def instr_bvc(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if not self.cc & Flags.OVERFLOW:
+    def instr_bvc(self, fetch, opcode, operand8, operand16):
+        if not self.flags & Flags.OVERFLOW:
             self.pc = self.relative_address(operand8, self.pc)
         return None
 
     # Instruction BVS
     # 70 55    bvs $55
-    def instr_bvs(self, addrmode, opcode, operand8, operand16):
-        self.pc += 1
-        if self.cc & Flags.OVERFLOW:
+    def instr_bvs(self, fetch, opcode, operand8, operand16):
+        if self.flags & Flags.OVERFLOW:
             self.pc = self.relative_address(operand8, self.pc)
         return None
 
     # Instruction CLC
     # 18        clc
-    def instr_clc(self, addrmode, opcode, operand8, operand16):
+    def instr_clc(self, fetch, opcode, operand8, operand16):
         self.set_c(False)
         return None
 
     # Instruction CLD
     # D8        cld
-    def instr_cld(self, addrmode, opcode, operand8, operand16):
+    def instr_cld(self, fetch, opcode, operand8, operand16):
         self.set_d(False)
         return None
 
     # Instruction CLI
     # 58        cli
-    def instr_cli(self, addrmode, opcode, operand8, operand16):
+    def instr_cli(self, fetch, opcode, operand8, operand16):
         self.set_i(False)
         return None
 
     # Instruction CLV
     # 57        clv
-    def instr_clv(self, addrmode, opcode, operand8, operand16):
+    def instr_clv(self, fetch, opcode, operand8, operand16):
         self.set_v(False)
         return None
 
@@ -993,58 +1891,50 @@ class sim6502(object):
     # C1 20    cmp ($20,X)
     # D1 20    cmp ($20),Y
     # D2 20    cmp ($20)
-    def instr_cmp(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
-        # CMP sets C=1 if A >= operand (unsigned), else C=0.
-        self.set_c(self.a >= operand)
-        test = self.a - operand
-        if test < 0:
-            test += 256
-        self.make_flags_nz(test)
-        self.pc += length - 1
+    def instr_cmp(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
+        # CMP sets C=1 if A >= operand (unsigned), else C=0: SBC with
+        # the carry set, without the result, see alu_table()
+        entry = self.sbc_table[0x10000 | (self.a & 0xff) << 8 | (operand & 0xff)]
+        self.nz = entry >> 8 & 0x1ff
+        self.flags = (self.flags & 0xfe) | (entry >> 17 & 1)
         return None
 
     # Instruction CPX
     # E0 55    cpx #$55
     # E4 20    cpx $20
     # EC 33 22 cpx $2233
-    def instr_cpx(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
-        # CPX sets C=1 if X >= operand (unsigned), else C=0.
-        self.set_c(self.x >= operand)
-        test = self.x - operand
-        if test < 0:
-            test += 256
-        self.make_flags_nz(test)
-        self.pc += length - 1
+    def instr_cpx(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
+        # CPX sets C=1 if X >= operand (unsigned), else C=0: SBC with
+        # the carry set, without the result, see alu_table()
+        entry = self.sbc_table[0x10000 | (self.x & 0xff) << 8 | (operand & 0xff)]
+        self.nz = entry >> 8 & 0x1ff
+        self.flags = (self.flags & 0xfe) | (entry >> 17 & 1)
         return None
 
     # Instruction CPY
     # C0 55    cpy #$55
     # C4 20    cpy $20
     # CC 33 22 cpy $2233
-    def instr_cpy(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
-        # CPY sets C=1 if Y >= operand (unsigned), else C=0.
-        self.set_c(self.y >= operand)
-        test = self.y - operand
-        if test < 0:
-            test += 256
-        self.make_flags_nz(test)
-        self.pc += length - 1
+    def instr_cpy(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
+        # CPY sets C=1 if Y >= operand (unsigned), else C=0: SBC with
+        # the carry set, without the result, see alu_table()
+        entry = self.sbc_table[0x10000 | (self.y & 0xff) << 8 | (operand & 0xff)]
+        self.nz = entry >> 8 & 0x1ff
+        self.flags = (self.flags & 0xfe) | (entry >> 17 & 1)
         return None
 
     # Instruction DEA aka DEC A
     # 3A       dea
-    def instr_dea(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_dea(self, fetch, opcode, operand8, operand16):
         # TODO: add test case
         if self.a:
             self.a -= 1
         else:
             self.a = 0xff
-        self.make_flags_nz(self.a)
-        self.pc += length - 1
+        self.nz = self.a & 0xff or (1 if self.a else 0)
         return None
 
     # Instruction DEC
@@ -1052,44 +1942,39 @@ class sim6502(object):
     # D6 20    dec $20,X
     # CE 33 22 dec $2233
     # DE 33 22 dec $2233,X
-    def instr_dec(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_dec(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         # TODO: add test case
         if operand:
             result = operand - 1
         else:
             result = 0xff
-        self.make_flags_nz(result)
+        self.nz = result & 0xff or (1 if result else 0)
         self.memory_map.Write(addr, result)
-        self.pc += length - 1
-        return ("w", addr)
+        return addr
 
     # Instruction DEX
     # CA       dex
-    def instr_dex(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_dex(self, fetch, opcode, operand8, operand16):
         # TODO: add test case
         if self.x:
             result = self.x - 1
         else:
             result = 0xff
-        self.make_flags_nz(result)
+        self.nz = result & 0xff or (1 if result else 0)
         self.x = result
-        self.pc += length - 1
         return None
 
     # Instruction DEY
     # 88       dey
-    def instr_dey(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_dey(self, fetch, opcode, operand8, operand16):
         # TODO: add test case
         if self.y:
             result = self.y - 1
         else:
             result = 0xff
-        self.make_flags_nz(result)
+        self.nz = result & 0xff or (1 if result else 0)
         self.y = result
-        self.pc += length - 1
         return None
 
     # Instruction EOR
@@ -1102,9 +1987,9 @@ class sim6502(object):
     # 41 20    eor ($20,X)
     # 51 20    eor ($20),Y
     # 52 20    eor ($20)
-    def instr_eor(self, addrmode, opcode, operand8, operand16):
+    def instr_eor(self, fetch, opcode, operand8, operand16):
         # Get the operand based on the address mode
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+        operand, addr = fetch(self, operand8, operand16)
 
         # Do the an
         # Put the result in A
@@ -1113,17 +1998,14 @@ class sim6502(object):
         result = (self.a ^ operand)
 
         self.a = result
-        self.make_flags_nz(result)
-        self.pc += length - 1
+        self.nz = result & 0xff or (1 if result else 0)
         return None
 
     # Instruction INA aka INC A
     # 1A       ina
-    def instr_ina(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_ina(self, fetch, opcode, operand8, operand16):
         self.a = (self.a + 1) % 256
-        self.make_flags_nz(self.a)
-        self.pc += length - 1
+        self.nz = self.a
         return None
 
     # Instruction INC
@@ -1131,41 +2013,35 @@ class sim6502(object):
     # F6 20    inc $20,X
     # EE 33 22 inc $2233
     # FE 33 22 inc $2233,X
-    def instr_inc(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_inc(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         result = (operand + 1) % 256
-        self.make_flags_nz(result)
-        self.pc += length - 1
+        self.nz = result
         self.memory_map.Write(addr, result)
         return None
 
     # Instruction INX
     # E8       inx
-    def instr_inx(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_inx(self, fetch, opcode, operand8, operand16):
         result = (self.x + 1) % 256
-        self.make_flags_nz(result)
+        self.nz = result
         self.x = result
-        self.pc += length - 1
 
     # Instruction INY
     # C8       iny
-    def instr_iny(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_iny(self, fetch, opcode, operand8, operand16):
         result = (self.y + 1) % 256
-        self.make_flags_nz(result)
+        self.nz = result
         self.y = result
-        self.pc += length - 1
         return None
 
     # Instruction JMP
     # 4C 33 22 jmp $2233
     # 6C 33 22 jmp ($2233)
     # 7C 33 22 jmp ($2233,X)
-    def instr_jmp(self, addrmode, opcode, operand8, operand16):
-        # print "INSTR_JMP CALLED addrmode = %s opcode=%02x operand8=%02x operand16=%04x" % (addrmode,opcode,operand8,operand16)
-        operand, addr, length = self.get_operand16(addrmode, opcode, operand8, operand16)
-        # print "INSTR_JMP operand   = %04x addr=%04x length=%d" % (operand,addr, length)
+    def instr_jmp(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
+        # print "INSTR_JMP operand   = %04x addr=%04x" % (operand,addr)
         # print "INSTR_JMP operand16 = %04x " % operand16
         self.pc = addr
         return None
@@ -1173,14 +2049,13 @@ class sim6502(object):
         # Instruction JSR
 
     # 20 33 22 jsr $2233
-    def instr_jsr(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand16(addrmode, opcode, operand8, operand16)
-        self.pc += length - 1
-        # Pushes the address - 1 of the next operation to be executed, so that when RTS is
-        # called and the next opcode pre-increments PC, it will be pointed at the right place.
+    def instr_jsr(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
+        # Pushes the address - 1 of the next operation to be executed, as RTS adds
+        # one to the address it pulls.  PC is already past the operand.
         self.pushaddr(self.pc - 1)
         self.pc = addr
-        return ("stack", self.sp)
+        return None
 
         # Instruction LDA
 
@@ -1193,12 +2068,10 @@ class sim6502(object):
     # A1 20    lda ($20,X)
     # B1 20    lda ($20),Y
     # B2 20    lda ($20)
-    def instr_lda(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
-        # print "LDA : addrmode:"+str(addrmode)+" operand:"+str(operand)+" operand8 "+str(operand8)
+    def instr_lda(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         self.a = operand
-        self.make_flags_nz(operand)
-        self.pc += length - 1
+        self.nz = operand & 0xff or (1 if operand else 0)
         return None
 
     # Instruction LDX
@@ -1208,11 +2081,10 @@ class sim6502(object):
     # B6 20    ldx $20,Y
     # AE 33 22 ldx $2233
     # BE 33 22 ldx $2233,Y
-    def instr_ldx(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_ldx(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         self.x = operand
-        self.make_flags_nz(operand)
-        self.pc += length - 1
+        self.nz = operand & 0xff or (1 if operand else 0)
         return None
 
     # Instruction LDY
@@ -1221,11 +2093,10 @@ class sim6502(object):
     # B4 20    ldy $20,X
     # AC 33 22 ldy $2233
     # BC 33 22 ldy $2233,X
-    def instr_ldy(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_ldy(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         self.y = operand
-        self.make_flags_nz(operand)
-        self.pc += length - 1
+        self.nz = operand & 0xff or (1 if operand else 0)
         return None
 
     # Instruction LSR
@@ -1234,27 +2105,26 @@ class sim6502(object):
     # 56 20    lsr $20,X
     # 4E 33 22 lsr $2233
     # 5E 33 22 lsr $2233,X
-    def instr_lsr(self, addrmode, opcode, operand8, operand16):
-        if (addrmode == "accumulator"):
+    def instr_lsr(self, fetch, opcode, operand8, operand16):
+        if fetch is None:
             self.set_c(self.a & 0x01)
 
             result = self.a >> 1
             self.a = result
-            self.make_flags_nz(result)
+            self.nz = result & 0xff or (1 if result else 0)
             return None
         else:
-            operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+            operand, addr = fetch(self, operand8, operand16)
             self.set_c(operand & 0x01)
 
             result = (operand >> 1) & 0xff
-            self.pc += length - 1
-            self.make_flags_nz(result)
+            self.nz = result
             self.memory_map.Write(addr, result)
-            return ("w", addr)
+            return addr
 
     # Instruction NOP
     # EA       nop
-    def instr_nop(self, addrmode, opcode, operand8, operand16):
+    def instr_nop(self, fetch, opcode, operand8, operand16):
         return None
 
     # Instruction ORA
@@ -1267,12 +2137,11 @@ class sim6502(object):
     # 01 20    ora ($20,X)
     # 11 20    ora ($20),Y
     # 12 20    ora ($20)
-    def instr_ora(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_ora(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         result = (operand | self.a)
         self.a = result
-        self.make_flags_nz(result)
-        self.pc += length - 1
+        self.nz = result & 0xff or (1 if result else 0)
         return None
 
     # Instruction PHA and other Pxx stack instructions
@@ -1284,7 +2153,7 @@ class sim6502(object):
     # 68       pla
     # FA       plx
     # 7A       ply
-    def instr_php(self, addrmode, opcode, operand8, operand16):
+    def instr_php(self, fetch, opcode, operand8, operand16):
         #self.memory_map.Write(0x100 + self.sp, self.cc)
         # PHP always pushes P with bits 4 (BREAK) and 5 (UNUSED) set, because
         # on real hardware those bits are always forced to 1 on software
@@ -1295,54 +2164,54 @@ class sim6502(object):
             self.sp = self.sp - 1
         else:
             self.sp = 0xff
-        return ("stack", self.sp)
+        return None
 
-    def instr_pha(self, addrmode, opcode, operand8, operand16):
+    def instr_pha(self, fetch, opcode, operand8, operand16):
         self.memory_map.Write(0x100 + self.sp,  self.a)
         if self.sp:
             self.sp = self.sp - 1
         else:
             self.sp = 0xff
-        return ("stack", self.sp)
+        return None
 
-    def instr_phx(self, addrmode, opcode, operand8, operand16):
+    def instr_phx(self, fetch, opcode, operand8, operand16):
         self.memory_map.Write(0x100 + self.sp, self.x)
         if self.sp:
             self.sp = self.sp - 1
         else:
             self.sp = 0xff
-        return ("stack", self.sp)
+        return None
 
-    def instr_phy(self, addrmode, opcode, operand8, operand16):
+    def instr_phy(self, fetch, opcode, operand8, operand16):
         self.memory_map.Write(0x100 + self.sp,  self.y)
         if self.sp:
             self.sp = self.sp - 1
         else:
             self.sp = 0xff
-        return ("stack", self.sp)
+        return None
 
-    def instr_plp(self, addrmode, opcode, operand8, operand16):
+    def instr_plp(self, fetch, opcode, operand8, operand16):
         self.sp = (self.sp + 1) % 256
         self.cc = self.memory_map.Read(0x100 + self.sp)
-        return ("stack", self.sp)
+        return None
 
-    def instr_pla(self, addrmode, opcode, operand8, operand16):
+    def instr_pla(self, fetch, opcode, operand8, operand16):
         self.sp = (self.sp + 1) % 256
         self.a = self.memory_map.Read(0x100 + self.sp)
-        self.make_flags_nz(self.a)
-        return ("stack", self.sp)
+        self.nz = self.a & 0xff or (1 if self.a else 0)
+        return None
 
-    def instr_plx(self, addrmode, opcode, operand8, operand16):
+    def instr_plx(self, fetch, opcode, operand8, operand16):
         self.sp = (self.sp + 1) % 256
         self.x = self.memory_map.Read(0x100 + self.sp)
-        self.make_flags_nz(self.x)
-        return ("stack", self.sp)
+        self.nz = self.x & 0xff or (1 if self.x else 0)
+        return None
 
-    def instr_ply(self, addrmode, opcode, operand8, operand16):
+    def instr_ply(self, fetch, opcode, operand8, operand16):
         self.sp = (self.sp + 1) % 256
         self.y = self.memory_map.Read(0x100 + self.sp)
-        self.make_flags_nz(self.y)
-        return ("stack", self.sp)
+        self.nz = self.y & 0xff or (1 if self.y else 0)
+        return None
 
     # Instruction ROL
     # 2A       rol A
@@ -1350,28 +2219,27 @@ class sim6502(object):
     # 36 20    rol $20,X
     # 2E 33 22 rol $2233
     # 3E 33 22 rol $2233,X
-    def instr_rol(self, addrmode, opcode, operand8, operand16):
-        if (addrmode == "accumulator"):
+    def instr_rol(self, fetch, opcode, operand8, operand16):
+        if fetch is None:
             carryout = self.a & 0x80
-            carryin = self.cc & Flags.CARRY
+            carryin = self.flags & Flags.CARRY
 
             result = ((self.a << 1) & 0xff) | carryin
             self.a = result
             self.set_c(carryout)
-            self.make_flags_nz(result)
+            self.nz = result
             return None
         else:
-            operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+            operand, addr = fetch(self, operand8, operand16)
 
             carryout = (operand & 0x80)
-            carryin = self.cc & Flags.CARRY
+            carryin = self.flags & Flags.CARRY
 
             result = ((operand << 1) & 0xff) | carryin
             self.set_c(carryout)
             self.memory_map.Write(addr, result)
-            self.pc += length - 1
-            self.make_flags_nz(result)
-            return ("w", addr)
+            self.nz = result
+            return addr
 
     # Instruction ROR
     # 6A       ror A
@@ -1379,9 +2247,9 @@ class sim6502(object):
     # 76 20    ror $20,X
     # 6E 33 22 ror $2233
     # 7E 33 22 ror $2233,X
-    def instr_ror(self, addrmode, opcode, operand8, operand16):
-        if (addrmode == "accumulator"):
-            if self.cc & Flags.CARRY:
+    def instr_ror(self, fetch, opcode, operand8, operand16):
+        if fetch is None:
+            if self.flags & Flags.CARRY:
                 carry = 0x80
             else:
                 carry = 0
@@ -1390,11 +2258,11 @@ class sim6502(object):
             result = (self.a >> 1) | carry
             self.a = result
             self.set_c(carryout)
-            self.make_flags_nz(result)
+            self.nz = result & 0xff or (1 if result else 0)
             return None
         else:
-            operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
-            if self.cc & Flags.CARRY:
+            operand, addr = fetch(self, operand8, operand16)
+            if self.flags & Flags.CARRY:
                 carry = 0x80
             else:
                 carry = 0
@@ -1403,14 +2271,13 @@ class sim6502(object):
             result = ((operand >> 1) % 256) | carry
             self.memory_map.Write(addr, result)
             self.set_c(carryout)
-            self.pc += length - 1
-            self.make_flags_nz(result)
-            return ("w", addr)
+            self.nz = result
+            return addr
 
             # Instruction RTI
 
     # 40       rti
-    def instr_rti(self, addrmode, opcode, operand8, operand16):
+    def instr_rti(self, fetch, opcode, operand8, operand16):
         # Restore the flag byte from stack faithfully. On real hardware bits 4
         # and 5 of P are not actually stored by the CPU (they are synthesized
         # at push time), so whatever we pull into those positions is a
@@ -1420,13 +2287,13 @@ class sim6502(object):
         self.pc = self.pulladdr()
         #self.set_b(True)
         #self.set_s(True)
-        return ("stack", self.sp)
+        return None
 
     # Instruction RTS
     # 60       rts
-    def instr_rts(self, addrmode, opcode, operand8, operand16):
+    def instr_rts(self, fetch, opcode, operand8, operand16):
         self.pc = (self.pulladdr() + 1) % 0x10000
-        return ("stack", self.sp)
+        return None
 
         # Instruction SBC
 
@@ -1439,60 +2306,36 @@ class sim6502(object):
     # E1 20    sbc ($20,X)
     # F1 20    sbc ($20),Y
     # F2 20    sbc ($20)
-    def instr_sbc(self, addrmode, opcode, operand8, operand16):
-        carryin = not (self.cc & Flags.CARRY)
-
+    def instr_sbc(self, fetch, opcode, operand8, operand16):
         # Get the operand based on the address mode
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
-
-        # Do the subtract
-        # Compute the carry
-        # Put the result in A
-        # Compute the flags
+        operand, addr = fetch(self, operand8, operand16)
 
-        if self.cc & Flags.DECIMAL:
-            a_10s = ((self.a & 0xf0) >> 4) * 10
-            a_1s = (self.a & 0xf)
-            operand_10s = ((operand & 0xf0) >> 4) * 10
-            operand_1s = (operand & 0xf)
-
-            if (a_10s >= 100 or a_1s >= 10 or operand_10s >= 100 or operand_1s >= 10):
-                raise ValueError("Invalid BCD argument not supported")
-            diff = (a_10s + a_1s - operand_10s - operand_1s - carryin)
-            carryout = diff < 0
-
-            diff_1s = diff % 10
-            diff_10s = (diff % 100 - diff_1s)//10
-
-            result = diff_10s * 16 + diff_1s
+        # Look up the difference, its flags and the carry, see alu_table()
+        if self.flags & Flags.DECIMAL:
+            table = alu_table(sbc_decimal, self.variant)
         else:
-            result = (self.a - operand - carryin)
-            carryout = result < 0
-            result = result % 256
-
-        self.set_c(not carryout)
-
-        self.a = result
-        self.make_flags_nz(result)
-        self.make_flags_v(self.a, operand, carryin, result, carryout)
-        self.pc += length - 1
+            table = self.sbc_table
+        entry = table[(self.flags & Flags.CARRY) << 16 | (self.a & 0xff) << 8 | (operand & 0xff)]
+        self.a = entry & 0xff
+        self.nz = entry >> 8 & 0x1ff
+        self.flags = (self.flags & 0xbe) | entry >> 17
         return None
 
     # Instruction SEC
     # 38       sec
-    def instr_sec(self, addrmode, opcode, operand8, operand16):
+    def instr_sec(self, fetch, opcode, operand8, operand16):
         self.set_c(True)
         return None
 
     # Instruction SED
     # F8       sed
-    def instr_sed(self, addrmode, opcode, operand8, operand16):
+    def instr_sed(self, fetch, opcode, operand8, operand16):
         self.set_d(True)
         return None
 
     # Instruction SEI
     # 78       sei
-    def instr_sei(self, addrmode, opcode, operand8, operand16):
+    def instr_sei(self, fetch, opcode, operand8, operand16):
         self.set_i(True)
         return None
 
@@ -1505,99 +2348,96 @@ class sim6502(object):
     # 81 20    sta ($20,X)
     # 91 20    sta ($20),Y
     # 92 20    sta ($20)
-    def instr_sta(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_sta(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         self.memory_map.Write(addr, self.a)
-        self.pc += length - 1
-        return ("w", addr)
+        return addr
 
     # Instruction STX
     # 86 20    stx $20
     # 96 20    stx $20,Y
     # 8E 33 22 stx $2233
-    def instr_stx(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_stx(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         self.memory_map.Write(addr, self.x)
-        self.pc += length - 1
-        return ("w", addr)
+        return addr
 
     # Instruction STY
     # 84 20    sty $20
     # 94 20    sty $20,X
     # 8C 33 22 sty $2233
-    def instr_sty(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_sty(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         self.memory_map.Write(addr, self.y)
-        self.pc += length - 1
-        return ("w", addr)
+        return addr
 
     # Instruction STZ
     # 64 20    stz $20
     # 74 20    stz $20,X
     # 9C 33 22 stz $2233
     # 9E 33 22 stz $2233,X
-    def instr_stz(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_stz(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         self.memory_map.Write(addr, 0x00)
-        self.pc += length - 1
-        return ("w", addr)
+        return addr
 
     # Instruction TAX
     # AA       tax
-    def instr_tax(self, addrmode, opcode, operand8, operand16):
+    def instr_tax(self, fetch, opcode, operand8, operand16):
         self.x = self.a
-        self.make_flags_nz(self.a)
+        self.nz = self.a & 0xff or (1 if self.a else 0)
         return None
 
     # Instruction TAY
     # A8       tay
-    def instr_tay(self, addrmode, opcode, operand8, operand16):
+    def instr_tay(self, fetch, opcode, operand8, operand16):
         self.y = self.a
-        self.make_flags_nz(self.a)
+        self.nz = self.a & 0xff or (1 if self.a else 0)
         return None
 
     # Instruction TRB
     # 14 20    trb $20
     # 1C 33 22 trb $2233
-    def instr_trb(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_trb(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         result = operand & (self.a ^ 0xff)
         self.memory_map.Write(addr, result)
         self.set_z((operand & self.a) == 0x00)
-        self.pc += length - 1
-        return ("w", addr)
+        return addr
 
     # Instruction TSB
     # 04 20    tsb $20
     # 0C 33 22 tsb $2233
-    def instr_tsb(self, addrmode, opcode, operand8, operand16):
-        operand, addr, length = self.get_operand(addrmode, opcode, operand8, operand16)
+    def instr_tsb(self, fetch, opcode, operand8, operand16):
+        operand, addr = fetch(self, operand8, operand16)
         result = operand | self.a
         self.memory_map.Write(addr, result)
         self.set_z((operand & self.a) == 0x00)
-        self.pc += length - 1
-        return ("w", addr)
+        return addr
 
     # BA       tsx
-    def instr_tsx(self, addrmode, opcode, operand8, operand16):
+    def instr_tsx(self, fetch, opcode, operand8, operand16):
         self.x = self.sp
-        self.make_flags_nz(self.sp)
+        self.nz = self.sp & 0xff or (1 if self.sp else 0)
         return None
 
         # 8A       txa
 
-    def instr_txa(self, addrmode, opcode, operand8, operand16):
+    def instr_txa(self, fetch, opcode, operand8, operand16):
         self.a = self.x
-        self.make_flags_nz(self.x)
+        self.nz = self.x & 0xff or (1 if self.x else 0)
         return None
 
     # 9A       txs
-    def instr_txs(self, addrmode, opcode, operand8, operand16):
+    def instr_txs(self, fetch, opcode, operand8, operand16):
         self.sp = self.x
         return None
 
     # 98       tya
-    def instr_tya(self, addrmode, opcode, operand8, operand16):
+    def instr_tya(self, fetch, opcode, operand8, operand16):
         self.a = self.y
-        self.make_flags_nz(self.y)
+        self.nz = self.y & 0xff or (1 if self.y else 0)
         return None
+
+for _variant in sim6502.VARIANTS:
+    sim6502._opcode_tables[_variant] = types.MappingProxyType(sim6502.opcode_table(_variant))
@@ -0,0 +1,127 @@
+"""Memory-mapped devices fed by asyncio streams, for sim6502.run_async().
+
+A device keeps the bytes that have arrived for the program in a buffer,
+and the program reads them through the device's registers.  pump() copies
+from an asyncio.StreamReader into the buffer until end of file, waking a
+simulator that is waiting in an idle loop for input, so one process can
+serve many simulated machines, each with its own console connection:
+
+    async def session(reader, writer):
+        s = sim6502(image, idle=True)
+        s.pc = a.symbols["start"]
+        keyboard = Keyboard(s)
+        serial = SerialPort(s, 0xc0a8, writer)
+        asyncio.ensure_future(keyboard.pump(reader))
+        await s.run_async()
+
+    async def main():
+        server = await asyncio.start_server(session, "localhost", 6502)
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+Input only arrives between the slices run_async() runs, so while the
+buffer is empty a device's registers read the same until the host feeds
+it.  Its next_change() says so, letting a polling loop that reads it be
+skipped; see idle6502.
+"""
+
+import collections
+
+import memory_map
+
+
+class StreamDevice(object):
+    """The input buffer and its feeding, shared by the devices below."""
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.input = collections.deque()
+
+    def feed(self, data):
+        """Add data, bytes, to what the program has to read."""
+        self.input.extend(data)
+        self.cpu.wake()
+
+    async def pump(self, reader):
+        """Feed what reader, an asyncio.StreamReader, sends until it ends."""
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                break
+            self.feed(data)
+
+    def next_change(self, address):
+        # Reads may take buffered input straight away
+        if self.input:
+            return self.cpu.cycles
+        return None
+
+
+class Keyboard(StreamDevice):
+    """An Apple II keyboard.
+
+    Reading data gives the last key, with bit 7 set until the program
+    accesses strobe to take it; then the next key in the buffer comes up.
+    Newlines arrive as the Return key, $0D.
+    """
+
+    def __init__(self, cpu, data=0xc000, strobe=0xc010):
+        StreamDevice.__init__(self, cpu)
+        self.data = data
+        self.strobe = strobe
+        self.key = 0x00
+        cpu.memory_map.Intercept(data, self)
+        cpu.memory_map.Intercept(strobe, self)
+        cpu.memory_map.Poke(data, self.key)
+
+    def __call__(self, address, access_mode, value):
+        if access_mode == memory_map.MODE_EXECUTE:
+            return
+        if address == self.data:
+            if access_mode == memory_map.MODE_READ:
+                if not self.key & 0x80 and self.input:
+                    key = self.input.popleft()
+                    if key == 0x0a:
+                        key = 0x0d
+                    self.key = (key & 0x7f) | 0x80
+                self.cpu.memory_map.Poke(address, self.key)
+        else:
+            self.key &= 0x7f
+
+
+class SerialPort(StreamDevice):
+    """A 6551 ACIA's data and status registers at base and base + 1.
+
+    Reading data takes the next byte of input, and status has bit 3 set
+    while there is one.  Bytes written to data go to writer, an
+    asyncio.StreamWriter, or if it is None to self.output.  The transmitter
+    is always ready, bit 4 of status.
+    """
+
+    RECEIVER_FULL = 0x08
+    TRANSMITTER_EMPTY = 0x10
+
+    def __init__(self, cpu, base, writer=None):
+        StreamDevice.__init__(self, cpu)
+        self.base = base
+        self.writer = writer
+        self.output = bytearray()
+        cpu.memory_map.InterceptRange(base, base + 2, self)
+
+    def __call__(self, address, access_mode, value):
+        m = self.cpu.memory_map
+        if access_mode == memory_map.MODE_WRITE:
+            if address == self.base:
+                if self.writer is not None:
+                    self.writer.write(bytes((value & 0xff,)))
+                else:
+                    self.output.append(value & 0xff)
+        elif access_mode == memory_map.MODE_READ:
+            if address == self.base:
+                m.Poke(address, self.input.popleft() if self.input else 0x00)
+            else:
+                status = self.TRANSMITTER_EMPTY
+                if self.input:
+                    status |= self.RECEIVER_FULL
+                m.Poke(address, status)
@@ -0,0 +1,163 @@
+"""Run many independent simulations of one program across processes.
+
+sweep() takes an assembled image, an entry address, a stop condition and
+a list of cases.  Each case says what to put in memory and the registers
+before the run, and what to read back after it.  Every worker process
+builds one simulator from the image and snapshots it, then restores that
+snapshot before each of its cases, so the image is sent to each worker
+once rather than with every case.
+
+    a = asm6502()
+    a.assemble(source)
+    cases = [Case(memory={"arg": [n]}, results=[("result", 2)])
+             for n in range(256)]
+    for result in sweep(a.object_code, a.symbols, "start", cases,
+                        until_pc="done"):
+        print(result.memory[0])
+
+Addresses may be given as numbers or as names from the symbol table.
+"""
+
+import multiprocessing
+import os
+
+from sim6502 import sim6502
+
+# Cases handed to a worker at a time when the caller doesn't say
+DEFAULT_CHUNKSIZE = 256
+
+
+def resolve(symbols, address):
+    """Return address as a number, looking it up in symbols if it's a name."""
+    if isinstance(address, str):
+        return symbols[address]
+    return address
+
+
+class Case(object):
+    """One simulation in a sweep.
+
+    memory maps addresses to the bytes to load there, and registers maps
+    register names (pc, a, x, y, sp, cc) to their values, before the run.
+    results is a list of (address, length) ranges to read back after it.
+    Subclass and override setup() and extract() for anything else; the
+    subclass must be importable by the worker processes.
+    """
+
+    def __init__(self, memory=None, registers=None, results=()):
+        self.memory = memory or {}
+        self.registers = registers or {}
+        self.results = results
+
+    def setup(self, cpu, symbols):
+        for address, data in self.memory.items():
+            cpu.memory_map.Load(resolve(symbols, address), data)
+        for name, value in self.registers.items():
+            setattr(cpu, name, value)
+
+    def extract(self, cpu, symbols, stop):
+        peek = cpu.memory_map.Peek
+        memory = []
+        for address, length in self.results:
+            address = resolve(symbols, address)
+            memory.append([peek((address + i) & 0xffff) for i in range(length)])
+        return Result(cpu, stop, memory)
+
+
+class Result(object):
+    """What a Case left behind.
+
+    stop is the StopReason returned by run(), registers a dict of the
+    registers and cycle count when it stopped, and memory a list of byte
+    values for each of the case's results ranges.
+    """
+
+    def __init__(self, cpu, stop, memory):
+        self.stop = stop
+        self.registers = dict(pc=cpu.pc, a=cpu.a, x=cpu.x, y=cpu.y, sp=cpu.sp,
+                              cc=cpu.cc, cycles=cpu.cycles)
+        self.memory = memory
+
+    def __repr__(self):
+        return "Result(%r, %r, %r)" % (self.stop, self.registers, self.memory)
+
+
+# The simulator of this worker, its starting snapshot, the symbol table
+# and the arguments for run()
+_worker = None
+
+
+def _start_worker(object_code, symbols, entry, variant, compact_memory, run_args):
+    global _worker
+    cpu = sim6502(object_code, symbols=symbols, variant=variant,
+                  compact_memory=compact_memory)
+    cpu.pc = entry
+    _worker = (cpu, cpu.snapshot(), symbols, run_args)
+
+
+def _run_case(case):
+    cpu, snapshot, symbols, run_args = _worker
+    cpu.restore(snapshot)
+    case.setup(cpu, symbols)
+    stop = cpu.run(**run_args)
+    return case.extract(cpu, symbols, stop)
+
+
+def sweep(object_code, symbols, entry, cases, until_pc=None, max_steps=None,
+          max_cycles=None, stop_on_brk=True, variant=sim6502.CMOS,
+          compact_memory=True, processes=None, chunksize=None):
+    """Run every case from entry and return their Results, in order.
+
+    Parameters
+    ----------
+    object_code : sequence of int
+        The memory image, e.g. asm6502.object_code, loaded at address 0.
+    symbols : dict or None
+        Symbol table for addresses given by name.
+    entry : int or str
+        Where each case starts, unless it sets pc itself.
+    cases : iterable of Case
+        The simulations to run.  Each one starts from the same image and
+        registers, whatever the cases before it did.
+    until_pc, max_steps, max_cycles, stop_on_brk :
+        Passed to sim6502.run(); until_pc may be names too.
+    variant : str
+        sim6502.NMOS or sim6502.CMOS.
+    compact_memory : bool
+        Give the workers' simulators the bytearray memory of
+        sim6502(compact_memory=True), which is quicker to build and to
+        restore.  Addresses the image leaves untouched then read as 0
+        rather than -1.
+    processes : int or None
+        Worker processes, by default one per CPU.  With 1 the cases run in
+        this process, which is handy under a debugger.
+    chunksize : int or None
+        Cases sent to a worker at a time.
+    """
+    symbols = symbols or {}
+    if isinstance(until_pc, (list, tuple, set, frozenset)):
+        until_pc = set(resolve(symbols, address) for address in until_pc)
+    elif until_pc is not None:
+        until_pc = resolve(symbols, until_pc)
+    run_args = dict(until_pc=until_pc, max_steps=max_steps, max_cycles=max_cycles,
+                    stop_on_brk=stop_on_brk)
+    initargs = (object_code, symbols, resolve(symbols, entry), variant, compact_memory,
+                run_args)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes == 1:
+        _start_worker(*initargs)
+        return [_run_case(case) for case in cases]
+
+    if chunksize is None:
+        if hasattr(cases, "__len__"):
+            # A few chunks per worker evens out cases of different lengths
+            chunksize = max(1, min(DEFAULT_CHUNKSIZE, len(cases) // (processes * 4)))
+        else:
+            chunksize = DEFAULT_CHUNKSIZE
+    pool = multiprocessing.Pool(processes, _start_worker, initargs)
+    try:
+        return list(pool.imap(_run_case, cases, chunksize))
+    finally:
+        pool.close()
+        pool.join()
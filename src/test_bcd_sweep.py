@@ -8,16 +8,12 @@ This is the kind of exhaustive sweep you'd use against an RTL implementation
 to pin down BCD-mode arithmetic end-to-end.  40 000 cases for each of ADC
 and SBC = 80 000 simulator steps, runs in well under a minute.
 
-What is NOT tested here:
-  * Invalid BCD inputs (the simulator raises ValueError on those; covering
-    that would require a separate test with try/except structure).
-  * N, V, Z flag fidelity -- NMOS computes these from the pre-adjust binary
-    result, 65C02 from the decimal-correct result.  The simulator uses a
-    single code path and matches neither exactly; a separate, variant-aware
-    sweep should cover those flags once the sim is fixed.  For now the
-    sweep focuses on the two bits that practical BCD code actually depends
-    on: the result byte and the carry-out (used for multi-byte BCD
-    arithmetic).
+BcdFlagSweep then checks N, V and Z over the same pairs, which differ
+between the variants: NMOS computes Z from the binary result and N and V
+from the sum before the high digit is adjusted, where the 65C02 takes N
+and Z from the decimal-correct result; SBC's flags other than the 65C02's
+N and Z are those of binary subtraction.  Invalid BCD inputs are covered
+by the py65 tests in test_mpu6502.py.
 """
 
 import unittest
@@ -172,6 +168,71 @@ class BcdSbcSweep(unittest.TestCase):
                          "\n".join(_fmt_failure(f) for f in failures)))
 
 
+def adc_overflow_reference(a, m, carry_in):
+    """V after a decimal ADC: the signed sum of the high digits, plus the
+    adjusted low digit, doesn't fit in a byte."""
+    low = (a & 0xF) + (m & 0xF) + carry_in
+    if low >= 0xA:
+        low = ((low + 6) & 0xF) + 0x10
+    signed = (a & 0xF0) - (0x100 if a & 0x80 else 0) + (m & 0xF0) - (0x100 if m & 0x80 else 0)
+    total = signed + low
+    return 1 if total < -128 or total > 127 else 0, 1 if total & 0x80 else 0
+
+
+class BcdFlagSweep(unittest.TestCase):
+
+    def _flags(self, mpu, opcode, a, m, cin):
+        mpu.p = mpu.DECIMAL | (mpu.CARRY if cin else 0)
+        mpu.a = a
+        mpu.memory[0x0200] = opcode
+        mpu.memory[0x0201] = m
+        mpu.pc = 0x0200
+        mpu.step()
+        return (1 if mpu.p & mpu.NEGATIVE else 0, 1 if mpu.p & mpu.OVERFLOW else 0,
+                1 if mpu.p & mpu.ZERO else 0, mpu.a)
+
+    def _sweep(self, variant, opcode, expected):
+        mpu = make_mpu(variant)
+        failures = []
+        for a in BCD_VALUES:
+            for m in BCD_VALUES:
+                for cin in (0, 1):
+                    got = self._flags(mpu, opcode, a, m, cin)
+                    want = expected(a, m, cin, got[3])
+                    if got[:3] != want:
+                        failures.append("  A=%02x M=%02x Cin=%d  expected NVZ=%r got %r"
+                                        % (a, m, cin, want, got[:3]))
+        if failures:
+            self.fail("%s %02x flag mismatches (%d):\n%s"
+                      % (variant, opcode, len(failures), "\n".join(failures[:20])))
+
+    def test_adc_flags_65c02(self):
+        def expected(a, m, cin, result):
+            overflow, _ = adc_overflow_reference(a, m, cin)
+            return (result >> 7, overflow, 1 if result == 0 else 0)
+        self._sweep("65C02", 0x69, expected)
+
+    def test_adc_flags_nmos(self):
+        def expected(a, m, cin, result):
+            overflow, negative = adc_overflow_reference(a, m, cin)
+            return (negative, overflow, 1 if (a + m + cin) & 0xFF == 0 else 0)
+        self._sweep("NMOS", 0x69, expected)
+
+    def test_sbc_flags_65c02(self):
+        def expected(a, m, cin, result):
+            binary = (a - m - (1 - cin)) & 0xFF
+            return (result >> 7, 1 if (a ^ m) & (a ^ binary) & 0x80 else 0,
+                    1 if result == 0 else 0)
+        self._sweep("65C02", 0xE9, expected)
+
+    def test_sbc_flags_nmos(self):
+        def expected(a, m, cin, result):
+            binary = (a - m - (1 - cin)) & 0xFF
+            return (binary >> 7, 1 if (a ^ m) & (a ^ binary) & 0x80 else 0,
+                    1 if binary == 0 else 0)
+        self._sweep("NMOS", 0xE9, expected)
+
+
 class BcdReferenceSanity(unittest.TestCase):
     """Spot-check the reference functions so a bug in them isn't
     masquerading as the sim being correct."""
@@ -0,0 +1,117 @@
+"""Tests for clock6502, running at a real machine's clock rate.
+
+The clock is given a fake timer that only moves when it sleeps (or when a
+test moves it), so the tests don't depend on how fast the host is.
+"""
+
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+from clock6502 import Clock
+
+
+COUNTING = """
+        org $0200
+start:  ldx #$00
+        ldy #$00
+loop:   inx
+        bne loop
+        iny
+        cpy #$80
+        bne loop
+done:   brk
+"""
+
+
+class FakeTime(object):
+    """A timer that moves on by tick on each reading, and by the time slept."""
+
+    def __init__(self, tick=0.0):
+        self.now = 100.0
+        self.tick = tick
+        self.sleeps = []
+
+    def timer(self):
+        self.now += self.tick
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def assemble(**kw):
+    a = asm6502(debug=0)
+    a.assemble(COUNTING.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, **kw)
+    s.pc = a.symbols["start"]
+    return s, a.symbols
+
+
+def state(s, stop):
+    return (stop.reason, stop.pc, stop.steps, stop.cycles, s.x, s.y, s.cc, s.cycles)
+
+
+class ClockTests(unittest.TestCase):
+
+    def test_same_stop_as_run(self):
+        for limits in ({}, {"max_cycles": 54321}, {"max_steps": 20001},
+                       {"until_pc": 0x0204}, {"max_steps": 30000, "max_cycles": 54321}):
+            for jit in (False, True):
+                s, sym = assemble(jit=jit)
+                plain, _ = assemble()
+                fake = FakeTime()
+                clock = Clock(s, hz=1000000, timer=fake.timer, sleep=fake.sleep)
+                self.assertEqual(state(plain, plain.run(**limits)), state(s, clock.run(**limits)),
+                                 limits)
+
+    def test_takes_real_time(self):
+        s, sym = assemble()
+        fake = FakeTime()
+        clock = Clock(s, hz=1023000, timer=fake.timer, sleep=fake.sleep)
+        stop = clock.run(max_cycles=102300)
+        self.assertEqual(StopReason.CYCLES, stop.reason)
+        self.assertAlmostEqual(0.1, fake.now - 100.0, places=4)
+        self.assertAlmostEqual(1.0, clock.ratio, places=3)
+        self.assertAlmostEqual(0.0, clock.drift, places=9)
+        # In slices of about 10ms
+        self.assertEqual(10, len(fake.sleeps))
+        self.assertEqual(stop.cycles, clock.cycles)
+
+    def test_falling_behind(self):
+        s, sym = assemble()
+        # Each slice takes twice as long as it should
+        fake = FakeTime(tick=0.02)
+        clock = Clock(s, hz=1000000, max_lag=0.05, timer=fake.timer, sleep=fake.sleep)
+        clock.run(max_cycles=100000)
+        self.assertEqual([], fake.sleeps)
+        self.assertLess(clock.ratio, 0.6)
+        self.assertGreater(clock.lost, 0.0)
+        # The schedule is moved on rather than falling ever further behind
+        self.assertLessEqual(clock.drift, clock.max_lag + 0.02)
+
+    def test_breakpoint_at_slice_boundary(self):
+        plain, sym = assemble()
+        plain.set_breakpoint(sym["loop"], ignore=999)
+        plain_stop = plain.run()
+        s, sym = assemble()
+        point = s.set_breakpoint(sym["loop"], ignore=999)
+        # A slice of a few cycles ends at the breakpoint again and again
+        fake = FakeTime()
+        clock = Clock(s, hz=1000, slice_seconds=0.005, timer=fake.timer, sleep=fake.sleep)
+        self.assertEqual(state(plain, plain_stop), state(s, clock.run()))
+        self.assertEqual(1000, point.hits)
+
+    def test_unthrottled(self):
+        s, sym = assemble()
+        clock = Clock(s, hz=None)
+        stop = clock.run()
+        self.assertEqual(StopReason.BRK, stop.reason)
+        self.assertEqual(stop.cycles, clock.cycles)
+        self.assertGreater(clock.mhz, 0.0)
+        self.assertIsNone(clock.ratio)
+        self.assertIn("MHz", repr(clock))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,153 @@
+"""Clock cycle counting in sim6502.
+
+The per-opcode base counts are exercised by the processorCycles assertions
+in test_mpu6502.py and test_mpu65c02.py.  These cover the penalties that
+depend on the operands and flags, and the cycle budget in run().
+"""
+
+import unittest
+import test_shim
+import sim6502
+from sim6502 import StopReason
+
+
+def make_mpu(variant):
+    mpu = test_shim.Shim6502(variant=variant)
+    mpu.memory = 0x10000 * [0x00]
+    return mpu
+
+
+def cycles_for(variant, code, pc=0x0200, **regs):
+    mpu = make_mpu(variant)
+    for i, b in enumerate(code):
+        mpu.memory[pc + i] = b
+    mpu.pc = pc
+    for name, value in regs.items():
+        setattr(mpu, name, value)
+    mpu.step()
+    return mpu.processorCycles
+
+
+class CycleTableTests(unittest.TestCase):
+
+    def test_every_instruction_has_a_cycle_count(self):
+        for variant in sim6502.sim6502.VARIANTS:
+            cpu = sim6502.sim6502(variant=variant)
+            for op in range(256):
+                if cpu.dispatch[op] is None:
+                    self.assertEqual(0, cpu.cycle_table[op],
+                                     "%s $%02x" % (variant, op))
+                else:
+                    self.assertTrue(2 <= cpu.cycle_table[op] <= 7,
+                                    "%s $%02x" % (variant, op))
+
+    def test_jmp_indirect(self):
+        self.assertEqual(5, cycles_for("NMOS", (0x6C, 0x00, 0x10)))
+        self.assertEqual(6, cycles_for("65C02", (0x6C, 0x00, 0x10)))
+
+
+class PagePenaltyTests(unittest.TestCase):
+
+    def test_lda_absolute_x(self):
+        for variant in sim6502.sim6502.VARIANTS:
+            self.assertEqual(4, cycles_for(variant, (0xBD, 0x80, 0x10), x=0x7F))
+            self.assertEqual(5, cycles_for(variant, (0xBD, 0x80, 0x10), x=0x80))
+
+    def test_lda_absolute_y(self):
+        self.assertEqual(4, cycles_for("NMOS", (0xB9, 0xFF, 0x10), y=0x00))
+        self.assertEqual(5, cycles_for("NMOS", (0xB9, 0xFF, 0x10), y=0x01))
+
+    def test_lda_indirect_y(self):
+        mpu = make_mpu("NMOS")
+        mpu.memory[0x0010] = 0xF0
+        mpu.memory[0x0011] = 0x20
+        for i, b in enumerate((0xB1, 0x10)):
+            mpu.memory[0x0200 + i] = b
+        mpu.pc = 0x0200
+        mpu.y = 0x0F
+        mpu.step()
+        self.assertEqual(5, mpu.processorCycles)
+        mpu.pc = 0x0200
+        mpu.y = 0x10
+        mpu.step()
+        self.assertEqual(5 + 6, mpu.processorCycles)
+
+    def test_store_never_pays_extra(self):
+        self.assertEqual(5, cycles_for("NMOS", (0x9D, 0x80, 0x10), x=0x00))
+        self.assertEqual(5, cycles_for("NMOS", (0x9D, 0x80, 0x10), x=0x80))
+
+    def test_asl_absolute_x_by_variant(self):
+        self.assertEqual(7, cycles_for("NMOS", (0x1E, 0x80, 0x10), x=0x00))
+        self.assertEqual(7, cycles_for("NMOS", (0x1E, 0x80, 0x10), x=0x80))
+        self.assertEqual(6, cycles_for("65C02", (0x1E, 0x80, 0x10), x=0x00))
+        self.assertEqual(7, cycles_for("65C02", (0x1E, 0x80, 0x10), x=0x80))
+
+
+class BranchPenaltyTests(unittest.TestCase):
+
+    def test_not_taken(self):
+        # BNE with Z set
+        self.assertEqual(2, cycles_for("NMOS", (0xD0, 0x10), p=0x02))
+
+    def test_taken_same_page(self):
+        self.assertEqual(3, cycles_for("NMOS", (0xD0, 0x10), p=0x00))
+
+    def test_taken_to_another_page(self):
+        # $0200 BNE -$10 lands at $01F2
+        self.assertEqual(4, cycles_for("NMOS", (0xD0, 0xF0), p=0x00))
+
+    def test_taken_with_zero_offset(self):
+        # Branching to the next instruction is still a taken branch
+        self.assertEqual(3, cycles_for("NMOS", (0xF0, 0x00), p=0x02))
+
+
+class DecimalPenaltyTests(unittest.TestCase):
+
+    def test_65c02_adc_decimal_takes_extra_cycle(self):
+        self.assertEqual(2, cycles_for("65C02", (0x69, 0x01), p=0x00))
+        self.assertEqual(3, cycles_for("65C02", (0x69, 0x01), p=0x08))
+        self.assertEqual(4, cycles_for("65C02", (0xE5, 0x10), p=0x08))
+
+    def test_nmos_adc_decimal_does_not(self):
+        self.assertEqual(2, cycles_for("NMOS", (0x69, 0x01), p=0x08))
+        self.assertEqual(3, cycles_for("NMOS", (0xE5, 0x10), p=0x08))
+
+
+class RunCycleTests(unittest.TestCase):
+
+    def _looping_cpu(self):
+        cpu = sim6502.sim6502([0xA2, 0x00, 0xE8, 0xD0, 0xFD, 0xEA],
+                              address=0x0200)
+        cpu.pc = 0x0200
+        return cpu
+
+    def test_run_counts_cycles_like_execute(self):
+        a = self._looping_cpu()
+        b = self._looping_cpu()
+        stop = a.run(until_pc=0x0205)
+        while b.pc != 0x0205:
+            b.execute()
+        # LDX #0, then 255 taken and one untaken INX/BNE
+        self.assertEqual(2 + 255 * (2 + 3) + (2 + 2), stop.cycles)
+        self.assertEqual(b.cycles, a.cycles)
+
+    def test_cycle_budget(self):
+        cpu = self._looping_cpu()
+        stop = cpu.run(max_cycles=100)
+        self.assertEqual(StopReason.CYCLES, stop.reason)
+        self.assertTrue(100 <= stop.cycles < 100 + 7)
+        self.assertEqual(stop.cycles, cpu.cycles)
+        stop = cpu.run(max_cycles=100)
+        self.assertTrue(100 <= stop.cycles < 100 + 7)
+
+    def test_interrupts_take_seven_cycles(self):
+        cpu = sim6502.sim6502()
+        cpu.memory_map.InitializeMemory(0xFFFA, [0x00, 0x10, 0x00, 0x10, 0x00, 0x20])
+        cpu.irq()
+        self.assertEqual(7, cpu.cycles)
+        cpu.nmi()
+        self.assertEqual(14, cpu.cycles)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
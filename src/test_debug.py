@@ -0,0 +1,96 @@
+"""Tests for debug6502, breakpoints checked inside sim6502.run()."""
+
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+
+
+# Counts X down from 8, adding it into total each time round
+LOOP = """
+        org $0200
+start:  ldx #$08
+        lda #$00
+loop:   clc
+        stx $10
+        adc $10
+        sta total
+        dex                 ; loop + 8
+        bne loop
+done:   brk
+total:  db 0
+"""
+
+
+def assemble(src, **kw):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, **kw)
+    s.pc = a.symbols["start"]
+    return s, a.symbols
+
+
+def stop_state(stop):
+    return (stop.reason, stop.pc, stop.steps, stop.cycles)
+
+
+class BreakpointTests(unittest.TestCase):
+
+    def test_stop_and_continue(self):
+        s, sym = assemble(LOOP)
+        point = s.set_breakpoint(sym["loop"])
+        stop = s.run()
+        self.assertEqual((StopReason.BREAKPOINT, sym["loop"], 2, 4), stop_state(stop))
+        self.assertEqual(1, point.hits)
+        # Continuing doesn't stop at the breakpoint it starts on
+        stop = s.run()
+        self.assertEqual((StopReason.BREAKPOINT, sym["loop"], 6), stop_state(stop)[:3])
+        self.assertEqual((2, 7), (point.hits, s.x))
+        s.clear_breakpoint(sym["loop"])
+        self.assertEqual(StopReason.BRK, s.run().reason)
+        self.assertEqual(2, point.hits)
+
+    def test_condition(self):
+        s, sym = assemble(LOOP)
+        point = s.set_breakpoint(sym["loop"] + 8, "x == 3 and mem[total] == 0x21")
+        stop = s.run()
+        self.assertEqual((StopReason.BREAKPOINT, sym["loop"] + 8), stop_state(stop)[:2])
+        self.assertEqual((3, 8 + 7 + 6 + 5 + 4 + 3, 1), (s.x, s.a, point.hits))
+        self.assertEqual(StopReason.BRK, s.run().reason)
+
+    def test_ignore(self):
+        s, sym = assemble(LOOP)
+        s.set_breakpoint(sym["loop"], ignore=4)
+        stop = s.run()
+        self.assertEqual(StopReason.BREAKPOINT, stop.reason)
+        self.assertEqual(4, s.x)
+        self.assertEqual(5, s.breakpoints[sym["loop"]].hits)
+
+    def test_until_pc_and_clear(self):
+        s, sym = assemble(LOOP)
+        s.set_breakpoint(sym["loop"])
+        s.set_breakpoint(sym["done"])
+        self.assertEqual(StopReason.PC, s.run(until_pc=sym["loop"]).reason)
+        self.assertEqual([sym["loop"], sym["done"]], [point.address for point in s.breakpoints])
+        s.clear_breakpoint()
+        self.assertEqual(0, len(s.breakpoints))
+        self.assertEqual((StopReason.BRK, sym["done"]), stop_state(s.run())[:2])
+
+    def test_jit(self):
+        for jit in (False, True):
+            s, sym = assemble(LOOP, jit=jit)
+            if jit:
+                s.jit.threshold = 1
+            s.set_breakpoint(sym["loop"] + 8, "x == 2")
+            stop = s.run()
+            self.assertEqual((StopReason.BREAKPOINT, sym["loop"] + 8, 2 + 6 * 6 + 4),
+                             stop_state(stop)[:3])
+
+    def test_bad_condition(self):
+        s, sym = assemble(LOOP)
+        with self.assertRaises(SyntaxError):
+            s.set_breakpoint(sym["loop"], "a = 1")
+        self.assertNotIn(sym["loop"], s.breakpoints)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
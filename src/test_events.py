@@ -0,0 +1,139 @@
+"""Tests for events6502, events scheduled by cycle count, and the
+interrupts they request."""
+
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+
+
+# Counts in $10 while IRQs count in $11 and NMIs in $12
+COUNTING = """
+        org $0200
+start:  cli
+main:   inc $10
+        jmp main
+masked: sei
+        inc $10
+        inc $10
+        cli
+        jmp main
+isr:    inc $11
+        rti
+nmi:    inc $12
+        rti
+        org $fffa
+        dw nmi
+        dw start
+        dw isr
+"""
+
+# Waits in an idle loop for the IRQ handler to set $11
+WAITING = """
+        org $0200
+start:  cli
+wait:   lda $11
+        beq wait
+done:   brk
+isr:    inc $11
+        rti
+        org $fffe
+        dw isr
+"""
+
+
+def assemble(src, **kw):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, **kw)
+    for address in (0x10, 0x11, 0x12):
+        s.memory_map.Poke(address, 0)
+    s.pc = a.symbols["start"]
+    return s, a.symbols
+
+
+def state(s, stop):
+    return (stop.reason, stop.pc, stop.steps, stop.cycles, s.a, s.sp, s.cc,
+            [s.memory_map.Read(address) for address in (0x10, 0x11, 0x12)])
+
+
+class EventTests(unittest.TestCase):
+
+    def test_periodic_irq(self):
+        results = []
+        for jit in (False, True):
+            s, sym = assemble(COUNTING, jit=jit)
+            if jit:
+                s.jit.threshold = 1
+            s.schedule(1000, s.request_irq, period=1000)
+            stop = s.run(max_cycles=10000)
+            self.assertEqual(StopReason.CYCLES, stop.reason)
+            self.assertEqual(9, s.memory_map.Read(0x11))
+            results.append(state(s, stop))
+        self.assertEqual(results[0], results[1])
+
+    def test_same_as_calling_irq(self):
+        s, sym = assemble(COUNTING)
+        s.schedule(500, s.request_irq)
+        s.schedule(520, s.request_irq)
+        stop = s.run(max_cycles=1000)
+
+        stepped, _ = assemble(COUNTING)
+        for at in (500, 520):
+            while stepped.cycles < at:
+                stepped.execute()
+            stepped.irq()
+        while stepped.cycles < 1000:
+            stepped.execute()
+        self.assertEqual((s.pc, s.cycles, s.sp, s.cc), (stepped.pc, stepped.cycles,
+                                                         stepped.sp, stepped.cc))
+        self.assertEqual(2, s.memory_map.Read(0x11))
+
+    def test_masked_irq_waits_for_cli(self):
+        s, sym = assemble(COUNTING)
+        s.pc = sym["masked"]
+        s.execute()
+        s.request_irq()
+        stop = s.run(until_pc=sym["isr"])
+        # The two incs and cli ran first
+        self.assertEqual((StopReason.PC, 3), (stop.reason, stop.steps))
+        self.assertEqual(2, s.memory_map.Read(0x10))
+        self.assertFalse(s.irq_pending)
+        # Returning to the jmp after the cli
+        self.assertEqual(sym["masked"] + 6, s.memory_map.Read(0x100 + s.sp + 2) |
+                         s.memory_map.Read(0x100 + s.sp + 3) << 8)
+
+    def test_nmi_ignores_i_flag(self):
+        s, sym = assemble(COUNTING)
+        s.pc = sym["masked"]
+        s.schedule(10, s.request_nmi)
+        s.run(max_cycles=100)
+        self.assertEqual((1, 0), (s.memory_map.Read(0x12), s.memory_map.Read(0x11)))
+
+    def test_order_and_cancel(self):
+        s, sym = assemble(COUNTING)
+        fired = []
+        s.schedule(300, lambda: fired.append(("b", s.cycles)))
+        s.schedule(100, lambda: fired.append(("a", s.cycles)))
+        s.schedule(300, lambda: fired.append(("c", s.cycles)))
+        tick = s.schedule(200, lambda: fired.append(("tick", s.cycles)), period=150)
+        s.run(max_cycles=400)
+        s.cancel(tick)
+        s.run(max_cycles=400)
+        self.assertEqual(["a", "tick", "b", "c", "tick"], [name for name, _ in fired])
+        # Each at the first instruction boundary at or after its time
+        self.assertTrue(all(0 <= cycles - at < 7 for (_, cycles), at in
+                            zip(fired, (100, 200, 300, 300, 350))))
+
+    def test_idle_loop_skips_to_event(self):
+        results = []
+        for idle in (True, False):
+            s, sym = assemble(WAITING, idle=idle)
+            s.schedule(200000, s.request_irq)
+            stop = s.run()
+            self.assertEqual(StopReason.BRK, stop.reason)
+            results.append(state(s, stop))
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
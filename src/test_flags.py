@@ -0,0 +1,70 @@
+"""Tests for the lazily evaluated N and Z flags in sim6502.
+
+N and Z are kept as the last result, sim6502.nz, and only worked out when
+something reads them, so reading cc, branching and pushing the flags must
+all see the same bits the instructions would have set directly.
+"""
+
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, Flags
+
+
+def run(src, **kw):
+    a = asm6502(debug=0)
+    a.assemble(("        org $0200\nstart:  " + src + "\n        brk").splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, **kw)
+    s.memory_map.Poke(0x10, 0x00)
+    s.pc = a.symbols["start"]
+    s.run()
+    return s
+
+
+NZ = Flags.NEGATIVE | Flags.ZERO
+
+
+class LazyFlagTests(unittest.TestCase):
+
+    def test_cc_round_trip(self):
+        s = sim6502([])
+        for value in range(256):
+            s.cc = value
+            self.assertEqual(value, s.cc)
+
+    def test_results_set_n_and_z(self):
+        for src, flags in (("lda #$00", Flags.ZERO),
+                           ("lda #$80", Flags.NEGATIVE),
+                           ("lda #$7f", 0),
+                           ("ldx #$ff\n inx", Flags.ZERO),
+                           ("lda #$40\n asl a", Flags.NEGATIVE),
+                           ("lda #$80\n asl a", Flags.ZERO)):
+            self.assertEqual(flags, run(src).cc & NZ, src)
+
+    def test_bit_sets_n_and_z_together(self):
+        # BIT takes N from the operand and Z from the AND with A
+        s = run("lda #$80\n sta $10\n lda #$01\n bit $10")
+        self.assertEqual(NZ, s.cc & NZ)
+        s = run("lda #$81\n sta $10\n lda #$01\n bit $10")
+        self.assertEqual(Flags.NEGATIVE, s.cc & NZ)
+
+    def test_php_and_plp(self):
+        s = run("lda #$00\n sec\n php\n pla")
+        self.assertEqual(Flags.ZERO | Flags.CARRY, s.a & 0xc3)
+        for jit in (False, True):
+            for flags in (0, Flags.ZERO, Flags.NEGATIVE, NZ):
+                s = run("lda #$%02x\n pha\n lda #$01\n plp\n php\n pla" % flags, jit=jit)
+                self.assertEqual(flags, s.a & NZ)
+
+    def test_branches_after_plp(self):
+        # C is set if BNE falls through and D if BPL does
+        for jit in (False, True):
+            for flags in (0, Flags.ZERO, Flags.NEGATIVE, NZ):
+                s = run("lda #$%02x\n pha\n plp\n bne next\n sec\n"
+                        "next:   bpl done\n sed\ndone:   nop" % flags, jit=jit)
+                self.assertEqual(flags, s.cc & NZ)
+                self.assertEqual(bool(flags & Flags.ZERO), bool(s.cc & Flags.CARRY))
+                self.assertEqual(bool(flags & Flags.NEGATIVE), bool(s.cc & Flags.DECIMAL))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
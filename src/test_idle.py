@@ -0,0 +1,155 @@
+"""Tests for idle6502, fast-forwarding through polling loops.
+
+A run that skips idle iterations has to stop in exactly the state that
+running every iteration would have left it in.
+"""
+
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+import memory_map
+
+
+# Waits for a key at $C000 and stores it
+GETKEY = """
+        org $0200
+start:  ldx #$05
+wait:   lda $c000
+        bpl wait
+        sta $c010
+        sta $10
+done:   brk
+"""
+
+# Spins for ever once it is done
+HALT = """
+        org $0200
+start:  lda #$01
+halt:   jmp halt
+"""
+
+
+class Keyboard(object):
+    """$C000 reads as the next key with bit 7 set, and a write to $C010
+    takes the key."""
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.keys = []
+        self.reads = 0
+
+    def __call__(self, address, access_mode, value):
+        m = self.cpu.memory_map
+        if address == 0xc000 and access_mode == memory_map.MODE_READ:
+            self.reads += 1
+            m.Poke(0xc000, (self.keys[0] | 0x80) if self.keys else 0x00)
+        elif address == 0xc010 and self.keys:
+            self.keys.pop(0)
+
+    def next_change(self, address):
+        return None
+
+
+class Timer(Keyboard):
+    """$C000 reads as $80 from cycle ready on."""
+
+    def __init__(self, cpu, ready):
+        Keyboard.__init__(self, cpu)
+        self.ready = ready
+
+    def __call__(self, address, access_mode, value):
+        if access_mode == memory_map.MODE_READ:
+            self.reads += 1
+            self.cpu.memory_map.Poke(0xc000, 0x80 if self.cpu.cycles >= self.ready else 0x00)
+
+    def next_change(self, address):
+        return self.ready if self.cpu.cycles < self.ready else None
+
+
+def assemble(src, device=None, idle=True, **kw):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, idle=idle, **kw)
+    if device is not None:
+        device = device(s)
+        s.memory_map.InterceptRange(0xc000, 0xc020, device)
+    s.pc = a.symbols["start"]
+    return s, a.symbols, device
+
+
+def state(s, stop):
+    return (stop.reason, stop.pc, stop.steps, stop.cycles, s.a, s.x, s.cc, s.cycles)
+
+
+class IdleTests(unittest.TestCase):
+
+    def test_same_stop_as_stepping(self):
+        for limits in ({"max_cycles": 100000}, {"max_cycles": 99999},
+                       {"max_steps": 30001}, {"max_steps": 30000, "max_cycles": 77777}):
+            for jit in (False, True):
+                s, sym, keyboard = assemble(GETKEY, Keyboard, jit=jit)
+                slow, _, _ = assemble(GETKEY, Keyboard, idle=False)
+                stop = s.run(**limits)
+                self.assertEqual(state(slow, slow.run(**limits)), state(s, stop), limits)
+                # Only a few times round for real
+                self.assertLess(keyboard.reads, 10)
+
+    def test_stops_idle_then_resumes(self):
+        s, sym, keyboard = assemble(GETKEY, Keyboard)
+        stop = s.run()
+        self.assertEqual((StopReason.IDLE, sym["wait"]), (stop.reason, stop.pc))
+        keyboard.keys.append(ord("A"))
+        stop = s.run()
+        self.assertEqual(StopReason.BRK, stop.reason)
+        self.assertEqual(ord("A") | 0x80, s.memory_map.Read(0x10))
+        self.assertEqual([], keyboard.keys)
+
+    def test_wakes_for_next_change(self):
+        for jit in (False, True):
+            s, sym, timer = assemble(GETKEY, lambda cpu: Timer(cpu, 12345), jit=jit)
+            slow, _, _ = assemble(GETKEY, lambda cpu: Timer(cpu, 12345), idle=False)
+            self.assertEqual(state(slow, slow.run()), state(s, s.run()))
+            self.assertEqual(StopReason.BRK, s.run().reason)
+            self.assertLess(timer.reads, 10)
+
+    def test_other_interceptors_are_not_skipped(self):
+        s, sym, _ = assemble(GETKEY)
+        reads = []
+        s.memory_map.Poke(0xc000, 0x00)
+        s.memory_map.Intercept(0xc000, lambda address, mode, value: reads.append(address))
+        stop = s.run(max_steps=2001)
+        self.assertEqual(1000, len(reads))
+        self.assertEqual(StopReason.STEPS, stop.reason)
+
+    def test_interceptor_after_branch(self):
+        # The byte after bpl wait is not part of the loop
+        s, sym, keyboard = assemble(GETKEY, Keyboard)
+        s.memory_map.Intercept(sym["wait"] + 5, lambda address, mode, value: None)
+        stop = s.run(max_cycles=100000)
+        self.assertEqual(StopReason.CYCLES, stop.reason)
+        self.assertLess(keyboard.reads, 10)
+
+    def test_breakpoint_in_loop(self):
+        s, sym, keyboard = assemble(GETKEY, Keyboard)
+        point = s.set_breakpoint(sym["wait"] + 3, "cycles > 1000")
+        stop = s.run()
+        self.assertEqual((StopReason.BREAKPOINT, sym["wait"] + 3), (stop.reason, stop.pc))
+        self.assertEqual(1, point.hits)
+        self.assertGreater(keyboard.reads, 100)
+
+    def test_halt(self):
+        s, sym, _ = assemble(HALT)
+        stop = s.run()
+        self.assertEqual((StopReason.IDLE, sym["halt"]), (stop.reason, stop.pc))
+        slow, _, _ = assemble(HALT, idle=False)
+        s.pc, s.cycles = sym["start"], 0
+        self.assertEqual(state(slow, slow.run(max_cycles=1000000)),
+                         state(s, s.run(max_cycles=1000000)))
+        self.assertEqual(2 + 3 * 333333, s.cycles)
+        # Self-modified into a loop that ends
+        s.memory_map.Write(sym["halt"], 0x00)
+        self.assertEqual(StopReason.BRK, s.run().reason)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -17,7 +17,7 @@ import os, sys, struct
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from asm6502 import asm6502
-from sim6502 import sim6502
+from sim6502 import sim6502, StopReason
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 
@@ -64,20 +64,32 @@ def build_stub(op_label, swap_operands=False):
         f'        lda #${(BUF_R >> 8) & 0xff:02x}',
         f'        sta ${a.symbols["ptr1"] + 1:02x}',
         '        jsr pack1',
+        f'        jmp ${DONE_ADDR:04x}',  # avoid falling through to leftover code
         f'        org ${DONE_ADDR:04x}',
         '        brk',
     ]
     return stub
 
+# stub -> (simulator, snapshot of it just after reset)
+_sims = {}
+
 def run(stub, bufA, bufB, max_steps=2_000_000):
-    # re-assemble with library + stub.  asm6502.assemble by default retains
-    # object_code between calls, so we just add the stub on top.
-    a.assemble(stub, clear_lst=True, clear_sym=False, clear_obj=False)
-    obj = a.object_code[:]
-    # Zero the reset-vector region so the simulator resets cleanly
-    obj[0xfffc] = TEST_ORG & 0xff
-    obj[0xfffd] = (TEST_ORG >> 8) & 0xff
-    s = sim6502(obj, symbols=a.symbols)
+    key = tuple(stub)
+    if key not in _sims:
+        # re-assemble with library + stub.  asm6502.assemble by default retains
+        # object_code between calls, so we just add the stub on top.
+        a.assemble(stub, clear_lst=True, clear_sym=False, clear_obj=False)
+        obj = a.object_code[:]
+        # Zero the reset-vector region so the simulator resets cleanly
+        obj[0xfffc] = TEST_ORG & 0xff
+        obj[0xfffd] = (TEST_ORG >> 8) & 0xff
+        s = sim6502(obj, symbols=a.symbols)
+        s.reset()
+        s.pc = TEST_ORG
+        _sims[key] = (s, s.snapshot())
+    # each vector starts from the same state, without reassembling
+    s, snapshot = _sims[key]
+    s.restore(snapshot)
     # write operand buffers
     for i, b in enumerate(bufA):
         s.memory_map.Write(BUF_A + i, b)
@@ -86,17 +98,12 @@ def run(stub, bufA, bufB, max_steps=2_000_000):
     # clear result buffer
     for i in range(9):
         s.memory_map.Write(BUF_R + i, 0)
-    s.reset()
-    s.pc = TEST_ORG
-    steps = 0
-    while s.pc != DONE_ADDR and steps < max_steps:
-        s.execute()
-        steps += 1
-    if steps >= max_steps:
+    stop = s.run(max_steps=max_steps, until_pc=DONE_ADDR, stop_on_brk=False)
+    if stop.reason == StopReason.STEPS:
         raise RuntimeError(f"Simulation timed out (>{max_steps} steps) at pc=${s.pc:04x}")
     result = bytes(s.memory_map.Read(BUF_R + i) for i in range(8))
     a_reg = s.memory_map.Read(BUF_R + 8)
-    return result, a_reg, steps
+    return result, a_reg, stop
 
 def f_to_bytes(f):
     return struct.pack('<d', f)
@@ -122,11 +129,11 @@ def test_unpack_pack():
 def test_binop(op_label, fn, cases):
     print(f"{op_label}:")
     for av, bv in cases:
-        r, _, steps = run(build_stub(op_label), f_to_bytes(av), f_to_bytes(bv))
+        r, _, stop = run(build_stub(op_label), f_to_bytes(av), f_to_bytes(bv))
         got = bytes_to_f(r)
         expected = fn(av, bv)
         ok = (expected == 0.0 and got == 0.0) or approx_eq(got, expected, rel=1e-12)
-        print(f"  {av!r:>16} {op_label} {bv!r:<16} = {got!r:<24} (expected {expected!r:<24}) [{steps} steps] {'OK' if ok else 'FAIL'}")
+        print(f"  {av!r:>16} {op_label} {bv!r:<16} = {got!r:<24} (expected {expected!r:<24}) [{stop.steps} steps, {stop.cycles} cycles] {'OK' if ok else 'FAIL'}")
 
 def test_fcmp():
     print("fcmp:")
@@ -0,0 +1,275 @@
+"""Tests for the basic-block translator, jit6502.
+
+A simulator created with jit=True must end up in exactly the state, and
+stop for exactly the reason, that the same run() without it does.  The
+random programs below check that across the instruction set, with and
+without interceptors watching memory.
+"""
+
+import random
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason, MODE_LENGTHS
+
+
+def assemble(src, variant=sim6502.CMOS, jit=True):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, variant=variant, jit=jit)
+    if jit:
+        s.jit.threshold = 1
+    return s, a.symbols
+
+
+def cpu_state(s):
+    return (s.pc, s.a, s.x, s.y, s.sp, s.cc, s.cycles,
+            s.memory_map.Dump(0x0000, 0x10000))
+
+
+CHECKSUM = """
+        org $0200
+start:  ldx #$00
+        lda #$00
+        sta $10
+        sta $11
+loop:   lda $1000,x
+        clc
+        adc $10
+        sta $10
+        lda $11
+        adc #$00
+        sta $11
+        inx
+        bne loop
+        jsr twice
+done:   nop
+        brk
+twice:  asl $10
+        rol $11
+        rts
+        org $1000
+        db $31, $41, $59, $26, $53, $58, $97, $93, $23, $84, $62, $64, $33
+"""
+
+# Rewrites the operand of its own ADC #imm every time round the loop
+SELF_MODIFYING = """
+        org $0200
+start:  ldx #$08
+        lda #$00
+loop:   clc
+patch:  adc #$01
+        inc patch+1
+        dex
+        bne loop
+done:   nop
+        brk
+"""
+
+
+class TranslationTests(unittest.TestCase):
+
+    def run_both(self, src, **kw):
+        plain, sym = assemble(src, jit=False)
+        fast, _ = assemble(src)
+        plain.pc = fast.pc = sym["start"]
+        a = plain.run(**kw)
+        b = fast.run(**kw)
+        self.assertEqual((a.reason, a.pc, a.steps, a.cycles),
+                         (b.reason, b.pc, b.steps, b.cycles))
+        self.assertEqual(cpu_state(plain), cpu_state(fast))
+        return fast, sym
+
+    def test_matches_interpreter(self):
+        s, sym = self.run_both(CHECKSUM)
+        self.assertEqual(sym["done"] + 1, s.pc)
+        self.assertTrue(any(s.jit.blocks.values()))
+
+    def test_blocks_end_at_branches_and_jumps(self):
+        s, sym = self.run_both(CHECKSUM)
+        block = s.jit.blocks[sym["loop"]]
+        # lda, clc, adc, sta, lda, adc, sta, inx, bne
+        self.assertEqual(9, block.count)
+        self.assertEqual(sym["loop"] + 17, block.end)
+
+    def test_interceptor_after_block(self):
+        # Only the bytes of each instruction are checked, so one on the
+        # byte after the BNE leaves the block alone
+        s, sym = assemble(CHECKSUM)
+        s.memory_map.Intercept(sym["loop"] + 17, lambda address, mode, value: None)
+        self.assertEqual(9, len(s.jit.decode(sym["loop"])))
+
+    def test_compiled_code_shared(self):
+        # Simulators whose blocks have the same bytes share the translation,
+        # whatever comes after them
+        blocks = []
+        for after in ("nop", "brk"):
+            s, sym = assemble(CHECKSUM.replace("done:   nop", "done:   " + after))
+            s.pc = sym["start"]
+            s.run(until_pc=sym["done"])
+            # The JSR just before done
+            blocks.append(s.jit.blocks[sym["done"] - 3])
+        self.assertIs(blocks[0].code, blocks[1].code)
+
+    def test_block_at_top_of_memory(self):
+        # Blocks ending at $FFFF go on at $0000, falling through or
+        # branching
+        for end in (" org $fffd\nstart: iny\n nop\n nop\n",
+                    " org $fffa\nstart: iny\n clc\n bcc next\nnext: bcs start\n"):
+            s, sym = self.run_both(" org $0000\n inx\n jmp start\n" + end, max_steps=50)
+            self.assertGreater(s.x, 5)
+
+    def test_interceptor_added_by_event(self):
+        # Blocks translated before the event index memory directly, and
+        # the ones translated after it must not
+        counts = []
+        for jit in (False, True):
+            s, sym = assemble(" org $0200\nstart: ldx $0300\n iny\n jmp start\n"
+                              " org $0300\n db $00\n", jit=jit)
+            reads = []
+            s.schedule(2000, lambda: s.memory_map.Intercept(
+                0x0300, lambda address, mode, value: reads.append(address)))
+            s.pc = sym["start"]
+            s.run(max_steps=3000)
+            counts.append(len(reads))
+        self.assertEqual(counts[0], counts[1])
+        self.assertGreater(counts[0], 700)
+
+    def test_self_modifying_code(self):
+        s, sym = self.run_both(SELF_MODIFYING)
+        self.assertEqual(1 + 2 + 3 + 4 + 5 + 6 + 7 + 8, s.a)
+
+    def test_write_invalidates_block(self):
+        s, sym = assemble(CHECKSUM)
+        s.pc = sym["start"]
+        s.run(until_pc=sym["done"])
+        self.assertTrue(s.jit.blocks[sym["loop"]])
+        self.assertTrue(s.memory_map.code_pages[sym["loop"] >> 8])
+        # Make the CLC a SEC
+        s.memory_map.Write(sym["loop"] + 3, 0x38)
+        self.assertNotIn(sym["loop"], s.jit.blocks)
+
+        plain, _ = assemble(CHECKSUM, jit=False)
+        plain.memory_map.Write(sym["loop"] + 3, 0x38)
+        plain.pc = s.pc = sym["start"]
+        plain.cycles = s.cycles = 0
+        plain.run()
+        s.run()
+        self.assertEqual(cpu_state(plain), cpu_state(s))
+
+    def test_stop_address_inside_block(self):
+        s, sym = assemble(CHECKSUM)
+        s.pc = sym["start"]
+        s.run(until_pc=sym["done"])
+        inside = sym["loop"] + 4    # the ADC
+        s.pc = sym["start"]
+        stop = s.run(until_pc=inside)
+        self.assertEqual(StopReason.PC, stop.reason)
+        self.assertEqual(inside, s.pc)
+        self.assertEqual(6, stop.steps)
+
+    def test_step_and_cycle_budgets(self):
+        for steps in (1, 5, 17, 100):
+            self.run_both(CHECKSUM, max_steps=steps)
+        for cycles in (1, 10, 99, 1000):
+            self.run_both(CHECKSUM, max_cycles=cycles)
+
+    def test_overridden_handler_is_called(self):
+        class Counting(sim6502):
+            def instr_inx(self, fetch, opcode, operand8, operand16):
+                self.inx_count = getattr(self, "inx_count", 0) + 1
+                return sim6502.instr_inx(self, fetch, opcode, operand8, operand16)
+
+        a = asm6502(debug=0)
+        a.assemble(CHECKSUM.splitlines())
+        s = Counting(a.object_code[:], jit=True)
+        s.jit.threshold = 1
+        s.pc = a.symbols["start"]
+        s.run()
+        self.assertEqual(256, s.inx_count)
+
+
+def random_program(rnd, variant):
+    # Valid instructions at $0400-$05FF, with branch and jump targets on
+    # instruction boundaries and return addresses on the stack, so that
+    # runs stay in the program for a while.  Stores sometimes land in it.
+    cpu = sim6502(variant=variant)
+    opcodes = [op for op in range(1, 256) if cpu.dispatch[op] is not None
+               and op not in (0x28, 0x40, 0xF8)]    # plp, rti, sed
+    memory = [rnd.randrange(256) for _ in range(0x10000)]
+    layout = []
+    address = 0x0400
+    while address < 0x0600:
+        opcode = rnd.choice(opcodes)
+        handler, mode = cpu.dispatch[opcode]
+        layout.append((address, opcode, handler.__name__, mode))
+        address += MODE_LENGTHS[mode]
+    starts = [entry[0] for entry in layout]
+    for address, opcode, name, mode in layout:
+        memory[address] = opcode
+        if mode == "relative":
+            targets = [t for t in starts if -128 <= t - (address + 2) <= 127]
+            memory[address + 1] = (rnd.choice(targets) - (address + 2)) & 0xff
+        elif name in ("instr_jmp", "instr_jsr") and mode == "absolute":
+            target = rnd.choice(starts)
+            memory[address + 1], memory[address + 2] = target & 0xff, target >> 8
+        elif mode.startswith("absolute") and rnd.random() < 0.3:
+            target = rnd.randrange(0x0400, 0x0600)
+            memory[address + 1], memory[address + 2] = target & 0xff, target >> 8
+    for address in range(0x0100, 0x0200, 2):
+        target = rnd.choice(starts) - 1
+        memory[address], memory[address + 1] = target & 0xff, target >> 8
+    return memory
+
+
+class RandomProgramTests(unittest.TestCase):
+
+    def check(self, seed, variant, intercept, compact=False):
+        results = []
+        for jit in (False, True):
+            rnd = random.Random(seed)
+            s = sim6502(variant=variant, jit=jit, compact_memory=compact)
+            s.memory_map.InitializeMemory(0, random_program(rnd, variant))
+            s.pc = 0x0400
+            s.a, s.x, s.y, s.sp = [rnd.randrange(256) for _ in range(4)]
+            s.cc = rnd.randrange(256) & 0xf7
+            log = []
+            if intercept:
+                def interceptor(address, mode, value):
+                    log.append((address, mode, s.a, s.x, s.y, s.sp, s.cycles))
+                for _ in range(200):
+                    s.memory_map.Intercept(rnd.randrange(0x10000), interceptor)
+                start = rnd.randrange(0x0400, 0x0600)
+                s.memory_map.InterceptRange(start, start + 0x20, interceptor)
+            if jit:
+                s.jit.threshold = 2
+            stops = []
+            for _ in range(4):
+                stop = s.run(max_steps=2000, until_pc=0x0600)
+                stops.append((stop.reason, stop.pc, stop.steps, stop.cycles))
+                s.pc = 0x0400
+            results.append((stops, cpu_state(s), log))
+        self.assertEqual(results[0], results[1], "seed %d" % seed)
+        return results[0]
+
+    def test_nmos(self):
+        for seed in range(4):
+            self.check(seed, sim6502.NMOS, False)
+
+    def test_65c02(self):
+        for seed in range(4):
+            self.check(seed, sim6502.CMOS, False)
+
+    def test_with_interceptors(self):
+        for seed in range(4):
+            self.check(seed, sim6502.NMOS, True)
+            self.check(seed, sim6502.CMOS, True)
+
+    def test_compact_memory(self):
+        for seed in range(2):
+            for intercept in (False, True):
+                self.assertEqual(self.check(seed, sim6502.CMOS, intercept),
+                                 self.check(seed, sim6502.CMOS, intercept, True))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,163 @@
+"""Tests for lockstep6502, the NumPy engine for many 6502s at once.
+
+Every lane must end up exactly where a sim6502 running the same program
+from the same state would: registers, memory, cycles and stop reason.
+"""
+
+import random
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+from test_bcd_sweep import BCD_VALUES, bcd_adc_reference, bcd_sbc_reference
+from test_jit import random_program
+
+try:
+    import numpy
+    from lockstep6502 import Lockstep
+except ImportError:
+    numpy = None
+
+
+# One decimal mode ADC or SBC of $10 into A, then store A
+DECIMAL = """
+        org $0200
+start:  sed
+        %s $10
+        sta $11
+done:   brk
+"""
+
+
+def assemble(src):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    return a.object_code, a.symbols
+
+
+def lane_state(lanes, lane):
+    return tuple(int(register[lane]) for register in
+                 (lanes.pc, lanes.a, lanes.x, lanes.y, lanes.sp, lanes.cc, lanes.cycles))
+
+
+def stop_state(stop):
+    return (stop.reason, stop.pc, stop.steps, stop.cycles)
+
+
+def sim_state(s):
+    return (s.pc, s.a, s.x, s.y, s.sp, s.cc, s.cycles)
+
+
+@unittest.skipIf(numpy is None, "lockstep6502 needs NumPy")
+class LockstepTests(unittest.TestCase):
+
+    def bcd_sweep(self, instruction, reference, variant):
+        code, sym = assemble(DECIMAL % instruction)
+        cases = [(a, m, carry) for a in BCD_VALUES for m in BCD_VALUES for carry in (0, 1)]
+        lanes = Lockstep(len(cases), code, variant=variant)
+        lanes.pc[:] = sym["start"]
+        lanes.a[:] = [a for a, m, carry in cases]
+        lanes.cc[:] = [carry for a, m, carry in cases]
+        lanes.memory[:, 0x10] = [m for a, m, carry in cases]
+        stops = lanes.run()
+        self.assertTrue((stops.reason == StopReason.BRK).all())
+        self.assertTrue((stops.pc == sym["done"]).all())
+        expected = numpy.array([reference(a, m, carry) for a, m, carry in cases])
+        self.assertEqual(expected[:, 0].tolist(), lanes.memory[:, 0x11].tolist())
+        self.assertEqual(expected[:, 1].tolist(), (lanes.cc & 0x01).tolist())
+
+        # N, V and Z come from sim6502 too
+        for lane in range(0, len(cases), 97):
+            a, m, carry = cases[lane]
+            s = sim6502(code, symbols=sym, variant=variant)
+            s.memory_map.Write(0x10, m)
+            s.pc, s.a, s.cc = sym["start"], a, carry
+            s.run()
+            self.assertEqual(sim_state(s), lane_state(lanes, lane))
+
+    def test_bcd_adc_all_pairs(self):
+        for variant in (sim6502.NMOS, sim6502.CMOS):
+            self.bcd_sweep("adc", bcd_adc_reference, variant)
+
+    def test_bcd_sbc_all_pairs(self):
+        for variant in (sim6502.NMOS, sim6502.CMOS):
+            self.bcd_sweep("sbc", bcd_sbc_reference, variant)
+
+    def test_invalid_bcd_matches_sim6502(self):
+        for instruction in ("adc", "sbc"):
+            for variant in (sim6502.NMOS, sim6502.CMOS):
+                code, sym = assemble(DECIMAL % instruction)
+                cases = [(a, m, carry) for a in range(0, 256, 5)
+                         for m in (0x00, 0x0a, 0x9f, 0xfa) for carry in (0, 1)]
+                lanes = Lockstep(len(cases), code, variant=variant)
+                lanes.pc[:] = sym["start"]
+                lanes.a[:] = [a for a, m, carry in cases]
+                lanes.cc[:] = [carry for a, m, carry in cases]
+                lanes.memory[:, 0x10] = [m for a, m, carry in cases]
+                lanes.run()
+                for lane, (a, m, carry) in enumerate(cases):
+                    s = sim6502(code, symbols=sym, variant=variant)
+                    s.memory_map.Write(0x10, m)
+                    s.pc, s.a, s.cc = sym["start"], a, carry
+                    s.run()
+                    self.assertEqual(sim_state(s), lane_state(lanes, lane))
+
+    def test_stops(self):
+        code, sym = assemble(DECIMAL % "adc")
+        lanes = Lockstep(4, code)
+        lanes.pc[:] = sym["start"]
+        lanes.pc[1] = sym["done"]
+        lanes.memory[2, sym["start"] + 1] = 0x02    # not an instruction
+        lanes.memory[3, 0x10] = 0x01
+        stops = lanes.run(until_pc=sym["done"])
+        self.assertEqual([StopReason.PC, StopReason.PC, StopReason.NOT_INSTRUCTION,
+                          StopReason.PC], list(stops.reason))
+        self.assertEqual([3, 0, 1, 3], list(stops.steps))
+        self.assertEqual((StopReason.PC, sym["done"], 3, 9), stop_state(stops[3]))
+        self.assertEqual([0x00, 0x00, 0x00, 0x01], list(lanes.memory[:, 0x11]))
+
+        lanes.pc[:] = sym["start"]
+        stops = lanes.run(max_cycles=3)
+        self.assertEqual([StopReason.CYCLES, StopReason.CYCLES, StopReason.NOT_INSTRUCTION,
+                          StopReason.CYCLES], list(stops.reason))
+        self.assertEqual([2, 2, 1, 2], list(stops.steps))
+
+    def test_per_lane_image(self):
+        code, sym = assemble(DECIMAL % "adc")
+        images = numpy.array([code[:0x300]] * 2)
+        images[1, 0x10] = 0x05
+        lanes = Lockstep(2, numpy.where(images < 0, 0, images))
+        lanes.pc[:] = sym["start"]
+        lanes.run()
+        self.assertEqual([0x00, 0x05], list(lanes.memory[:, 0x11]))
+
+    def test_random_programs(self):
+        for variant in (sim6502.NMOS, sim6502.CMOS):
+            programs, registers = [], []
+            for seed in range(20):
+                rnd = random.Random(seed)
+                programs.append(random_program(rnd, variant))
+                registers.append([rnd.randrange(256) for _ in range(4)] +
+                                 [rnd.randrange(256) & 0xf7])
+            lanes = Lockstep(len(programs), variant=variant)
+            lanes.load(0, numpy.array(programs))
+            lanes.pc[:] = 0x0400
+            for lane, (a, x, y, sp, cc) in enumerate(registers):
+                lanes.a[lane], lanes.x[lane], lanes.y[lane] = a, x, y
+                lanes.sp[lane], lanes.cc[lane] = sp, cc
+            stops = lanes.run(max_steps=500, until_pc=0x0600)
+
+            for lane, program in enumerate(programs):
+                s = sim6502(variant=variant, compact_memory=True)
+                s.memory_map.InitializeMemory(0, program)
+                s.pc = 0x0400
+                s.a, s.x, s.y, s.sp, s.cc = registers[lane]
+                stop = s.run(max_steps=500, until_pc=0x0600)
+                message = "%s lane %d" % (variant, lane)
+                self.assertEqual(stop_state(stop), stop_state(stops[lane]), message)
+                self.assertEqual(sim_state(s), lane_state(lanes, lane), message)
+                self.assertEqual(bytes(s.memory_map.View()), lanes.memory[lane].tobytes(),
+                                 message)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
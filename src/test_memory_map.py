@@ -0,0 +1,438 @@
+"""Tests for memory_map, in particular the bytearray-backed ByteMemoryMap.
+
+A simulator created with compact_memory=True must behave like the list
+backed one, apart from never-written memory reading as 0 rather than -1.
+"""
+
+import io
+import unittest
+from array import array
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+import memory_map
+
+
+COPY = """
+        org $0200
+start:  ldx #$04
+loop:   lda $1000,x
+        sta $2000,x
+        dex
+        bpl loop
+done:   brk
+        org $1000
+        db $11, $22, $33, $44, $55
+"""
+
+
+def assemble(src, **kw):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    return sim6502(a.object_code[:], symbols=a.symbols, **kw), a.symbols
+
+
+class ByteMemoryMapTests(unittest.TestCase):
+
+    def test_storage(self):
+        self.assertIsInstance(sim6502().memory_map._memory_map, list)
+        s = sim6502(compact_memory=True)
+        self.assertIsInstance(s.memory_map, memory_map.ByteMemoryMap)
+        self.assertIsInstance(s.memory_map._memory_map, bytearray)
+        self.assertEqual(0, s.memory_map.Read(0x1234))
+
+    def test_initialized_bitmap(self):
+        s = sim6502(compact_memory=True)
+        m = s.memory_map
+        m.InitializeMemory(0x0300, [0x01, -1, 0x03])
+        m.Write(0x0400, 0x00)
+        m.Poke(0x0401, 0x00)
+        m.Load(0x0405, bytes(20))
+        initialized = [a for a in range(0x10000) if m.IsInitialized(a)]
+        self.assertEqual([0x0300, 0x0302, 0x0400, 0x0401] + list(range(0x0405, 0x0419)),
+                         initialized)
+        self.assertEqual("$0300 : 01 -- 03 --", m.Dump(0x0300, 4))
+
+    def test_trap_interceptor(self):
+        for cls in (memory_map.MemoryMap, memory_map.ByteMemoryMap):
+            m = cls(sim6502(), memory_map.MemoryMap.TRAP_INTERCEPTOR)
+            m.cpu.show_state = lambda: ""
+            m.Write(0x0010, 0x00)
+            m.Read(0x0010)
+            with self.assertRaises(memory_map.TrapException):
+                m.Read(0x0011)
+
+    def test_load_and_view(self):
+        for compact in (False, True):
+            s = sim6502(compact_memory=compact)
+            s.memory_map.Load(0xfffe, b"\x34\x12")
+            self.assertEqual(0x12, s.memory_map.Read(0xffff))
+            with self.assertRaises(ValueError):
+                s.memory_map.Load(0xffff, b"\x34\x12")
+        view = s.memory_map.View(0xfff0)
+        self.assertEqual(b"\x34\x12", bytes(view[-2:]))
+        view[0] = 0x99
+        self.assertEqual(0x99, s.memory_map.Read(0xfff0))
+        with self.assertRaises(TypeError):
+            sim6502().memory_map.View()
+
+    def test_rebind(self):
+        s, sym = assemble(COPY, compact_memory=True)
+        s.pc = sym["start"]
+        s.run()
+        memory = bytearray(s.memory_map.View())
+        memory[sym["start"] + 1] = 0x00     # ldx #$00
+        memory[0x2000:0x2005] = bytes(5)
+        s.memory_map.Rebind(memory)
+        self.assertEqual({}, s.decoded)
+        s.pc = sym["start"]
+        s.run()
+        self.assertEqual(b"\x11\x00\x00\x00\x00", memory[0x2000:0x2005])
+        with self.assertRaises(ValueError):
+            s.memory_map.Rebind(bytearray(0x100))
+
+    def test_load_over_code_drops_it(self):
+        s, sym = assemble(COPY, compact_memory=True)
+        s.pc = sym["start"]
+        s.run()
+        self.assertIn(sym["loop"], s.decoded)
+        # ldx #$04 becomes ldx #$00
+        s.memory_map.Load(sym["start"], b"\xa2\x00")
+        self.assertNotIn(sym["start"], s.decoded)
+        s.memory_map.Load(0x2000, bytes(5))
+        s.pc = sym["start"]
+        s.run()
+        self.assertEqual([0x11, 0, 0, 0, 0], list(s.memory_map.View(0x2000, 0x2005)))
+
+    def test_matches_list_memory(self):
+        for jit in (False, True):
+            s1, sym = assemble(COPY, jit=jit)
+            s2, _ = assemble(COPY, jit=jit, compact_memory=True)
+            if jit:
+                s1.jit.threshold = s2.jit.threshold = 1
+            for s in (s1, s2):
+                s.pc = sym["start"]
+                self.assertEqual(StopReason.BRK, s.run().reason)
+            self.assertEqual((s1.a, s1.x, s1.cycles), (s2.a, s2.x, s2.cycles))
+            # Stores made by translated code are initialized memory too
+            self.assertEqual(s1.memory_map.Dump(0x1ff0, 0x20),
+                             s2.memory_map.Dump(0x1ff0, 0x20))
+
+
+class InterceptorTests(unittest.TestCase):
+
+    def test_page_table(self):
+        m = sim6502().memory_map
+        self.assertFalse(any(m.intercept_pages))
+        self.assertEqual(m._memory_map.__getitem__, m.Fetcher())
+        m.Intercept(0xc000, print)
+        m.InterceptRange(0xd0ff, 0xd101, print)
+        self.assertEqual([0xc0, 0xd0, 0xd1],
+                         [page for page in range(256) if m.intercept_pages[page]])
+        self.assertEqual(m.Execute, m.Fetcher())
+        m = memory_map.MemoryMap(sim6502(), memory_map.MemoryMap.TRAP_INTERCEPTOR)
+        self.assertTrue(all(m.intercept_pages))
+
+    def test_range_and_precedence(self):
+        m = sim6502().memory_map
+        seen = []
+        def io(name):
+            return lambda address, mode, value: seen.append((name, address, mode))
+        m.InterceptRange(0xc000, 0xc100, io("page"))
+        m.InterceptRange(0xc010, 0xc011, io("strobe"))
+        m.Intercept(0xc000, io("keyboard"))
+        m.Read(0xc000)
+        m.Read(0xc010)
+        m.Write(0xc0ff, 0x00)
+        m.Read(0xc100)
+        self.assertEqual([("keyboard", 0xc000, memory_map.MODE_READ),
+                          ("strobe", 0xc010, memory_map.MODE_READ),
+                          ("page", 0xc0ff, memory_map.MODE_WRITE)], seen)
+
+    def test_initialize_memory_registers_one_range(self):
+        for compact in (False, True):
+            for data in ([0x00] * 0x300, [0x00, -1] * 0x180):
+                m = sim6502(compact_memory=compact).memory_map
+                m.InitializeMemory(0x0300, data, interceptor=print)
+                self.assertEqual({}, m.interceptors)
+                self.assertEqual([(0x0300, 0x0600, print)], m.ranges)
+                self.assertEqual(print, m.InterceptorFor(0x05ff))
+                self.assertEqual(None, m.InterceptorFor(0x0600))
+
+    def test_initialize_memory_from_iterator(self):
+        for compact in (False, True):
+            m = sim6502(compact_memory=compact).memory_map
+            m.InitializeMemory(0x0300, (value for value in [1, -1, 3]), interceptor=print)
+            self.assertEqual([(0x0300, 0x0303, print)], m.ranges)
+            self.assertEqual([1, 3], [m.Read(a) for a in (0x0300, 0x0302)])
+
+    def test_run_sees_range_accesses(self):
+        s, sym = assemble(COPY)
+        seen = []
+        def interceptor(address, mode, value):
+            if mode == memory_map.MODE_WRITE:
+                seen.append(address)
+        s.memory_map.InterceptRange(0x2000, 0x2100, interceptor)
+        s.pc = sym["start"]
+        s.run()
+        self.assertEqual([0x2004, 0x2003, 0x2002, 0x2001, 0x2000], seen)
+
+
+class TraceTests(unittest.TestCase):
+
+    def run_traced(self, jit=False, **kw):
+        s, sym = assemble(COPY, jit=jit)
+        if jit:
+            s.jit.threshold = 1
+        trace = s.memory_map.StartTrace(**kw)
+        s.pc = sym["start"]
+        stop = s.run()
+        return s, sym, trace, stop
+
+    def test_records_every_access(self):
+        for jit in (False, True):
+            s, sym, trace, stop = self.run_traced(jit)
+            accesses = trace.Accesses()
+            # The fetches of LDX and nine each time round the loop, two reads
+            # (one STA's dummy read) and a write per byte copied, and the
+            # fetch of the BRK
+            self.assertEqual(2 + 5 * 9 + 5 * 3 + 1, trace.Count())
+            self.assertEqual(trace.Count(), len(accesses))
+            self.assertEqual((sym["start"], memory_map.MODE_EXECUTE, 0xa2), accesses[0])
+            self.assertEqual((sym["start"] + 1, memory_map.MODE_EXECUTE, 0x04), accesses[1])
+            reads = [a for a in accesses if a[1] == memory_map.MODE_READ]
+            writes = [a for a in accesses if a[1] == memory_map.MODE_WRITE]
+            self.assertEqual([(0x1004, memory_map.MODE_READ, 0x55),
+                              (0x2004, memory_map.MODE_READ, None)], reads[:2])
+            self.assertEqual((0x2000, memory_map.MODE_WRITE, 0x11), writes[-1])
+            self.assertEqual(array("I", [memory_map.TRACE_UNINITIALIZED | 0x2004 |
+                                         memory_map.MODE_READ << memory_map.TRACE_MODE_SHIFT]),
+                             trace.Words()[9:10])
+
+    def test_ring_buffer(self):
+        s, sym, trace, stop = self.run_traced(size=8)
+        self.assertEqual(63, trace.Count())
+        # The last eight: the operand fetches, dummy read and write of the
+        # last sta, the fetches of dex and bpl, and the fetch of the brk
+        accesses = trace.Accesses()
+        self.assertEqual(8, len(accesses))
+        self.assertEqual((sym["loop"] + 4, memory_map.MODE_EXECUTE, 0x00), accesses[0])
+        self.assertEqual((0x2000, memory_map.MODE_WRITE, 0x11), accesses[3])
+        self.assertEqual((sym["done"], memory_map.MODE_EXECUTE, 0x00), accesses[-1])
+
+    def test_streams_to_file(self):
+        f = io.BytesIO()
+        s, sym, trace, stop = self.run_traced(size=16, file=f)
+        self.assertEqual(trace.Count() // 16 * 16 * 4, len(f.getvalue()))
+        self.assertIs(trace, s.memory_map.StopTrace())
+        words = array("I")
+        words.frombytes(f.getvalue())
+        self.assertEqual(trace.Count(), len(words))
+        self.assertEqual((sym["done"], memory_map.MODE_EXECUTE, 0x00),
+                         memory_map.DecodeTraceWord(words[-1]))
+
+    def test_stop_and_untraced_accesses(self):
+        s, sym, trace, stop = self.run_traced()
+        m = s.memory_map
+        m.Intercept(0xc000, print)
+        count = trace.Count()
+        m.Read(0x1000, trace=False)
+        m.Write(0x1000, 0x00, trace=False)
+        m.Peek(0x1000)
+        self.assertEqual(count, trace.Count())
+        self.assertTrue(all(m.intercept_pages))
+        m.StopTrace()
+        m.Read(0x1000)
+        self.assertEqual(count, trace.Count())
+        self.assertEqual([0xc0], [page for page in range(256) if m.intercept_pages[page]])
+        # Back to the decoded instructions
+        s.pc = sym["start"]
+        s.run()
+        self.assertIn(sym["loop"], s.decoded)
+
+
+class WatchTests(unittest.TestCase):
+
+    def test_write_watch(self):
+        for kw in ({}, {"compact_memory": True}, {"jit": True}):
+            s, sym = assemble(COPY, **kw)
+            if s.jit:
+                s.jit.threshold = 1
+            m = s.memory_map
+            watchpoint = m.Watch(0x2002, 0x2005)
+            self.assertEqual([0x20], [page for page in range(256) if m.intercept_pages[page]])
+            s.pc = sym["start"]
+            stop = s.run()
+            # Stopped after the sta, with the byte it wrote
+            self.assertEqual((StopReason.WATCHPOINT, sym["loop"] + 6), (stop.reason, stop.pc))
+            self.assertEqual(1, len(m.watch_hits))
+            hit = m.watch_hits[0]
+            self.assertEqual((sym["loop"] + 3, 0x2004, memory_map.MODE_WRITE, None, 0x55),
+                             (hit.pc, hit.address, hit.access_mode, hit.old, hit.new))
+            self.assertIs(watchpoint, hit.watchpoint)
+            for address in (0x2003, 0x2002):
+                s.run()
+                self.assertEqual(address, m.watch_hits[0].address)
+            self.assertEqual(StopReason.BRK, s.run().reason)
+            self.assertEqual(3, watchpoint.hits)
+
+    def test_old_and_new_values(self):
+        s, sym = assemble(COPY)
+        m = s.memory_map
+        m.Write(0x2001, 0x99)
+        m.Watch(0x2001, name="slot")
+        s.pc = sym["start"]
+        s.run()
+        hit = m.watch_hits[0]
+        self.assertEqual((0x99, 0x22, "slot"), (hit.old, hit.new, hit.watchpoint.name))
+        self.assertEqual("WatchHit(pc=$%04x, $2001 w 99 -> 22)" % (sym["loop"] + 3), repr(hit))
+
+    def test_read_and_execute_watch(self):
+        s, sym = assemble(COPY)
+        m = s.memory_map
+        m.Watch(0x1000, 0x1005, "r")
+        s.pc = sym["start"]
+        stop = s.run()
+        self.assertEqual(sym["loop"] + 3, stop.pc)
+        hit = m.watch_hits[0]
+        self.assertEqual((sym["loop"], 0x1004, memory_map.MODE_READ, 0x55, 0x55),
+                         (hit.pc, hit.address, hit.access_mode, hit.old, hit.new))
+        m.Unwatch()
+        self.assertFalse(any(m.intercept_pages))
+
+        # dex at loop + 6, seen each time round even though it is decoded
+        m.Watch(sym["loop"] + 6, modes="x")
+        for x in (3, 2):
+            stop = s.run()
+            self.assertEqual((StopReason.WATCHPOINT, sym["loop"] + 7, x),
+                             (stop.reason, stop.pc, s.x))
+        # execute() fills in the PC too
+        s.pc = sym["loop"] + 6
+        s.execute()
+        self.assertEqual(sym["loop"] + 6, m.watch_hits[-1].pc)
+
+    def test_bad_watch(self):
+        s, sym = assemble(COPY)
+        with self.assertRaises(ValueError):
+            s.memory_map.Watch(0x2000, modes="q")
+        with self.assertRaises(ValueError):
+            s.memory_map.Watch(0xfff0, 0x10010)
+        self.assertEqual([], s.memory_map.watchpoints)
+
+
+# Patches the operand of its own ADC #imm every time round the loop
+SELF_MODIFYING = """
+        org $0200
+start:  ldx #$08
+        lda #$00
+loop:   clc
+patch:  adc #$01
+        inc patch+1
+        dex
+        bne loop
+done:   brk
+"""
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def test_restore(self):
+        for compact in (False, True):
+            s, sym = assemble(COPY, compact_memory=compact)
+            s.pc = sym["start"]
+            before = s.memory_map.Dump()
+            snap = s.snapshot()
+            s.run()
+            s.memory_map.Write(0x8000, 0x42)
+            self.assertNotEqual(before, s.memory_map.Dump())
+            s.restore(snap)
+            self.assertEqual(before, s.memory_map.Dump())
+            self.assertEqual((sym["start"], 0, 0), (s.pc, s.x, s.cycles))
+
+    def test_restore_copies_only_written_pages(self):
+        s, sym = assemble(COPY)
+        snap = s.snapshot()
+        for _ in range(3):
+            s.pc = sym["start"]
+            s.run()
+            self.assertEqual([0x20], s.memory_map._dirty_pages)
+            s.restore(snap)
+            self.assertEqual([], s.memory_map._dirty_pages)
+            self.assertEqual(-1, s.memory_map.Read(0x2000))
+
+    def test_snapshots_share_unwritten_pages(self):
+        s, sym = assemble(COPY)
+        first = s.snapshot()
+        s.pc = sym["start"]
+        s.run()
+        second = s.snapshot()
+        self.assertIsNot(first.pages[0x20], second.pages[0x20])
+        self.assertIs(first.pages[0x10], second.pages[0x10])
+        s.restore(first)
+        self.assertEqual(-1, s.memory_map.Read(0x2004))
+        s.restore(second)
+        self.assertEqual(0x55, s.memory_map.Read(0x2004))
+
+    def test_restore_self_modified_code(self):
+        for jit in (False, True):
+            s, sym = assemble(SELF_MODIFYING, jit=jit)
+            if jit:
+                s.jit.threshold = 1
+            s.pc = sym["start"]
+            snap = s.snapshot()
+            for _ in range(3):
+                s.restore(snap)
+                s.run()
+                self.assertEqual(1 + 2 + 3 + 4 + 5 + 6 + 7 + 8, s.a)
+
+    def test_simulator_from_snapshot(self):
+        for compact in (False, True):
+            s, sym = assemble(COPY, compact_memory=compact)
+            s.pc = sym["start"]
+            s.x = 0x12
+            snap = s.snapshot()
+            copy = sim6502(snap, symbols=sym, compact_memory=compact)
+            self.assertEqual(s.memory_map.Dump(), copy.memory_map.Dump())
+            self.assertEqual((sym["start"], 0x12), (copy.pc, copy.x))
+            # The copy runs on its own memory
+            copy.run()
+            self.assertEqual(0x55, copy.memory_map.Read(0x2004))
+            self.assertNotEqual(0x55, s.memory_map.Read(0x2004))
+            copy.restore(snap)
+            self.assertEqual(s.memory_map.Dump(), copy.memory_map.Dump())
+
+
+class InitializeMemoryTests(unittest.TestCase):
+
+    def test_bulk_copy_matches_skipping(self):
+        # The last one can't be copied in bulk, having a value to skip
+        for image in ([-1] * 0x100 + list(range(256)) + [-1, 7, -1, 8],
+                      [-1, 7, -1, 300, 8],
+                      # Full, partly filled and empty chunks
+                      [1] * 0x180 + [-1] * 0x200 + [2, -1] * 0x40):
+            self.check_image(image)
+
+    def check_image(self, image):
+        for compact in (False, True):
+            s = sim6502(image, address=0x1000, compact_memory=compact)
+            for offset, value in enumerate(image):
+                address = 0x1000 + offset
+                self.assertEqual(0 <= value < 256, s.memory_map.IsInitialized(address))
+                if 0 <= value < 256:
+                    self.assertEqual(value, s.memory_map.Read(address))
+
+    def test_skipped_values_keep_earlier_bytes(self):
+        for compact in (False, True):
+            s = sim6502([1, 2, 3], address=0x10, compact_memory=compact)
+            s.memory_map.InitializeMemory(0x10, [-1, 5, -1])
+            self.assertEqual([1, 5, 3], [s.memory_map.Read(a) for a in range(0x10, 0x13)])
+
+    def test_bytes_image(self):
+        for compact in (False, True):
+            s = sim6502(bytes([0xa9, 0x42]), address=0x0200, compact_memory=compact)
+            self.assertEqual([0xa9, 0x42], [s.memory_map.Read(a) for a in (0x200, 0x201)])
+            self.assertTrue(s.memory_map.IsInitialized(0x201))
+            self.assertFalse(s.memory_map.IsInitialized(0x202))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
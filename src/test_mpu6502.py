@@ -418,42 +418,20 @@ class Common6502Tests:
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0, mpu.p & mpu.CARRY)
 
-    # TODO: enable this once code supports invalid BCD operands
-    # def test_adc_bcd_on_immediate_6f_plus_00_carry_set(self):
-    #     mpu = self._make_mpu()
-    #     mpu.p |= mpu.DECIMAL
-    #     mpu.p |= mpu.CARRY
-    #     mpu.a = 0x6f
-    #     # $0000 ADC #$00
-    #     self._write(mpu.memory, 0x0000, (0x69, 0x00))
-    #     mpu.step()
-    #     self.assertEqual(0x0002, mpu.pc)
-    #     self.assertEqual(0x76, mpu.a)
-    #     self.assertEqual(0, mpu.p & mpu.NEGATIVE)
-    #     self.assertEqual(0, mpu.p & mpu.OVERFLOW)
-    #     self.assertEqual(0, mpu.p & mpu.ZERO)
-    #     self.assertEqual(0, mpu.p & mpu.CARRY)
-
-    # TODO: enable this once code supports invalid BCD operands
-    # def test_adc_bcd_on_immediate_9c_plus_9d(self):
-    #     mpu = self._make_mpu()
-    #     mpu.p |= mpu.DECIMAL
-    #     mpu.p &= ~(mpu.CARRY)
-    #     mpu.a = 0x9c
-    #     # $0000 ADC #$9d
-    #     # $0002 ADC #$9d
-    #     self._write(mpu.memory, 0x0000, (0x69, 0x9d))
-    #     self._write(mpu.memory, 0x0002, (0x69, 0x9d))
-    #     mpu.step()
-    #     self.assertEqual(0x9f, mpu.a)
-    #     self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
-    #     mpu.step()
-    #     self.assertEqual(0x0004, mpu.pc)
-    #     self.assertEqual(0x93, mpu.a)
-    #     self.assertEqual(0, mpu.p & mpu.NEGATIVE)
-    #     self.assertEqual(mpu.OVERFLOW, mpu.p & mpu.OVERFLOW)
-    #     self.assertEqual(0, mpu.p & mpu.ZERO)
-    #     self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+    def test_adc_bcd_on_immediate_6f_plus_00_carry_set(self):
+        mpu = self._make_mpu()
+        mpu.p |= mpu.DECIMAL
+        mpu.p |= mpu.CARRY
+        mpu.a = 0x6f
+        # $0000 ADC #$00
+        self._write(mpu.memory, 0x0000, (0x69, 0x00))
+        mpu.step()
+        self.assertEqual(0x0002, mpu.pc)
+        self.assertEqual(0x76, mpu.a)
+        self.assertEqual(0, mpu.p & mpu.NEGATIVE)
+        self.assertEqual(0, mpu.p & mpu.OVERFLOW)
+        self.assertEqual(0, mpu.p & mpu.ZERO)
+        self.assertEqual(0, mpu.p & mpu.CARRY)
 
     # ADC Absolute, X-Indexed
 
@@ -1765,7 +1743,7 @@ class Common6502Tests:
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        #self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
 
     def test_bit_zp_copies_bit_7_of_memory_to_n_flag_when_1(self):
@@ -1777,7 +1755,7 @@ class Common6502Tests:
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        #self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
 
     def test_bit_zp_copies_bit_6_of_memory_to_v_flag_when_0(self):
@@ -1789,7 +1767,7 @@ class Common6502Tests:
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        #self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
         self.assertEqual(mpu.OVERFLOW, mpu.p & mpu.OVERFLOW)
 
     def test_bit_zp_copies_bit_6_of_memory_to_v_flag_when_1(self):
@@ -1801,7 +1779,7 @@ class Common6502Tests:
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        #self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
         self.assertEqual(0, mpu.p & mpu.OVERFLOW)
 
     def test_bit_zp_stores_result_of_and_in_z_preserves_a_when_1(self):
@@ -1813,7 +1791,7 @@ class Common6502Tests:
         mpu.a = 0x01
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        #self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x00, mpu.memory[0x0010])
@@ -1827,7 +1805,7 @@ class Common6502Tests:
         mpu.a = 0x01
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        #self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
         self.assertEqual(0, mpu.p & mpu.ZERO)  # result of AND is non-zero
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x01, mpu.memory[0x0010])
@@ -1841,7 +1819,7 @@ class Common6502Tests:
         mpu.a = 0x01
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        #self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)  # result of AND is zero
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x00, mpu.memory[0x0010])
@@ -4568,37 +4546,35 @@ class Common6502Tests:
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(mpu.CARRY, mpu.CARRY)
 
-    # TODO: enable this once code supports invalid BCD operands
-    # def test_sbc_bcd_on_immediate_0a_minus_00_carry_set(self):
-    #     mpu = self._make_mpu()
-    #     mpu.p |= mpu.DECIMAL
-    #     mpu.p |= mpu.CARRY
-    #     mpu.a = 0x0a
-    #     # $0000 SBC #$00
-    #     self._write(mpu.memory, 0x0000, (0xe9, 0x00))
-    #     mpu.step()
-    #     self.assertEqual(0x0002, mpu.pc)
-    #     self.assertEqual(0x0a, mpu.a)
-    #     self.assertEqual(0, mpu.p & mpu.NEGATIVE)
-    #     self.assertEqual(0, mpu.p & mpu.OVERFLOW)
-    #     self.assertEqual(0, mpu.p & mpu.ZERO)
-    #     self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
-
-    # TODO: enable this once code supports invalid BCD operands
-    # def test_sbc_bcd_on_immediate_9a_minus_00_carry_set(self):
-    #     mpu = self._make_mpu()
-    #     mpu.p |= mpu.DECIMAL
-    #     mpu.p |= mpu.CARRY
-    #     mpu.a = 0x9a
-    #     #$0000 SBC #$00
-    #     self._write(mpu.memory, 0x0000, (0xe9, 0x00))
-    #     mpu.step()
-    #     self.assertEqual(0x0002, mpu.pc)
-    #     self.assertEqual(0x9a, mpu.a)
-    #     self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
-    #     self.assertEqual(0, mpu.p & mpu.OVERFLOW)
-    #     self.assertEqual(0, mpu.p & mpu.ZERO)
-    #     self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+    def test_sbc_bcd_on_immediate_0a_minus_00_carry_set(self):
+        mpu = self._make_mpu()
+        mpu.p |= mpu.DECIMAL
+        mpu.p |= mpu.CARRY
+        mpu.a = 0x0a
+        # $0000 SBC #$00
+        self._write(mpu.memory, 0x0000, (0xe9, 0x00))
+        mpu.step()
+        self.assertEqual(0x0002, mpu.pc)
+        self.assertEqual(0x0a, mpu.a)
+        self.assertEqual(0, mpu.p & mpu.NEGATIVE)
+        self.assertEqual(0, mpu.p & mpu.OVERFLOW)
+        self.assertEqual(0, mpu.p & mpu.ZERO)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+
+    def test_sbc_bcd_on_immediate_9a_minus_00_carry_set(self):
+        mpu = self._make_mpu()
+        mpu.p |= mpu.DECIMAL
+        mpu.p |= mpu.CARRY
+        mpu.a = 0x9a
+        #$0000 SBC #$00
+        self._write(mpu.memory, 0x0000, (0xe9, 0x00))
+        mpu.step()
+        self.assertEqual(0x0002, mpu.pc)
+        self.assertEqual(0x9a, mpu.a)
+        self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
+        self.assertEqual(0, mpu.p & mpu.OVERFLOW)
+        self.assertEqual(0, mpu.p & mpu.ZERO)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
 
     def test_sbc_bcd_on_immediate_00_minus_01_carry_set(self):
         mpu = self._make_mpu()
@@ -4617,21 +4593,6 @@ class Common6502Tests:
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0, mpu.p & mpu.CARRY)
 
-    # TODO: enable this once code supports invalid BCD operands
-    # def test_sbc_bcd_on_immediate_20_minus_0a_carry_unset(self):
-    #     mpu = self._make_mpu()
-    #     mpu.p |= mpu.DECIMAL
-    #     mpu.a = 0x20
-    #     # $0000 SBC #$00
-    #     self._write(mpu.memory, 0x0000, (0xe9, 0x0a))
-    #     mpu.step()
-    #     self.assertEqual(0x0002, mpu.pc)
-    #     self.assertEqual(0x1f, mpu.a)
-    #     self.assertEqual(0, mpu.p & mpu.NEGATIVE)
-    #     self.assertEqual(0, mpu.p & mpu.OVERFLOW)
-    #     self.assertEqual(0, mpu.p & mpu.ZERO)
-    #     self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
-
     # SBC Absolute, X-Indexed
 
     def test_sbc_abs_x_all_zeros_and_no_borrow_is_zero(self):
@@ -5665,6 +5626,42 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu = self._make_mpu()
         self.assertTrue("6502" in repr(mpu))
 
+    # Decimal mode with invalid BCD, where NMOS and 65C02 differ
+
+    def test_adc_bcd_on_immediate_9c_plus_9d(self):
+        mpu = self._make_mpu()
+        mpu.p |= mpu.DECIMAL
+        mpu.p &= ~(mpu.CARRY)
+        mpu.a = 0x9c
+        # $0000 ADC #$9d
+        # $0002 ADC #$9d
+        self._write(mpu.memory, 0x0000, (0x69, 0x9d))
+        self._write(mpu.memory, 0x0002, (0x69, 0x9d))
+        mpu.step()
+        self.assertEqual(0x9f, mpu.a)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+        mpu.step()
+        self.assertEqual(0x0004, mpu.pc)
+        self.assertEqual(0x93, mpu.a)
+        self.assertEqual(0, mpu.p & mpu.NEGATIVE)
+        self.assertEqual(mpu.OVERFLOW, mpu.p & mpu.OVERFLOW)
+        self.assertEqual(0, mpu.p & mpu.ZERO)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+
+    def test_sbc_bcd_on_immediate_20_minus_0a_carry_unset(self):
+        mpu = self._make_mpu()
+        mpu.p |= mpu.DECIMAL
+        mpu.a = 0x20
+        # $0000 SBC #$00
+        self._write(mpu.memory, 0x0000, (0xe9, 0x0a))
+        mpu.step()
+        self.assertEqual(0x0002, mpu.pc)
+        self.assertEqual(0x1f, mpu.a)
+        self.assertEqual(0, mpu.p & mpu.NEGATIVE)
+        self.assertEqual(0, mpu.p & mpu.OVERFLOW)
+        self.assertEqual(0, mpu.p & mpu.ZERO)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+
     # ADC Indirect, Indexed (X)
 
     def test_adc_ind_indexed_has_page_wrap_bug(self):
@@ -46,6 +46,44 @@ class MPUTests(unittest.TestCase, Common6502Tests):
     #     mpu = self._make_mpu()
     #     self.assertTrue('65C02' in repr(mpu))
 
+    # Decimal mode with invalid BCD, where NMOS and 65C02 differ
+
+    def test_adc_bcd_on_immediate_9c_plus_9d(self):
+        mpu = self._make_mpu()
+        mpu.p |= mpu.DECIMAL
+        mpu.p &= ~(mpu.CARRY)
+        mpu.a = 0x9c
+        # $0000 ADC #$9d
+        # $0002 ADC #$9d
+        self._write(mpu.memory, 0x0000, (0x69, 0x9d))
+        self._write(mpu.memory, 0x0002, (0x69, 0x9d))
+        mpu.step()
+        self.assertEqual(0x9f, mpu.a)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+        mpu.step()
+        self.assertEqual(0x0004, mpu.pc)
+        self.assertEqual(0x93, mpu.a)
+        # N from the result
+        self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
+        self.assertEqual(mpu.OVERFLOW, mpu.p & mpu.OVERFLOW)
+        self.assertEqual(0, mpu.p & mpu.ZERO)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+
+    def test_sbc_bcd_on_immediate_20_minus_0a_carry_unset(self):
+        mpu = self._make_mpu()
+        mpu.p |= mpu.DECIMAL
+        mpu.a = 0x20
+        # $0000 SBC #$0a
+        self._write(mpu.memory, 0x0000, (0xe9, 0x0a))
+        mpu.step()
+        self.assertEqual(0x0002, mpu.pc)
+        # The 65C02 adjusts the whole difference, not digit by digit
+        self.assertEqual(0x0f, mpu.a)
+        self.assertEqual(0, mpu.p & mpu.NEGATIVE)
+        self.assertEqual(0, mpu.p & mpu.OVERFLOW)
+        self.assertEqual(0, mpu.p & mpu.ZERO)
+        self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
+
     # ADC Zero Page, Indirect
 
     def test_adc_bcd_off_zp_ind_carry_clear_in_accumulator_zeroes(self):
@@ -58,7 +96,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(0, mpu.p & mpu.CARRY)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
@@ -75,7 +113,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
         self.assertEqual(0, mpu.p & mpu.ZERO)
@@ -91,7 +129,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0xFE
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0xFF, mpu.a)
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
         self.assertEqual(0, mpu.p & mpu.CARRY)
@@ -107,7 +145,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(mpu.CARRY, mpu.p & mpu.CARRY)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
@@ -196,7 +234,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
@@ -211,7 +249,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0xAA
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0xAA, mpu.a)
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
         self.assertEqual(0, mpu.p & mpu.ZERO)
@@ -228,7 +266,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x0003, mpu.pc)
 
     def test_bit_abs_x_copies_bit_7_of_memory_to_n_flag_when_1(self):
@@ -241,7 +279,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x0003, mpu.pc)
 
     def test_bit_abs_x_copies_bit_6_of_memory_to_v_flag_when_0(self):
@@ -254,7 +292,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(mpu.OVERFLOW, mpu.p & mpu.OVERFLOW)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x0003, mpu.pc)
 
     def test_bit_abs_x_copies_bit_6_of_memory_to_v_flag_when_1(self):
@@ -267,7 +305,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0, mpu.p & mpu.OVERFLOW)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x0003, mpu.pc)
 
     def test_bit_abs_x_stores_result_of_and_in_z_preserves_a_when_1(self):
@@ -282,7 +320,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x00, mpu.memory[0xFEED])
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x0003, mpu.pc)
 
     def test_bit_abs_x_stores_result_of_and_nonzero_in_z_preserves_a(self):
@@ -297,7 +335,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0, mpu.p & mpu.ZERO)  # result of AND is non-zero
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x01, mpu.memory[0xFEED])
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x0003, mpu.pc)
 
     def test_bit_abs_x_stores_result_of_and_when_zero_in_z_preserves_a(self):
@@ -312,7 +350,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)  # result of AND is zero
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x00, mpu.memory[0xFEED])
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x0003, mpu.pc)
 
     # BIT (Immediate)
@@ -327,7 +365,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
         self.assertEqual(mpu.OVERFLOW, mpu.p & mpu.OVERFLOW)
         self.assertEqual(0x00, mpu.a)
-        # self.assertEqual(2, mpu.processorCycles)
+        self.assertEqual(2, mpu.processorCycles)
         self.assertEqual(0x02, mpu.pc)
 
     def test_bit_imm_stores_result_of_and_in_z_preserves_a_when_1(self):
@@ -339,7 +377,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x01, mpu.a)
-        # self.assertEqual(2, mpu.processorCycles)
+        self.assertEqual(2, mpu.processorCycles)
         self.assertEqual(0x02, mpu.pc)
 
     def test_bit_imm_stores_result_of_and_when_nonzero_in_z_preserves_a(self):
@@ -351,7 +389,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(0, mpu.p & mpu.ZERO)  # result of AND is non-zero
         self.assertEqual(0x01, mpu.a)
-        # self.assertEqual(2, mpu.processorCycles)
+        self.assertEqual(2, mpu.processorCycles)
         self.assertEqual(0x02, mpu.pc)
 
     def test_bit_imm_stores_result_of_and_when_zero_in_z_preserves_a(self):
@@ -363,7 +401,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)  # result of AND is zero
         self.assertEqual(0x01, mpu.a)
-        # self.assertEqual(2, mpu.processorCycles)
+        self.assertEqual(2, mpu.processorCycles)
         self.assertEqual(0x02, mpu.pc)
 
     # BIT (Zero Page, X-Indexed)
@@ -378,7 +416,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
 
     def test_bit_zp_x_copies_bit_7_of_memory_to_n_flag_when_1(self):
@@ -391,7 +429,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
 
     def test_bit_zp_x_copies_bit_6_of_memory_to_v_flag_when_0(self):
@@ -404,7 +442,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(mpu.OVERFLOW, mpu.p & mpu.OVERFLOW)
 
     def test_bit_zp_x_copies_bit_6_of_memory_to_v_flag_when_1(self):
@@ -417,7 +455,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0, mpu.p & mpu.OVERFLOW)
 
     def test_bit_zp_x_stores_result_of_and_in_z_preserves_a_when_1(self):
@@ -431,7 +469,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x00, mpu.memory[0x0010 + mpu.x])
 
@@ -446,7 +484,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(0, mpu.p & mpu.ZERO)  # result of AND is non-zero
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x01, mpu.memory[0x0010 + mpu.x])
 
@@ -460,7 +498,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.a = 0x01
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)  # result of AND is zero
         self.assertEqual(0x01, mpu.a)
         self.assertEqual(0x00, mpu.memory[0x0010 + mpu.x])
@@ -495,7 +533,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x42
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x42, mpu.a)
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
@@ -510,7 +548,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x42
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x43, mpu.a)
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
@@ -527,7 +565,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(0xFF, mpu.memory[0xABCD])
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
@@ -542,7 +580,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0xFF, mpu.a)
         self.assertEqual(0xFF, mpu.memory[0xABCD])
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
@@ -589,7 +627,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self._write(mpu.memory, 0, (0x6c, 0xFF, 0x10))
         mpu.step()
         self.assertEqual(0xABCD, mpu.pc)
-        # self.assertEqual(6, mpu.processorCycles)
+        self.assertEqual(6, mpu.processorCycles)
 
     # JMP Indirect Absolute X-Indexed
 
@@ -602,7 +640,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self._write(mpu.memory, 0xABCF, (0x34, 0x12))
         mpu.step()
         self.assertEqual(0x1234, mpu.pc)
-        # self.assertEqual(6, mpu.processorCycles)
+        self.assertEqual(6, mpu.processorCycles)
 
     # LDA Zero Page, Indirect
 
@@ -616,7 +654,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x80
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x80, mpu.a)
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
         self.assertEqual(0, mpu.p & mpu.ZERO)
@@ -631,7 +669,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
@@ -651,7 +689,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
 
@@ -666,7 +704,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xABCD] = 0x82
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x83, mpu.a)
         self.assertEqual(mpu.NEGATIVE, mpu.p & mpu.NEGATIVE)
         self.assertEqual(0, mpu.p & mpu.ZERO)
@@ -683,7 +721,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0xAB, mpu.x)
         self.assertEqual(0xAB, mpu.memory[0x01FF])
         self.assertEqual(0xFE, mpu.sp)
-        # self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
 
     # PHY
 
@@ -697,7 +735,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0xAB, mpu.y)
         self.assertEqual(0xAB, mpu.memory[0x01FF])
         self.assertEqual(0xFE, mpu.sp)
-        # self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
 
     # PLX
 
@@ -711,7 +749,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0x0001, mpu.pc)
         self.assertEqual(0xAB,   mpu.x)
         self.assertEqual(0xFF,   mpu.sp)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
 
     # PLY
 
@@ -725,7 +763,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0x0001, mpu.pc)
         self.assertEqual(0xAB,   mpu.y)
         self.assertEqual(0xFF,   mpu.sp)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
 
     # RMBx opcodes are only on Rockwell and WDC 65C02s
 
@@ -926,7 +964,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xFEED] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0xFF, mpu.memory[0xFEED])
         self.assertEqual(0xFF, mpu.a)
         self.assertEqual(flags, mpu.p)
@@ -942,7 +980,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xFEED] = 0xFF
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.memory[0xFEED])
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(flags, mpu.p)
@@ -1147,7 +1185,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xFEED] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
         self.assertEqual(mpu.CARRY, mpu.CARRY)
@@ -1165,7 +1203,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xFEED] = 0x01
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
         self.assertEqual(mpu.CARRY, mpu.CARRY)
@@ -1183,7 +1221,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xFEED] = 0x00
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x00, mpu.a)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
         self.assertEqual(mpu.CARRY, mpu.CARRY)
@@ -1201,7 +1239,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.memory[0xFEED] = 0x02
         mpu.step()
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
         self.assertEqual(0x04, mpu.a)
         self.assertEqual(0, mpu.p & mpu.NEGATIVE)
         self.assertEqual(0, mpu.p & mpu.ZERO)
@@ -1218,7 +1256,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(0x00, mpu.memory[0x0032])
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(3, mpu.processorCycles)
+        self.assertEqual(3, mpu.processorCycles)
 
     # STZ Zero Page, X-Indexed
 
@@ -1231,7 +1269,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(0x00, mpu.memory[0x0032])
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
 
     # STZ Absolute
 
@@ -1244,7 +1282,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(0x00, mpu.memory[0xFEED])
         self.assertEqual(0x0003, mpu.pc)
-        # self.assertEqual(4, mpu.processorCycles)
+        self.assertEqual(4, mpu.processorCycles)
 
     # STZ Absolute, X-Indexed
 
@@ -1259,7 +1297,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.step()
         self.assertEqual(0x00, mpu.memory[0xFEED])
         self.assertEqual(0x0003, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
 
     # TSB Zero Page
 
@@ -1274,7 +1312,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0xF0, mpu.memory[0x00BB])
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
 
     def test_tsb_sp_zeros(self):
         mpu = self._make_mpu()
@@ -1287,7 +1325,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0xE0, mpu.memory[0x00BB])
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
 
     # TSB Absolute
 
@@ -1302,7 +1340,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0xF0, mpu.memory[0xFEED])
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0x0003, mpu.pc)
-        # self.assertEqual(6, mpu.processorCycles)
+        self.assertEqual(6, mpu.processorCycles)
 
     def test_tsb_abs_zeros(self):
         mpu = self._make_mpu()
@@ -1315,7 +1353,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0xE0, mpu.memory[0xFEED])
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x0003, mpu.pc)
-        # self.assertEqual(6, mpu.processorCycles)
+        self.assertEqual(6, mpu.processorCycles)
 
     # TRB Zero Page
 
@@ -1331,7 +1369,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0x84, mpu.memory[0x00BB])
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
 
     def test_trb_sp_ones(self):
         # A9 E0 85 BB a9 70 14 bb 00
@@ -1345,7 +1383,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0x80, mpu.memory[0x00BB])
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
 
     def test_trb_sp_zeros(self):
         # A9 80 85 BB a9 60 14 bb 00
@@ -1359,7 +1397,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0x80, mpu.memory[0x00BB])
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x0002, mpu.pc)
-        # self.assertEqual(5, mpu.processorCycles)
+        self.assertEqual(5, mpu.processorCycles)
 
     # TRB Absolute
 
@@ -1374,7 +1412,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0x80, mpu.memory[0xFEED])
         self.assertEqual(0, mpu.p & mpu.ZERO)
         self.assertEqual(0x0003, mpu.pc)
-        # self.assertEqual(6, mpu.processorCycles)
+        self.assertEqual(6, mpu.processorCycles)
 
     def test_trb_abs_zeros(self):
         mpu = self._make_mpu()
@@ -1387,7 +1425,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self.assertEqual(0x80, mpu.memory[0xFEED])
         self.assertEqual(mpu.ZERO, mpu.p & mpu.ZERO)
         self.assertEqual(0x0003, mpu.pc)
-        # self.assertEqual(6, mpu.processorCycles)
+        self.assertEqual(6, mpu.processorCycles)
 
     def test_dec_a_decreases_a(self):
         mpu = self._make_mpu()
@@ -1425,7 +1463,8 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         self._write(mpu.memory, 0x0000, [0x80, 0x10])
         mpu.step()
         self.assertEqual(0x12, mpu.pc)
-        # self.assertEqual(2, mpu.processorCycles)
+        # BRA is always taken: 3 cycles per the WDC datasheet (py65 says 2)
+        self.assertEqual(3, mpu.processorCycles)
 
     def test_bra_backward(self):
         mpu = self._make_mpu()
@@ -1434,7 +1473,7 @@ class MPUTests(unittest.TestCase, Common6502Tests):
         mpu.pc = 0x0204
         mpu.step()
         self.assertEqual(0x1F6, mpu.pc)
-        # self.assertEqual(3, mpu.processorCycles)  # Crossed boundry
+        self.assertEqual(4, mpu.processorCycles)  # Crossed boundry
 
     # WAI
 
@@ -0,0 +1,179 @@
+"""Tests for profile6502, the per-address hot-spot profiler."""
+
+import io
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502
+from profile6502 import Profiler
+
+
+# Calls double four times; double's loop is where the time goes
+CALLS = """
+        org $0200
+start:  ldy #$04
+again:  jsr double
+        dey
+        bne again
+done:   brk
+double: ldx #$08
+loop:   asl $10
+        dex
+        bne loop
+        rts
+"""
+
+
+def assemble(src, **kw):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, **kw)
+    s.pc = a.symbols["start"]
+    return s, a.symbols
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def test_counts(self):
+        s, sym = assemble(CALLS, profile=True)
+        stop = s.run()
+        p = s.profiler
+        self.assertEqual(stop.steps, sum(p.instructions))
+        self.assertEqual(stop.cycles, sum(p.cycles))
+        self.assertEqual(32, p.instructions[sym["loop"]])
+        self.assertEqual(32 * 5, p.cycles[sym["loop"]])
+        self.assertEqual(0, p.instructions[sym["done"]])
+        self.assertEqual((sym["loop"], 32, 160), p.by_address()[0])
+        # execute() counts too
+        s.pc = sym["double"]
+        s.execute()
+        self.assertEqual(5, p.instructions[sym["double"]])
+        p.reset()
+        self.assertEqual(0, sum(p.instructions))
+
+    def test_by_symbol(self):
+        s, sym = assemble(CALLS, profile=True)
+        s.run()
+        # rts is part of loop, the nearest symbol before it
+        self.assertEqual([("loop", 100, 32 * 5 + 32 * 2 + 28 * 3 + 4 * 2 + 4 * 6),
+                          ("again", 12, 4 * 6 + 4 * 2 + 3 * 3 + 2),
+                          ("double", 4, 4 * 2),
+                          ("start", 1, 2)],
+                         s.profiler.by_symbol())
+        self.assertEqual("$01ff", s.profiler.symbol_for(0x01ff))
+
+    def test_report_and_collapsed(self):
+        s, sym = assemble(CALLS, profile=True)
+        s.run()
+        out = io.StringIO()
+        s.profiler.report(file=out, limit=2)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].endswith("  loop"))
+        out = io.StringIO()
+        s.profiler.report(file=out, by_address=True)
+        self.assertIn("$%04x loop" % (sym["loop"] + 2), out.getvalue())
+        out = io.StringIO()
+        s.profiler.write_collapsed(out, weight="instructions")
+        self.assertEqual("again 12\ndouble 4\nloop 100\nstart 1\n", out.getvalue())
+
+    def test_jit_is_bypassed(self):
+        s, sym = assemble(CALLS, jit=True, profile=True)
+        s.jit.threshold = 1
+        stop = s.run()
+        self.assertEqual(stop.steps, sum(s.profiler.instructions))
+        self.assertEqual({}, s.jit.blocks)
+
+    def test_own_symbols(self):
+        s, sym = assemble(CALLS)
+        self.assertIsNone(s.profiler)
+        s.profiler = Profiler(s, {"main": sym["start"], "double": sym["double"]})
+        s.run()
+        self.assertEqual(["double", "main"], [row[0] for row in s.profiler.by_symbol()])
+
+
+# Returns that don't match their calls: bail throws away its return address
+# so that its RTS returns from tricky, and dispatch jumps with an RTS
+NESTED = """
+        org $0200
+start:  jsr outer
+        jsr tricky
+        jsr dispatch
+done:   brk
+outer:  jsr inner
+        jsr inner
+        rts
+inner:  nop
+        rts
+tricky: jsr bail
+        nop
+bail:   pla
+        pla
+        rts
+dispatch: lda #>before
+        pha
+        lda #<before
+        pha
+        rts
+before: nop
+target: rts
+isr:    inx
+        rti
+"""
+
+
+class CallGraphTests(unittest.TestCase):
+
+    def test_calls(self):
+        s, sym = assemble(CALLS, profile=True)
+        s.run()
+        p = s.profiler
+        per_call = 2 + 8 * 5 + 8 * 2 + 7 * 3 + 2 + 6
+        self.assertEqual([("double", 4, 4 * 26, 4 * per_call, 4 * 26, 4 * per_call)],
+                         p.call_graph())
+        self.assertEqual([("<top>", 4, 4 * 26, 4 * per_call)], p.callers("double"))
+        self.assertEqual(1, len(p.stack))
+
+    def test_nested_and_resynchronized(self):
+        s, sym = assemble(NESTED, profile=True)
+        s.run()
+        p = s.profiler
+        self.assertEqual([("outer", 1, 7, 34, 3, 18),
+                          ("dispatch", 1, 6, 22, 6, 22),
+                          ("tricky", 1, 4, 20, 1, 6),
+                          ("inner", 2, 4, 16, 4, 16),
+                          ("bail", 1, 3, 14, 3, 14)],
+                         p.call_graph())
+        self.assertEqual([("outer", 2, 4, 16)], p.callers("inner"))
+        self.assertEqual([("tricky", 1, 3, 14)], p.callers("bail"))
+        self.assertEqual(1, len(p.stack))
+
+        out = io.StringIO()
+        p.report_calls(file=out, limit=1)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].endswith("  outer"))
+        self.assertTrue(lines[2].endswith("from <top>"))
+
+    def test_interrupt(self):
+        s, sym = assemble(NESTED, profile=True)
+        s.memory_map.Write(0xfffe, sym["isr"] & 0xff)
+        s.memory_map.Write(0xffff, sym["isr"] >> 8)
+        s.pc = sym["inner"]
+        s.irq()
+        s.run(until_pc=sym["inner"])
+        # The 7 cycles the interrupt takes are the handler's
+        self.assertEqual([("isr", 1, 2, 7 + 2 + 6, 2, 7 + 2 + 6)], s.profiler.call_graph())
+
+    def test_recursion_counted_once(self):
+        s, sym = assemble(NESTED, profile=True)
+        p = s.profiler
+        p.call(sym["inner"], 0xff)
+        p.call(sym["inner"], 0xfd)
+        p.executed += 10
+        p.returned(0xfd)
+        p.returned(0xff)
+        self.assertEqual([("inner", 2, 10, 0, 10, 0)], p.call_graph())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
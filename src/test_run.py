@@ -0,0 +1,275 @@
+"""Tests for sim6502.run(), the bulk execution loop.
+
+run() must leave the CPU in exactly the state the equivalent
+``while ...: s.execute()`` loop would, and report why it stopped.
+"""
+
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason, StepStatus
+
+
+def assemble(src, variant=sim6502.CMOS, **kw):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    return sim6502(a.object_code[:], symbols=a.symbols, variant=variant, **kw), a.symbols
+
+
+COUNT_DOWN = """
+        org $0200
+start:  ldx #$10
+        lda #$00
+loop:   clc
+        adc #$03
+        sta $1000,x
+        dex
+        bne loop
+done:   nop
+        brk
+"""
+
+
+class RunTests(unittest.TestCase):
+
+    def test_until_pc_matches_execute_loop(self):
+        s1, sym = assemble(COUNT_DOWN)
+        s2, _ = assemble(COUNT_DOWN)
+        s1.pc = s2.pc = sym["start"]
+        stop = s1.run(until_pc=sym["done"])
+        steps = 0
+        while s2.pc != sym["done"]:
+            s2.execute()
+            steps += 1
+        self.assertEqual(StopReason.PC, stop.reason)
+        self.assertEqual(sym["done"], stop.pc)
+        self.assertEqual(steps, stop.steps)
+        self.assertEqual((s2.pc, s2.a, s2.x, s2.y, s2.sp, s2.cc),
+                         (s1.pc, s1.a, s1.x, s1.y, s1.sp, s1.cc))
+        for addr in range(0x1000, 0x1011):
+            self.assertEqual(s2.memory_map.Read(addr), s1.memory_map.Read(addr))
+
+    def test_until_pc_accepts_a_set(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        stop = s.run(until_pc={sym["loop"], sym["done"]})
+        self.assertEqual(StopReason.PC, stop.reason)
+        self.assertEqual(sym["loop"], s.pc)
+        self.assertEqual(2, stop.steps)
+
+    def test_already_at_stop_address(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        stop = s.run(until_pc=sym["start"])
+        self.assertEqual(0, stop.steps)
+        self.assertEqual(sym["start"], s.pc)
+
+    def test_max_steps(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        stop = s.run(max_steps=3)
+        self.assertEqual(StopReason.STEPS, stop.reason)
+        self.assertEqual(3, stop.steps)
+        self.assertEqual(sym["loop"] + 1, s.pc)
+
+    def test_stops_before_brk(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        stop = s.run()
+        self.assertEqual(StopReason.BRK, stop.reason)
+        self.assertEqual(sym["done"] + 1, s.pc)
+        self.assertEqual(0xFF, s.sp)
+
+    def test_executes_brk_when_asked(self):
+        s, sym = assemble(COUNT_DOWN + "\n org $fffe\n dw $3000\n")
+        s.pc = sym["start"]
+        stop = s.run(stop_on_brk=False, until_pc=0x3000)
+        self.assertEqual(StopReason.PC, stop.reason)
+        self.assertEqual(0xFC, s.sp)
+
+    def test_not_instruction_leaves_pc_on_opcode(self):
+        s, _ = assemble(" org $0200\n nop\n db $02\n", variant=sim6502.CMOS)
+        s.pc = 0x0200
+        stop = s.run()
+        self.assertEqual(StopReason.NOT_INSTRUCTION, stop.reason)
+        self.assertEqual(0x0201, stop.pc)
+        self.assertEqual(1, stop.steps)
+
+    def test_nmos_stops_on_cmos_opcode(self):
+        s, _ = assemble(" org $0200\n nop\n bra $0200\n", variant=sim6502.NMOS)
+        s.pc = 0x0200
+        stop = s.run(max_steps=10)
+        self.assertEqual(StopReason.NOT_INSTRUCTION, stop.reason)
+        self.assertEqual(0x0201, stop.pc)
+
+    def test_weeds(self):
+        s, _ = assemble(" org $0200\n nop\n")
+        s.pc = 0x0200
+        stop = s.run()
+        self.assertEqual(StopReason.WEEDS, stop.reason)
+        self.assertEqual(0x0201, stop.pc)
+
+    def test_run_resumes(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        total = 0
+        while True:
+            stop = s.run(max_steps=5)
+            total += stop.steps
+            if stop.reason != StopReason.STEPS:
+                break
+        self.assertEqual(StopReason.BRK, stop.reason)
+        self.assertEqual(3 + 16 * 5, total)
+
+
+# Patches the operand of its own ADC #imm every time round the loop
+SELF_MODIFYING = """
+        org $0200
+start:  ldx #$08
+        lda #$00
+loop:   clc
+patch:  adc #$01
+        inc patch+1
+        dex
+        bne loop
+done:   nop
+        brk
+"""
+
+
+class DecodeCacheTests(unittest.TestCase):
+
+    def test_loop_is_decoded_once(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        s.run(until_pc=sym["done"])
+        handler, fetch, opcode, operand8, operand16, length, cycles, penalty = \
+            s.decoded[sym["loop"] + 1]
+        self.assertEqual((sim6502.instr_adc, sim6502.operand_immediate, 0x69, 0x03, 2),
+                         (handler, fetch, opcode, operand8, length))
+        # BRK is never cached
+        self.assertNotIn(sym["done"] + 1, s.decoded)
+
+    def test_self_modifying_code(self):
+        for use_run in (False, True):
+            s, sym = assemble(SELF_MODIFYING)
+            s.pc = sym["start"]
+            if use_run:
+                s.run(until_pc=sym["done"])
+            else:
+                while s.pc != sym["done"]:
+                    s.execute()
+            self.assertEqual(1 + 2 + 3 + 4 + 5 + 6 + 7 + 8, s.a)
+
+    def test_write_drops_entries_covering_address(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        s.run(until_pc=sym["done"])
+        sta = sym["loop"] + 3
+        self.assertIn(sta, s.decoded)
+        s.memory_map.Write(sta + 2, 0x20)
+        self.assertNotIn(sta, s.decoded)
+        self.assertIn(sym["loop"], s.decoded)
+        s.memory_map.Poke(sym["loop"], 0x38)
+        self.assertNotIn(sym["loop"], s.decoded)
+
+    def test_interceptor_added_later_still_fires(self):
+        s, sym = assemble(COUNT_DOWN)
+        s.pc = sym["start"]
+        s.run(until_pc=sym["done"])
+        seen = []
+        s.memory_map.Intercept(sym["loop"],
+                               lambda address, mode, value: seen.append(mode))
+        self.assertEqual({}, s.decoded)
+        s.pc = sym["start"]
+        s.run(until_pc=sym["done"])
+        # Each time round the loop.  lda #$00 just before it only fetches
+        # its own two bytes, so it is still decoded
+        self.assertEqual(16, len(seen))
+        self.assertNotIn(sym["loop"], s.decoded)
+        self.assertIn(sym["loop"] - 2, s.decoded)
+        self.assertIn(sym["loop"] + 1, s.decoded)
+
+    def test_fetches_only_the_instruction(self):
+        # Nothing past the last byte of each instruction is fetched, so
+        # code can end right before uninitialized memory
+        for use_run in (False, True):
+            s, sym = assemble(" org $0200\nstart: ldx #$01\n inx\n tax\ndone:\n")
+            seen = []
+            s.memory_map.InterceptRange(sym["start"], sym["done"] + 2,
+                                        lambda address, mode, value: seen.append(address))
+            s.pc = sym["start"]
+            if use_run:
+                s.run(until_pc=sym["done"])
+            else:
+                while s.pc != sym["done"]:
+                    s.execute()
+            self.assertEqual([0x0200, 0x0201, 0x0202, 0x0203], seen)
+            self.assertEqual(sym["done"], s.pc)
+
+
+class StepTests(unittest.TestCase):
+
+    def test_matches_execute(self):
+        plain, sym = assemble(COUNT_DOWN)
+        s, _ = assemble(COUNT_DOWN)
+        plain.pc = s.pc = sym["start"]
+        while plain.pc != sym["done"]:
+            plain.execute()
+            self.assertEqual(StepStatus.OK, s.step())
+            self.assertEqual((plain.pc, plain.a, plain.x, plain.cc, plain.cycles),
+                             (s.pc, s.a, s.x, s.cc, s.cycles))
+        self.assertEqual(plain.memory_map.Dump(0x1000, 0x1011),
+                         s.memory_map.Dump(0x1000, 0x1011))
+
+    def test_same_bookkeeping_as_execute_and_run(self):
+        # Each of them counts the instruction and gives the watch hit its pc
+        seen = []
+        for how in ("execute", "step", "run"):
+            s, sym = assemble(COUNT_DOWN, profile=True)
+            s.memory_map.Watch(0x1010)
+            s.pc = sym["start"]
+            if how == "run":
+                self.assertEqual(StopReason.WATCHPOINT, s.run().reason)
+            while not s.memory_map.watch_hits:
+                getattr(s, how)()
+            seen.append((s.pc, s.cycles, s.profiler.executed,
+                         s.memory_map.watch_hits[0].pc))
+        self.assertEqual([(sym["loop"] + 6, 13, 5, sym["loop"] + 3)] * 3, seen)
+
+    def test_wraps_at_top_of_memory(self):
+        # A NOP at $FFFF and an INX at $0000
+        for how in ("execute", "step", "run"):
+            s, _ = assemble(" org $0000\n inx\n org $ffff\n nop\n")
+            s.pc = 0xffff
+            if how == "run":
+                self.assertEqual(StopReason.STEPS, s.run(max_steps=2).reason)
+            else:
+                getattr(s, how)()
+                getattr(s, how)()
+            self.assertEqual((0x0001, 1), (s.pc, s.x), how)
+
+    def test_execute_still_reports_writes_and_stack(self):
+        s, _ = assemble(" org $0200\n inx\n sta $1234\n dec $10,x\n asl a\n pha\n rts\n")
+        s.pc, s.sp = 0x0200, 0xf0
+        self.assertEqual([(None, None), ("w", 0x1234), ("w", 0x11), (None, None),
+                          ("stack", 0xef), ("stack", 0xf1)],
+                         [s.execute() for _ in range(6)])
+        # The handlers themselves return just the address written, or None
+        self.assertEqual(0x1234, s.execute_decoded(0x0201, s.instruction(0x0201)))
+        self.assertIsNone(s.execute_decoded(0x0205, s.instruction(0x0205)))
+
+    def test_stops_leave_pc_on_opcode(self):
+        for src, variant, status in (
+                (" org $0200\n nop\n db $02\n", sim6502.CMOS, StepStatus.NOT_INSTRUCTION),
+                (" org $0200\n nop\n bra $0200\n", sim6502.NMOS, StepStatus.NOT_INSTRUCTION),
+                (" org $0200\n nop\n", sim6502.CMOS, StepStatus.WEEDS)):
+            s, _ = assemble(src, variant=variant)
+            s.pc = 0x0200
+            self.assertEqual(StepStatus.OK, s.step())
+            cycles = s.cycles
+            self.assertEqual(status, s.step())
+            self.assertEqual((0x0201, cycles), (s.pc, s.cycles))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
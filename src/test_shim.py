@@ -17,7 +17,7 @@ class Shim6502(object):
         self.mpu = sim6502.sim6502(variant=variant)
 
     def step(self):
-        self.mpu.execute()
+        self.mpu.step()
 
     def reset(self):
         self.mpu.reset()
@@ -71,6 +71,10 @@ class Shim6502(object):
     def a(self, value):
         self.mpu.a = value
 
+    @property
+    def processorCycles(self):
+        return self.mpu.cycles
+
     @property
     def pc(self):
         return self.mpu.pc
@@ -88,8 +92,12 @@ class MemoryShim(object):
         return self.memory_map.Read(item)
 
     def __setitem__(self, item, value):
-        # TODO: hack, bypasses tracing
-        return self.memory_map._memory_map.__setitem__(item, value)
+        if isinstance(item, slice):
+            # Only contiguous slices are used by the tests
+            for address, byte in enumerate(value, item.start or 0):
+                self.memory_map.Poke(address, byte)
+        else:
+            self.memory_map.Poke(item, value)
 
     def __len__(self):
         return len(self.memory_map._memory_map)
@@ -0,0 +1,124 @@
+"""Tests for sim6502.run_async() and the stream6502 devices."""
+
+import asyncio
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+from stream6502 import Keyboard, SerialPort
+
+
+# Sends each key to the serial port, until a "q"
+ECHO = """
+        org $0200
+start:  ldx #$00
+wait:   lda $c000
+        bpl wait
+        sta $c010
+        and #$7f
+        sta $c0a8
+        inx
+        cmp #$71
+        bne wait
+done:   brk
+"""
+
+COUNTING = """
+        org $0200
+start:  ldx #$00
+        ldy #$00
+loop:   inx
+        bne loop
+        iny
+        cpy #$40
+        bne loop
+done:   brk
+"""
+
+
+def assemble(src, **kw):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, idle=True, **kw)
+    s.pc = a.symbols["start"]
+    return s, a.symbols
+
+
+def state(s, stop):
+    return (stop.reason, stop.pc, stop.steps, stop.cycles, s.x, s.y, s.cc, s.cycles)
+
+
+class RunAsyncTests(unittest.TestCase):
+
+    def test_same_stop_as_run(self):
+        for limits in ({}, {"max_cycles": 54321}, {"max_steps": 20001},
+                       {"until_pc": 0x0204}):
+            s, sym = assemble(COUNTING)
+            plain, _ = assemble(COUNTING)
+            stop = asyncio.run(s.run_async(slice_cycles=1000, **limits))
+            self.assertEqual(state(plain, plain.run(**limits)), state(s, stop), limits)
+
+    def test_yields_between_slices(self):
+        ticks = []
+
+        async def ticker(s):
+            while s.memory_map.Read(0x10) == 0:
+                ticks.append(s.cycles)
+                await asyncio.sleep(0)
+
+        async def main():
+            s, sym = assemble(COUNTING)
+            s.memory_map.Poke(0x10, 0)
+            task = asyncio.ensure_future(ticker(s))
+            stop = await s.run_async(slice_cycles=10000)
+            s.memory_map.Poke(0x10, 1)
+            await task
+            return stop
+
+        stop = asyncio.run(main())
+        self.assertEqual(StopReason.BRK, stop.reason)
+        self.assertGreater(len(ticks), stop.cycles // 10000 - 2)
+        self.assertEqual(sorted(ticks), ticks)
+
+    def test_machines_wait_for_input(self):
+        async def machine(text):
+            s, sym = assemble(ECHO)
+            keyboard = Keyboard(s)
+            serial = SerialPort(s, 0xc0a8)
+            reader = asyncio.StreamReader()
+            pumping = asyncio.ensure_future(keyboard.pump(reader))
+
+            async def typist():
+                for ch in text:
+                    await asyncio.sleep(0.001)
+                    reader.feed_data(ch.encode())
+                reader.feed_eof()
+            typing = asyncio.ensure_future(typist())
+            stop = await s.run_async(slice_cycles=5000)
+            await typing
+            await pumping
+            return stop, s, serial
+
+        async def main():
+            return await asyncio.gather(*(machine(text) for text in
+                                          ("abq", "hello\nq", "q")))
+
+        for (stop, s, serial), text in zip(asyncio.run(main()), ("abq", "hello\nq", "q")):
+            self.assertEqual(StopReason.BRK, stop.reason)
+            self.assertEqual(text.replace("\n", "\r").encode(), bytes(serial.output))
+            self.assertEqual(len(text), s.x)
+            # Skipped up to the end of a slice at most once per key
+            self.assertLess(s.cycles, 5000 * (len(text) + 1) + 1000)
+
+    def test_waiting_for_host(self):
+        s, sym = assemble(ECHO)
+        Keyboard(s)
+        stop = s.run(max_cycles=10000)
+        self.assertEqual(StopReason.CYCLES, stop.reason)
+        self.assertTrue(sym["wait"] <= stop.pc < sym["wait"] + 5)
+        self.assertTrue(s.waiting_for_host())
+        s.schedule(s.cycles + 100, lambda: None)
+        self.assertFalse(s.waiting_for_host())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
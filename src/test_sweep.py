@@ -0,0 +1,102 @@
+"""Tests for sweep6502, the multiprocess sweep runner.
+
+Every case must come back, in order, exactly as if it had been run on a
+fresh simulator of its own.
+"""
+
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502, StopReason
+from sweep6502 import sweep, Case
+
+
+# result = arg * 3, one byte, by adding; also leaves a mark at $2000,
+# which the image leaves untouched
+TIMES_THREE = """
+        org $0200
+start:  lda #$00
+        ldx #$03
+loop:   clc
+        adc arg
+        dex
+        bne loop
+        sta result
+        inc $2000
+done:   brk
+arg:    db $00
+result: db $00
+"""
+
+
+def assemble(src):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    return a.object_code, a.symbols
+
+
+class CarryCase(Case):
+    """Starts with the carry set and returns just the carry-in-result pair."""
+
+    def setup(self, cpu, symbols):
+        Case.setup(self, cpu, symbols)
+        cpu.cc |= 0x01
+
+    def extract(self, cpu, symbols, stop):
+        return (cpu.memory_map.Read(symbols["result"]), stop.reason)
+
+
+class SweepTests(unittest.TestCase):
+
+    def cases(self):
+        return [Case(memory={"arg": [n]}, results=[("result", 1), (0x2000, 1)])
+                for n in range(0, 256, 7)]
+
+    def check(self, results):
+        for n, result in zip(range(0, 256, 7), results):
+            self.assertEqual(StopReason.BRK, result.stop.reason)
+            # Untouched memory reads as 0 in the compact memory sweeps use
+            self.assertEqual([[(n * 3) & 0xff], [1]], result.memory)
+
+    def test_in_process(self):
+        code, sym = assemble(TIMES_THREE)
+        results = sweep(code, sym, "start", self.cases(), processes=1)
+        self.assertEqual(37, len(results))
+        self.check(results)
+        self.assertEqual(sym["done"], results[0].registers["pc"])
+
+    def test_process_pool(self):
+        code, sym = assemble(TIMES_THREE)
+        serial = sweep(code, sym, "start", self.cases(), processes=1)
+        pooled = sweep(code, sym, "start", iter(self.cases()), processes=2, chunksize=3)
+        self.check(pooled)
+        self.assertEqual([r.registers for r in serial], [r.registers for r in pooled])
+
+    def test_matches_fresh_simulator(self):
+        for compact in (False, True):
+            self.check_fresh_simulator(compact)
+
+    def check_fresh_simulator(self, compact):
+        code, sym = assemble(TIMES_THREE)
+        result, = sweep(code, sym, "start", [Case(memory={"arg": [5]},
+                                                  registers={"x": 9})],
+                        until_pc="done", compact_memory=compact, processes=1)
+        s = sim6502(code, symbols=sym, compact_memory=compact)
+        s.memory_map.Write(sym["arg"], 5)
+        s.pc = sym["start"]
+        s.x = 9
+        stop = s.run(until_pc=sym["done"])
+        self.assertEqual((stop.reason, stop.steps, stop.cycles),
+                         (result.stop.reason, result.stop.steps, result.stop.cycles))
+        self.assertEqual((s.a, s.x, s.cc, s.cycles),
+                         tuple(result.registers[r] for r in ("a", "x", "cc", "cycles")))
+
+    def test_custom_case(self):
+        code, sym = assemble(TIMES_THREE)
+        cases = [CarryCase(memory={"arg": [n]}) for n in (1, 2)]
+        # The clc in the loop makes the carry irrelevant
+        self.assertEqual([(3, StopReason.BRK), (6, StopReason.BRK)],
+                         sweep(code, sym, "start", cases, processes=2))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,109 @@
+"""Tests for trace6502, the binary execution trace writer and reader."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from asm6502 import asm6502
+from sim6502 import sim6502
+from trace6502 import TraceWriter, first_difference
+
+try:
+    import numpy
+    from trace6502 import TraceReader
+except ImportError:
+    numpy = None
+
+
+# Sums 9..1 in decimal mode, which takes an extra cycle per ADC on 65C02
+DECIMAL_SUM = """
+        org $0200
+start:  sed
+        ldx #$09
+        lda #$00
+loop:   clc
+        stx $10
+        adc $10
+        dex
+        bne loop
+        cld
+done:   brk
+"""
+
+
+def assemble(src, variant=sim6502.CMOS):
+    a = asm6502(debug=0)
+    a.assemble(src.splitlines())
+    s = sim6502(a.object_code[:], symbols=a.symbols, variant=variant)
+    s.pc = a.symbols["start"]
+    return s, a.symbols
+
+
+@unittest.skipIf(numpy is None, "TraceReader needs NumPy")
+class TraceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def trace(self, name, variant=sim6502.CMOS, block_records=7):
+        s, sym = assemble(DECIMAL_SUM, variant)
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            writer = s.start_trace(f, block_records)
+            self.assertIsInstance(writer, TraceWriter)
+            stop = s.run()
+            s.stop_trace()
+        return s, sym, stop, TraceReader(path)
+
+    def test_records_match_execute(self):
+        s, sym, stop, trace = self.trace("cmos")
+        self.assertEqual(stop.steps, len(trace))
+        self.assertEqual(stop.cycles, int(trace.window(0, len(trace))["cycles"].sum()))
+        self.assertEqual(s.cycles, trace.cycles(len(trace) - 1))
+
+        stepped, _ = assemble(DECIMAL_SUM)
+        expected = []
+        for _ in range(stop.steps):
+            before = stepped.cycles
+            expected.append((stepped.pc, stepped.memory_map.Read(stepped.pc), stepped.a,
+                             stepped.x, stepped.y, stepped.sp, stepped.cc))
+            stepped.execute()
+            expected[-1] += (stepped.cycles - before,)
+        self.assertEqual(expected, trace.window(0, len(trace)).tolist())
+
+    def test_blocks_and_windows(self):
+        s, sym, stop, trace = self.trace("cmos")
+        self.assertEqual(list(range(0, stop.steps, 7)), trace.index()["step"].tolist())
+        self.assertEqual([trace.cycles(step - 1) for step in range(7, stop.steps, 7)],
+                         trace.index()["start_cycles"][1:].tolist())
+        # Across a block boundary, and clipped at the end
+        self.assertEqual([sym["loop"] + 5, sym["loop"] + 6], trace.window(6, 8)["pc"].tolist())
+        self.assertEqual(2, len(trace.window(len(trace) - 2, len(trace) + 10)))
+        self.assertEqual(stop.steps, sum(len(records) for _, records in trace.windows(5)))
+        with self.assertRaises(IndexError):
+            trace.block(len(trace.index()))
+
+    def test_first_difference(self):
+        _, sym, _, cmos = self.trace("cmos")
+        _, _, _, nmos = self.trace("nmos", sim6502.NMOS, block_records=5)
+        self.assertIsNone(first_difference(cmos, cmos))
+        # The first ADC, after sed, ldx, lda, clc and stx
+        self.assertEqual(5, first_difference(cmos, nmos))
+        self.assertEqual(sym["loop"] + 3, int(cmos.window(5, 6)["pc"][0]))
+        # Only the cycles differ
+        fields = ("pc", "opcode", "a", "x", "y", "sp", "p")
+        self.assertIsNone(first_difference(cmos, nmos, fields, size=3))
+
+    def test_not_a_trace(self):
+        path = os.path.join(self.directory, "junk")
+        with open(path, "wb") as f:
+            f.write(b"\x00" * 64)
+        with self.assertRaises(ValueError):
+            TraceReader(path)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
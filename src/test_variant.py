@@ -183,5 +183,34 @@ class CmosOpcodePresenceTests(unittest.TestCase):
         self.assertEqual(("jmp", "absoluteindirect"), cpu.hexcodes[0x6C])
 
 
+class DispatchTableTests(unittest.TestCase):
+    """The per-variant dispatch table must agree with hexcodes."""
+
+    def test_every_defined_opcode_has_a_handler(self):
+        for variant in sim6502.sim6502.VARIANTS:
+            cpu = sim6502.sim6502(variant=variant)
+            for op in range(256):
+                instr, addrmode = cpu.hexcodes[op]
+                entry = cpu.dispatch[op]
+                if instr == "":
+                    self.assertIsNone(entry, "%s opcode $%02x" % (variant, op))
+                else:
+                    handler, mode = entry
+                    self.assertEqual("instr_" + instr, handler.__name__)
+                    self.assertEqual(addrmode, mode)
+
+    def test_table_is_shared_per_variant(self):
+        a = sim6502.sim6502(variant="NMOS")
+        b = sim6502.sim6502(variant="NMOS")
+        c = sim6502.sim6502(variant="65C02")
+        self.assertIs(a.dispatch, b.dispatch)
+        self.assertIsNot(a.dispatch, c.dispatch)
+
+    def test_cmos_only_opcodes_absent_from_nmos_dispatch(self):
+        cpu = sim6502.sim6502(variant="NMOS")
+        for op, _mnemonic in CmosOpcodePresenceTests.CMOS_ONLY:
+            self.assertIsNone(cpu.dispatch[op])
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,206 @@
+"""Binary execution traces for sim6502.
+
+A TraceWriter records the registers at every instruction run() or
+execute() carries out, as fixed-width records written to a file a block at
+a time.  A TraceReader maps the file into memory and returns the records
+as NumPy structured arrays, so traces of hundreds of millions of steps can
+be searched and compared without a Python object per step.
+
+    with open("nmos.trace", "wb") as f:
+        s.start_trace(f)
+        s.run(max_steps=100000000)
+        s.stop_trace()
+    nmos = TraceReader("nmos.trace")
+    print(nmos.window(5000, 5010)["pc"])
+    print(first_difference(nmos, TraceReader("65c02.trace")))
+
+The file is a header, then blocks of block_records records, all full but
+the last.  Each block starts with the step number and cycle count of its
+first record, which index the trace by step and by cycle.  A record holds
+the PC, opcode, A, X, Y, SP and P as the instruction found them, and the
+cycles from the end of the previous record's instruction to the end of
+this one's: the instruction's own cycles, plus those of any interrupt
+taken in between.  All values are little-endian.
+
+The reader needs NumPy; the writer doesn't.
+"""
+
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"PY6502TR"
+VERSION = 1
+
+# magic, version, record size, records per block
+HEADER = struct.Struct("<8sHHI")
+# step and cycle count of the block's first record
+BLOCK_HEADER = struct.Struct("<QQ")
+# pc, opcode, a, x, y, sp, p, cycles
+RECORD = struct.Struct("<HBBBBBBH")
+
+# Records per block when start_trace() isn't told
+DEFAULT_BLOCK_RECORDS = 65536
+
+FIELDS = ("pc", "opcode", "a", "x", "y", "sp", "p", "cycles")
+
+
+class TraceWriter(object):
+    """Writes a trace of cpu to file, a binary file open for writing.
+
+    Made by sim6502.start_trace(), which attaches it to the simulator.
+    """
+
+    def __init__(self, cpu, file, block_records=DEFAULT_BLOCK_RECORDS):
+        self.cpu = cpu
+        self.file = file
+        self.block_records = block_records
+        # Records written, and the cycle count at the end of the last one
+        self.steps = 0
+        self.last_cycles = cpu.cycles
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, block_records))
+        self.buffer = bytearray(BLOCK_HEADER.size + RECORD.size * block_records)
+        self.start_block()
+
+    def start_block(self):
+        BLOCK_HEADER.pack_into(self.buffer, 0, self.steps, self.last_cycles)
+        self.offset = BLOCK_HEADER.size
+
+    def record(self, pc, opcode):
+        """Add the instruction at pc, once its cycles have been counted and
+        before it executes."""
+        cpu = self.cpu
+        cycles = cpu.cycles
+        delta = cycles - self.last_cycles
+        if not 0 <= delta <= 0xffff:
+            # cycles was changed by the caller
+            delta = 0 if delta < 0 else 0xffff
+        self.last_cycles = cycles
+        RECORD.pack_into(self.buffer, self.offset, pc & 0xffff, opcode, cpu.a & 0xff,
+                         cpu.x & 0xff, cpu.y & 0xff, cpu.sp & 0xff, cpu.cc & 0xff, delta)
+        self.offset += RECORD.size
+        self.steps += 1
+        if self.offset == len(self.buffer):
+            self.file.write(self.buffer)
+            self.start_block()
+
+    def close(self):
+        """Write out the last, partly filled, block and flush the file.  The
+        file is left open."""
+        if self.offset > BLOCK_HEADER.size:
+            self.file.write(memoryview(self.buffer)[:self.offset])
+        self.file.flush()
+        self.start_block()
+
+
+def record_dtype():
+    """The NumPy dtype of a trace record."""
+    return numpy.dtype([("pc", "<u2"), ("opcode", "u1"), ("a", "u1"), ("x", "u1"),
+                        ("y", "u1"), ("sp", "u1"), ("p", "u1"), ("cycles", "<u2")])
+
+
+class TraceReader(object):
+    """A trace file written by TraceWriter, mapped into memory.
+
+    len() is the number of records.  Records come back as NumPy
+    structured arrays with the fields in FIELDS.
+    """
+
+    def __init__(self, path):
+        if numpy is None:
+            raise ImportError("TraceReader needs NumPy")
+        data = numpy.memmap(path, numpy.uint8, "r")
+        magic, version, record_size, block_records = HEADER.unpack(
+            bytes(data[:HEADER.size]))
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError("%s is not a version %d py6502 trace" % (path, VERSION))
+        self.block_records = block_records
+
+        self.records = record_dtype()
+        self.header = numpy.dtype([("step", "<u8"), ("start_cycles", "<u8")])
+        block = numpy.dtype(self.header.descr + [("records", self.records, (block_records,))])
+        body = len(data) - HEADER.size
+        full = body // block.itemsize
+        end = HEADER.size + full * block.itemsize
+        self.blocks = data[HEADER.size:end].view(block)
+        # The last block, if it isn't full
+        tail = data[end:]
+        if len(tail) > BLOCK_HEADER.size:
+            count = (len(tail) - BLOCK_HEADER.size) // RECORD.size
+            self.tail_header = tail[:BLOCK_HEADER.size].view(self.header)
+            self.tail = tail[BLOCK_HEADER.size:BLOCK_HEADER.size +
+                             count * RECORD.size].view(self.records)
+        else:
+            self.tail_header = numpy.zeros(0, self.header)
+            self.tail = numpy.zeros(0, self.records)
+        self.length = full * block_records + len(self.tail)
+
+    def __len__(self):
+        return self.length
+
+    def index(self):
+        """The step number and cycle count at the start of each block, as a
+        structured array with fields step and start_cycles."""
+        return numpy.concatenate((self.blocks[["step", "start_cycles"]].astype(self.header),
+                                  self.tail_header))
+
+    def block(self, number):
+        """The records of block number, as a view of the file."""
+        if number < len(self.blocks):
+            return self.blocks[number]["records"]
+        if number == len(self.blocks) and len(self.tail):
+            return self.tail
+        raise IndexError("trace has no block %d" % number)
+
+    def window(self, start, stop):
+        """The records for steps start up to stop: a view of the file if
+        they are in one block, otherwise a copy."""
+        stop = min(stop, self.length)
+        parts = []
+        while start < stop:
+            number, offset = divmod(start, self.block_records)
+            count = min(stop - start, self.block_records - offset)
+            parts.append(self.block(number)[offset:offset + count])
+            start += count
+        if not parts:
+            return numpy.zeros(0, self.records)
+        if len(parts) == 1:
+            return parts[0]
+        return numpy.concatenate(parts)
+
+    def windows(self, size=None):
+        """Yield (step, records) for consecutive windows of size records,
+        by default one block each, covering the whole trace."""
+        size = size or self.block_records
+        for start in range(0, self.length, size):
+            yield start, self.window(start, start + size)
+
+    def cycles(self, step):
+        """The cycle count at the end of step."""
+        number, offset = divmod(step, self.block_records)
+        if number < len(self.blocks):
+            start = self.blocks[number]["start_cycles"]
+        else:
+            start = self.tail_header[0]["start_cycles"]
+        return int(start) + int(self.block(number)[:offset + 1]["cycles"].sum())
+
+
+def first_difference(first, second, fields=FIELDS, size=None):
+    """Return the first step at which two TraceReaders differ in any of
+    fields, the length of the shorter if one is a prefix of the other, or
+    None if they are the same."""
+    fields = list(fields)
+    size = size or first.block_records
+    length = min(len(first), len(second))
+    for start in range(0, length, size):
+        a = first.window(start, min(start + size, length))[fields]
+        b = second.window(start, min(start + size, length))[fields]
+        differ = numpy.flatnonzero(a != b)
+        if len(differ):
+            return start + int(differ[0])
+    if len(first) != len(second):
+        return length
+    return None